@@ -1,22 +1,92 @@
-from flask import Flask, render_template, request, jsonify, Response
-import requests
-from urllib.parse import urlparse
+from flask import Flask, render_template, request, jsonify, Response, g
 import time
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 from webalgo import HTMLSEOScanner
+from fetcher import URLFetcher
+from crawler import SiteCrawler
+from siteindex import SiteIndex
+from scanpool import ScanPool
+from ruleconfig import default_rule_config, load_rule_config, load_rule_configs
+from cache import ResultCache, TaskStore
+from scheduler import JobScheduler
+from eventbus import EventBus
+import metrics
+from metrics import timer
+from llm import CompletionCache, estimate_tokens, pack_chunks, parse_batch_answers, split_text, stream_completion
 import ollama
 import uuid
 import threading
-from queue import Queue
+from concurrent.futures import ThreadPoolExecutor
+from queue import Full
+import hashlib
 import json, os
-from openai import AzureOpenAI
+from openai import AzureOpenAI, AsyncAzureOpenAI
 from dotenv import load_dotenv
 load_dotenv()
 
 endpoint = os.getenv("ENDPOINT_URL", "https://aisuggestionmultilipi.openai.azure.com/")
 deployment = os.getenv("DEPLOYMENT_NAME", "gpt-4.1-nano")
 subscription_key = os.getenv("AZURE_OPENAI_API_KEY", "REPLACE_WITH_YOUR_KEY_VALUE_HERE")
+# HTML parser backend for scans: html.parser, lxml or selectolax
+scanner_parser = os.getenv("SCANNER_PARSER", "html.parser")
+# Streaming scans: largest page read and the size of each chunk held in memory
+stream_max_bytes = int(os.getenv("STREAM_MAX_BYTES", 10 * 1024 * 1024))
+stream_chunk_size = int(os.getenv("STREAM_CHUNK_SIZE", 64 * 1024))
+# Shared fetcher pool: hosts kept and connections (concurrent requests) per host
+fetch_pool_hosts = int(os.getenv("FETCH_POOL_HOSTS", 32))
+fetch_pool_maxsize = int(os.getenv("FETCH_POOL_MAXSIZE", 8))
+# SQLite file for conditional revalidation (ETag / Last-Modified) of fetched pages; unset to disable
+http_cache_path = os.getenv("HTTP_CACHE_PATH") or None
+# Site crawls: upper bounds on what a /crawl request may ask for, worker threads and per-host request rate
+crawl_max_pages = int(os.getenv("CRAWL_MAX_PAGES", 5000))
+crawl_max_depth = int(os.getenv("CRAWL_MAX_DEPTH", 10))
+crawl_workers = int(os.getenv("CRAWL_WORKERS", 16))
+crawl_rate_limit = float(os.getenv("CRAWL_RATE_LIMIT", 10))
+# Batch scans: worker processes (default: one per core) and URLs accepted per request
+scan_pool_workers = int(os.getenv("SCAN_POOL_WORKERS", 0)) or None
+scan_batch_max_urls = int(os.getenv("SCAN_BATCH_MAX_URLS", 100))
+# Scan result cache: in-memory entries, TTL in seconds and optional SQLite file for a shared disk tier
+scan_cache_size = int(os.getenv("SCAN_CACHE_SIZE", 1024))
+scan_cache_ttl = int(os.getenv("SCAN_CACHE_TTL", 3600))
+scan_cache_path = os.getenv("SCAN_CACHE_PATH") or None
+# Incremental re-scans: a changed page only re-runs the checks whose part of it changed (needs the scan cache)
+scan_incremental = os.getenv("SCAN_INCREMENTAL", "0") == "1"
+# Check thresholds and patterns: JSON/YAML rule config for everyone, and a directory of
+# per-tenant configs named <X-Tenant-ID>.json/.yaml; both are compiled once at startup
+rule_config_path = os.getenv("RULE_CONFIG_PATH") or None
+rule_config_dir = os.getenv("RULE_CONFIG_DIR") or None
+# AI recommendation cache: in-memory entries, TTL in seconds and optional SQLite file to persist it
+ai_cache_size = int(os.getenv("AI_CACHE_SIZE", 4096))
+ai_cache_ttl = int(os.getenv("AI_CACHE_TTL", 7 * 86400))
+ai_cache_path = os.getenv("AI_CACHE_PATH") or None
+# Stream summary tokens to /events/<task_id> as they are generated
+ai_stream = os.getenv("AI_STREAM", "1") == "1"
+# Summarization jobs: worker threads, queued jobs before /scan answers 429, retries and base backoff in seconds
+summary_workers = int(os.getenv("SUMMARY_WORKERS", 4))
+summary_queue_size = int(os.getenv("SUMMARY_QUEUE_SIZE", 100))
+summary_max_retries = int(os.getenv("SUMMARY_MAX_RETRIES", 2))
+summary_retry_backoff = float(os.getenv("SUMMARY_RETRY_BACKOFF", 2))
+# Page summaries: estimated tokens per chunk, chunks summarized per page, parallel chunk calls,
+# and a cache keyed by the page text (in-memory entries, TTL in seconds, optional SQLite file)
+summary_chunk_tokens = int(os.getenv("SUMMARY_CHUNK_TOKENS", 3000))
+summary_max_chunks = int(os.getenv("SUMMARY_MAX_CHUNKS", 16))
+summary_map_workers = int(os.getenv("SUMMARY_MAP_WORKERS", 4))
+# Threads extracting page text beside the rule checks in /scan
+extract_workers = int(os.getenv("EXTRACT_WORKERS", 4))
+summary_cache_size = int(os.getenv("SUMMARY_CACHE_SIZE", 1024))
+summary_cache_ttl = int(os.getenv("SUMMARY_CACHE_TTL", 7 * 86400))
+summary_cache_path = os.getenv("SUMMARY_CACHE_PATH") or None
+# Task state: TTL in seconds, maximum tasks kept, sweep interval and optional SQLite file shared by workers
+task_ttl = int(os.getenv("TASK_TTL", 3600))
+task_max_entries = int(os.getenv("TASK_MAX_ENTRIES", 10000))
+task_sweep_interval = int(os.getenv("TASK_SWEEP_INTERVAL", 60))
+task_store_path = os.getenv("TASK_STORE_PATH") or None
+# SSE events: optional SQLite file shared by worker processes, events replayed per task and poll interval in seconds
+event_bus_path = os.getenv("EVENT_BUS_PATH") or None
+event_replay = int(os.getenv("EVENT_REPLAY", 200))
+event_poll_interval = float(os.getenv("EVENT_POLL_INTERVAL", 0.25))
+# Stage timers behind /metrics, and whether responses carry a Server-Timing header
+metrics.enabled = os.getenv("METRICS_ENABLED", "1") == "1"
+server_timing = os.getenv("SERVER_TIMING", "0") == "1"
 
 # Initialize Azure OpenAI client with key-based authentication
 client = AzureOpenAI(
@@ -24,91 +94,297 @@ client = AzureOpenAI(
     api_key=subscription_key,
     api_version="2025-01-01-preview",
 )
+# Same client for the async app (asgi.py)
+async_client = AsyncAzureOpenAI(
+    azure_endpoint=endpoint,
+    api_key=subscription_key,
+    api_version="2025-01-01-preview",
+)
+# Recommendations are memoized on the normalized prompt, and identical
+# requests in flight share one upstream call
+recommendation_cache = CompletionCache(client, ResultCache(
+    max_entries=ai_cache_size,
+    ttl=ai_cache_ttl,
+    path=ai_cache_path,
+    table='ai_recommendations',
+), async_client=async_client)
+# Page summaries by text hash, and the memoized chunk summaries behind them
+summary_cache = ResultCache(
+    max_entries=summary_cache_size,
+    ttl=summary_cache_ttl,
+    path=summary_cache_path,
+    table='summaries',
+)
+summary_completions = CompletionCache(client, summary_cache)
 # Import your scanner class (assuming it's in a file called html_seo_scanner.py)
 # from html_seo_scanner import HTMLSEOScanner
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-change-this'
 
-class URLFetcher:
-    def __init__(self):
-        self.session = requests.Session()
-        
-        # Set up retry strategy
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
-        )
-        
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        self.session.mount("http://", adapter)
-        self.session.mount("https://", adapter)
-        
-        # Set headers to mimic a real browser
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+@app.before_request
+def start_request_timing():
+    g.request_start = time.perf_counter()
+    if server_timing:
+        metrics.start_request()
+
+@app.after_request
+def record_request_timing(response):
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.http_requests.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    metrics.http_request_duration.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+    if server_timing:
+        response.headers['Server-Timing'] = metrics.server_timing()
+    return response
+
+# One fetcher for the whole process so connections and TLS sessions are reused across scans
+fetcher = URLFetcher(
+    max_bytes=stream_max_bytes,
+    chunk_size=stream_chunk_size,
+    pool_hosts=fetch_pool_hosts,
+    pool_maxsize=fetch_pool_maxsize,
+    http_cache_path=http_cache_path,
+)
+
+# Findings and extracted content keyed by page content, final URL and ruleset
+scan_cache = ResultCache(
+    max_entries=scan_cache_size,
+    ttl=scan_cache_ttl,
+    path=scan_cache_path,
+    table='scan_results',
+)
+
+rule_config = load_rule_config(rule_config_path) if rule_config_path else default_rule_config
+tenant_rule_configs = load_rule_configs(rule_config_dir) if rule_config_dir else {}
+
+def tenant_rule_config(tenant):
+    """The tenant's compiled rule config, or the shared one"""
+    return tenant_rule_configs.get(tenant, rule_config)
+
+# Process pool for /scan/batch, created on first use
+scan_pool = None
+scan_pool_lock = threading.Lock()
+
+def get_scan_pool():
+    """Return the shared scan pool, starting and warming its workers the first time"""
+    global scan_pool
+    with scan_pool_lock:
+        if scan_pool is None:
+            scan_pool = ScanPool(
+                workers=scan_pool_workers, parser=scanner_parser, config=rule_config, rule_configs=tenant_rule_configs
+            )
+        return scan_pool
+
+# Summaries run on a fixed pool of workers instead of a thread per scan
+summarize_scheduler = JobScheduler(
+    workers=summary_workers,
+    max_queue=summary_queue_size,
+    max_retries=summary_max_retries,
+    retry_backoff=summary_retry_backoff,
+)
+
+metrics.registry.gauge('seo_summary_jobs_queued', 'Summarization jobs waiting for a worker',
+                        lambda: summarize_scheduler.queued)
+metrics.registry.gauge('seo_summary_jobs_running', 'Summarization jobs being run',
+                        lambda: summarize_scheduler.running)
+
+# Text extraction for /scan, run beside the rule checks
+extract_executor = ThreadPoolExecutor(max_workers=extract_workers, thread_name_prefix='extract')
+
+# Store for tracking background tasks; entries expire so memory stays bounded
+task_status = TaskStore(task_ttl, task_max_entries, task_store_path, 'task_status', task_sweep_interval)
+task_results = TaskStore(task_ttl, task_max_entries, task_store_path, 'task_results', task_sweep_interval)
+
+# Task events for /events/<task_id>; recent events are kept, so late subscribers catch up
+event_bus = EventBus(event_bus_path, event_replay, task_ttl, task_max_entries, event_poll_interval)
+
+def summary_messages(instruction, text):
+    """Prompt that asks the model to summarize `text`"""
+    return [
+        {
+            "role": "system",
+            "content": [
+                {
+                    "type": "text",
+                    "text": instruction
+                }
+            ]
+        },
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": text
+                }
+            ]
+        }
+    ]
+
+# Model parameters for the final summary and for the partial summaries of long pages
+summary_params = dict(
+    max_tokens=800,
+    temperature=1,
+    top_p=1,
+    frequency_penalty=0,
+    presence_penalty=0,
+    stop=None
+)
+chunk_summary_params = dict(summary_params, max_tokens=400)
+
+# Used when no text could be extracted, e.g. pages rendered by JavaScript
+URL_SUMMARY_PROMPT = '''You will be given a url of a website by the user. summarize the text into  a shorter form such that summary can be used later as context to firther improve the content.ruturn only the summary without any additional text or explanation. The summary should be concise and capture the main points of the content.keep the summary in the same language as the content of the website.'''
+PAGE_SUMMARY_PROMPT = '''You will be given the text content of a website by the user. summarize the text into  a shorter form such that summary can be used later as context to firther improve the content.ruturn only the summary without any additional text or explanation. The summary should be concise and capture the main points of the content.keep the summary in the same language as the content of the website.'''
+CHUNK_SUMMARY_PROMPT = '''You will be given one part of the text content of a website by the user. summarize this part so the summaries of all parts can later be combined into one summary of the website. ruturn only the summary without any additional text or explanation. Keep every main point and keep the summary in the same language as the text.'''
+REDUCE_SUMMARY_PROMPT = '''You will be given summaries of consecutive parts of a website, separated by blank lines. combine them into one summary of the whole website such that summary can be used later as context to firther improve the content.ruturn only the summary without any additional text or explanation. The summary should be concise and capture the main points of the content.keep the summary in the same language as the summaries.'''
+
+def page_summary_text(content):
+    """Title, meta description and body text of a page, as the text to summarize"""
+    parts = []
+    if content.get('title'):
+        parts.append(f"Title: {content['title']}")
+    if content.get('meta_description'):
+        parts.append(f"Description: {content['meta_description']}")
+    if content.get('body_text', '').strip():
+        parts.append(content['body_text'].strip())
+    return '\n\n'.join(parts)
+
+def summarize_chunks(chunks, instruction):
+    """Summarize chunks in parallel; chunk summaries are memoized like any completion"""
+    def summarize(chunk):
+        return summary_completions.complete(deployment, summary_messages(instruction, chunk), **chunk_summary_params)
+    with ThreadPoolExecutor(max_workers=min(len(chunks), summary_map_workers)) as pool:
+        return list(pool.map(summarize, chunks))
+
+def summary_prompt(text):
+    """
+    Messages for the final summary call. Text over the chunk budget is
+    map-reduced first: chunks are summarized in parallel, and the partial
+    summaries are combined in rounds until they fit in one prompt
+    """
+    chunks = split_text(text, summary_chunk_tokens)
+    if len(chunks) <= 1:
+        return summary_messages(PAGE_SUMMARY_PROMPT, text)
+
+    partials = summarize_chunks(chunks[:summary_max_chunks], CHUNK_SUMMARY_PROMPT)
+    while len(partials) > 1 and estimate_tokens('\n\n'.join(partials)) > summary_chunk_tokens:
+        groups = pack_chunks(partials, summary_chunk_tokens, '\n\n')
+        if len(groups) == len(partials):
+            # Every partial fills a chunk on its own; combining more would not fit
+            break
+        partials = summarize_chunks(groups, REDUCE_SUMMARY_PROMPT)
+    return summary_messages(REDUCE_SUMMARY_PROMPT, '\n\n'.join(partials))
+
+def background_summarize_task(task_id, url, content, timings=None):
+    """
+    Background task that summarizes a page from its extracted content.
+    `timings` holds the earlier stages; the summary stage is added to it.
+    Runs on summarize_scheduler; errors are raised so the scheduler can retry,
+    and summarize_task_failed() reports the last one. A retry publishes
+    summary_reset before its summary_delta events
+    """
+    # Update task status
+    task_status[task_id] = "processing"
+    start = time.perf_counter()
+    attempt = summarize_scheduler.attempt(task_id)
+    if ai_stream and attempt:
+        # A retry streams the summary again from the start; clients drop the deltas they have
+        event_bus.publish(task_id, 'summary_reset', {
+            'attempt': attempt,
+            'task_id': task_id
         })
+
+    text = page_summary_text(content)
+    if content.get('body_text', '').strip():
+        # Summaries are keyed by the text, so an unchanged page never goes back to the model
+        summary_key = f"summary|{deployment}|{hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()}"
+        messages = None
+    else:
+        summary_key = None
+        messages = summary_messages(URL_SUMMARY_PROMPT, url)
+
+    summary = summary_cache.get(summary_key) if summary_key else None
+    if summary is None:
+        if messages is None:
+            messages = summary_prompt(text)
+        if summarize_scheduler.is_cancelled(task_id):
+            return
+        with timer('completion', mode='stream' if ai_stream else 'complete'):
+            if ai_stream:
+                # Forward tokens as they arrive; summary_complete still carries the full text
+                parts = []
+                for delta in stream_completion(client, deployment, messages, **summary_params):
+                    if summarize_scheduler.is_cancelled(task_id):
+                        return
+                    parts.append(delta)
+                    event_bus.publish(task_id, 'summary_delta', {
+                        'delta': delta,
+                        'task_id': task_id
+                    })
+                summary = ''.join(parts)
+            else:
+                completion = client.chat.completions.create(
+                model=deployment,
+                messages=messages,
+                stream=False,
+                **summary_params
+                )
+                summary = completion.choices[0].message.content
+        if summary_key:
+            summary_cache.set(summary_key, summary)
+    if summarize_scheduler.is_cancelled(task_id):
+        return
+    print("Summarized")
+    timings = dict(timings or {}, summarize_ms=elapsed_ms(start))
+    # Store the result
+    task_results[task_id] = {
+        'summary': summary,
+        'status': 'completed',
+        'timestamp': time.time(),
+        'timings': timings
+    }
+    task_status[task_id] = "completed"
     
-    def fetch_url(self, url):
-        """Fetch HTML content from a URL"""
-        try:
-            # Validate URL
-            parsed = urlparse(url)
-            if not parsed.scheme:
-                url = 'https://' + url
-            
-            # Set timeout
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            
-            return {
-                'success': True,
-                'html': response.text,
-                'status_code': response.status_code,
-                'final_url': response.url
-            }
-            
-        except requests.exceptions.RequestException as e:
-            return {
-                'success': False,
-                'error': str(e),
-                'html': None
-            }
-        except Exception as e:
-            return {
-                'success': False,
-                'error': f'Unexpected error: {str(e)}',
-                'html': None
-            }
+    # Send SSE event to client
+    event_bus.publish(task_id, 'summary_complete', {
+        'summary': summary,
+        'task_id': task_id,
+        'timings': timings
+    })
 
-# Store for tracking background tasks
-task_status = {}
-task_results = {}
+def summarize_task_failed(task_id, e):
+    """Record a summarization task that failed on every attempt and tell the client"""
+    task_status[task_id] = "failed"
+    task_results[task_id] = {
+        'error': str(e),
+        'status': 'failed',
+        'timestamp': time.time()
+    }
+    
+    event_bus.publish(task_id, 'summary_error', {
+        'error': str(e),
+        'task_id': task_id
+    })
 
-# SSE event queues for each client
-client_queues = {}
+# Model parameters shared by the single-issue recommendation calls
+recommendation_params = dict(
+    max_tokens=800,
+    temperature=1,
+    top_p=1,
+    frequency_penalty=0,
+    presence_penalty=0,
+    stop=None
+)
 
-def background_summarize_task(task_id, url):
-    """Background task that simulates content summarization"""
-    try:
-        # Update task status
-        task_status[task_id] = "processing"
-        # Simulate long-running summarization process
-        # response = ollama.chat(
-        #     model="gemma3:4b",
-        #     messages=[
-        #         {"role": "system", "content": '''You will be given a text content of a website by the user. summarize the text  into  a shorter form such that summary can be used later as context to firther improve the content.ruturn only the summary without any additional text or explanation. The summary should be concise and capture the main points of the content.'''},
-        #         {"role": "user", "content": f"{content}"}
-        #     ]
-        # )  # Replace with your actual summarization logic
-        messages = [
+def recommendation_messages(issue_type, description, current_content, context):
+    """Prompt for a single-issue recommendation"""
+    return [
             {
                 "role": "system",
                 "content": [
                     {
                         "type": "text",
-                        "text": '''You will be given a url of a website by the user. summarize the text into  a shorter form such that summary can be used later as context to firther improve the content.ruturn only the summary without any additional text or explanation. The summary should be concise and capture the main points of the content.keep the summary in the same language as the content of the website.'''
+                        "text": f'''This is the summary of a website.{context}. the user have some issues with the content of the website. The user will provide the issue type and the element that needs to be fixed. You need to provide a solution for the issue based on the content of the website.Give the user the correct statement that should replace the current text.If there is no current content then genrate a based on the context. The solution should be in a single line and should not contain any code or HTML tags. The solution must be in the same languages as the rest of the context.Do NOT give any extra explanation or instructions.'''
                     }
                 ]
             },
@@ -117,62 +393,11 @@ def background_summarize_task(task_id, url):
                 "content": [
                     {
                         "type": "text",
-                        "text": f"{url}"
+                        "text": f"issue_type:{issue_type},issue_decription:{description},current_content:{current_content}"
                     }
                 ]
             }
         ]
-        completion = client.chat.completions.create(
-        model=deployment,
-        messages=messages,
-        max_tokens=800,
-        temperature=1,
-        top_p=1,
-        frequency_penalty=0,
-        presence_penalty=0,
-        stop=None,
-        stream=False
-        )
-
-        response=completion.choices[0].message.content
-        # Simulate summary result
-        # summary = f"Summary of content: {content[:100]}... (This is a mock summary)"
-        summary = response
-        print("Summarized")
-        # Store the result
-        task_results[task_id] = {
-            'summary': summary,
-            'status': 'completed',
-            'timestamp': time.time()
-        }
-        task_status[task_id] = "completed"
-        
-        # Send SSE event to client
-        if task_id in client_queues:
-            client_queues[task_id].put({
-                'event': 'summary_complete',
-                'data': {
-                    'summary': summary,
-                    'task_id': task_id
-                }
-            })
-            
-    except Exception as e:
-        task_status[task_id] = "failed"
-        task_results[task_id] = {
-            'error': str(e),
-            'status': 'failed',
-            'timestamp': time.time()
-        }
-        
-        if task_id in client_queues:
-            client_queues[task_id].put({
-                'event': 'summary_error',
-                'data': {
-                    'error': str(e),
-                    'task_id': task_id
-                }
-            })
 
 def generate_ai_recommendation(issue_type, description, current_content, context):
     """Generate AI-powered SEO recommendations"""
@@ -184,13 +409,44 @@ def generate_ai_recommendation(issue_type, description, current_content, context
     #     {"role": "user", "content": f"issue_type:{issue_type},issue_decription:{description},current_contetn:{current_content}"}
     # ]
 # )
+    messages = recommendation_messages(issue_type, description, current_content, context)
+    response = recommendation_cache.complete(
+    model=deployment,
+    messages=messages,
+    **recommendation_params
+    )
+
+    recommendations.append(response)
+    return recommendations
+
+def stream_ai_recommendation(issue_type, description, current_content, context):
+    """Yield a recommendation's text as it is generated"""
+    messages = recommendation_messages(issue_type, description, current_content, context)
+    return recommendation_cache.stream(deployment, messages, **recommendation_params)
+
+def generate_ai_recommendations_batch(issues, context):
+    """
+    Generate recommendations for every issue on a page in one model call, with the
+    site context sent once. Issues whose answer is missing from the JSON reply
+    fall back to generate_ai_recommendation(). Returns one list of recommendations
+    per issue, in order, and the number of issues that needed a fallback call.
+    """
+    numbered_issues = [
+        {
+            'id': index,
+            'issue_type': issue.get('issue_type', ''),
+            'issue_description': issue.get('description', ''),
+            'current_content': issue.get('current_content', '')
+        }
+        for index, issue in enumerate(issues)
+    ]
     messages = [
             {
                 "role": "system",
                 "content": [
                     {
                         "type": "text",
-                        "text": f'''This is the summary of a website.{context}. the user have some issues with the content of the website. The user will provide the issue type and the element that needs to be fixed. You need to provide a solution for the issue based on the content of the website.Give the user the correct statement that should replace the current text.If there is no current content then genrate a based on the context. The solution should be in a single line and should not contain any code or HTML tags. The solution must be in the same languages as the rest of the context.Do NOT give any extra explanation or instructions.'''
+                        "text": f'''This is the summary of a website.{context}. the user have some issues with the content of the website. The user will provide a JSON list of issues, each with an id, the issue type, the issue description and the current content. For every issue you need to provide a solution based on the content of the website.Give the user the correct statement that should replace the current text.If there is no current content then genrate a based on the context. Each solution should be in a single line and should not contain any code or HTML tags. The solutions must be in the same languages as the rest of the context.Respond with only a JSON object of the form {{"recommendations": [{{"id": <issue id>, "recommendation": "<solution>"}}]}} with one entry per issue.'''
                     }
                 ]
             },
@@ -199,26 +455,73 @@ def generate_ai_recommendation(issue_type, description, current_content, context
                 "content": [
                     {
                         "type": "text",
-                        "text": f"issue_type:{issue_type},issue_decription:{description},current_content:{current_content}"
+                        "text": json.dumps(numbered_issues, ensure_ascii=False)
                     }
                 ]
             }
         ]
-    completion = client.chat.completions.create(
-    model=deployment,
-    messages=messages,
-    max_tokens=800,
-    temperature=1,
-    top_p=1,
-    frequency_penalty=0,
-    presence_penalty=0,
-    stop=None,
-    stream=False
-    )
+    try:
+        response = recommendation_cache.complete(
+        model=deployment,
+        messages=messages,
+        max_tokens=min(800 + 150 * len(issues), 4096),
+        temperature=1,
+        top_p=1,
+        frequency_penalty=0,
+        presence_penalty=0,
+        stop=None,
+        response_format={"type": "json_object"}
+        )
+    except Exception as e:
+        print(f"Batch recommendation failed, falling back to per-issue calls: {e}")
+        response = None
+    answers = parse_batch_answers(response, len(issues))
+    
+    # Fall back to one call per issue for anything the batch reply didn't cover
+    missing = [index for index, answer in enumerate(answers) if answer is None]
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(len(missing), 8)) as pool:
+            fallbacks = pool.map(
+                lambda index: generate_ai_recommendation(
+                    issues[index].get('issue_type', ''),
+                    issues[index].get('description', ''),
+                    issues[index].get('current_content', ''),
+                    context
+                ),
+                missing
+            )
+            for index, recommendations in zip(missing, fallbacks):
+                answers[index] = recommendations
+    
+    return [answer if isinstance(answer, list) else [answer] for answer in answers], len(missing)
 
-    response=completion.choices[0].message.content
-    recommendations.append(response)
-    return recommendations
+@app.route('/ai-recommendation/batch', methods=['POST'])
+def get_ai_recommendations_batch():
+    """Get AI-powered recommendations for all issues of a scan in one round trip"""
+    try:
+        data = request.get_json()
+        issues = data.get('issues', [])
+        context = data.get('context', '')
+        
+        if not issues:
+            return jsonify({
+                'success': False,
+                'error': 'No issues given'
+            })
+        
+        recommendations, fallbacks = generate_ai_recommendations_batch(issues, context)
+        
+        return jsonify({
+            'success': True,
+            'recommendations': recommendations,
+            'fallbacks': fallbacks
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Failed to generate recommendations: {str(e)}'
+        })
 
 @app.route('/ai-recommendation', methods=['POST'])
 def get_ai_recommendation():
@@ -233,6 +536,23 @@ def get_ai_recommendation():
         # Here you would integrate with an AI service (OpenAI, Claude, etc.)
         # For now, we'll provide rule-based recommendations
         
+        if data.get('stream'):
+            # Server-sent events: recommendation_delta as tokens arrive, then recommendation_complete
+            def event_stream():
+                parts = []
+                try:
+                    for delta in stream_ai_recommendation(issue_type, description, current_content, context):
+                        parts.append(delta)
+                        yield f"event: recommendation_delta\n"
+                        yield f"data: {json.dumps({'delta': delta})}\n\n"
+                    yield f"event: recommendation_complete\n"
+                    yield f"data: {json.dumps({'recommendations': [''.join(parts)]})}\n\n"
+                except Exception as e:
+                    yield f"event: recommendation_error\n"
+                    yield f"data: {json.dumps({'error': f'Failed to generate recommendations: {str(e)}'})}\n\n"
+            
+            return Response(event_stream(), mimetype='text/event-stream')
+        
         recommendations = generate_ai_recommendation(issue_type, description, current_content, context)
         
         return jsonify({
@@ -262,40 +582,133 @@ def get_task_status(task_id):
         'result': result
     })
 
+@app.route('/cancel/<task_id>', methods=['POST'])
+def cancel_task(task_id):
+    """Cancel a queued or running summarization task"""
+    # A task still being extracted is not queued yet; extract_and_summarize() sees the status
+    if not summarize_scheduler.cancel(task_id) and task_status.get(task_id) != 'started':
+        return jsonify({
+            'success': False,
+            'error': 'Task is not queued or running'
+        }), 404
+
+    task_status[task_id] = "cancelled"
+    event_bus.publish(task_id, 'summary_cancelled', {
+        'task_id': task_id
+    })
+    return jsonify({
+        'success': True,
+        'task_id': task_id
+    })
+
 @app.route('/events/<task_id>')
 def events(task_id):
     """Server-Sent Events endpoint for real-time updates"""
+    # EventSource sends the id of the last event it saw when it reconnects
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    after = int(last_event_id) if last_event_id.isdigit() else 0
+
     def event_stream():
-        # Create queue for this client
-        client_queues[task_id] = Queue()
-        
-        try:
-            while True:
-                # Wait for events
-                try:
-                    event = client_queues[task_id].get(timeout=30)
-                    yield f"event: {event['event']}\n"
-                    yield f"data: {json.dumps(event['data'])}\n\n"
-                    
-                    # If task is complete, break the loop
-                    if event['event'] in ['summary_complete', 'summary_error']:
-                        break
-                        
-                except:
-                    # Send heartbeat
-                    yield f"event: heartbeat\n"
-                    yield f"data: {json.dumps({'timestamp': time.time()})}\n\n"
-                    
-        except GeneratorExit:
-            # Client disconnected
-            pass
-        finally:
-            # Clean up
-            if task_id in client_queues:
-                del client_queues[task_id]
+        for event in event_bus.subscribe(task_id, after, heartbeat=30):
+            if event is None:
+                # Send heartbeat
+                yield f"event: heartbeat\n"
+                yield f"data: {json.dumps({'timestamp': time.time()})}\n\n"
+                continue
+
+            yield f"id: {event['id']}\n"
+            yield f"event: {event['event']}\n"
+            yield f"data: {json.dumps(event['data'])}\n\n"
+
+            # If task is complete, break the loop
+            if event['event'] in ['summary_complete', 'summary_error', 'summary_cancelled']:
+                break
     
     return Response(event_stream(), mimetype='text/event-stream')
 
+def elapsed_ms(start):
+    """Milliseconds since a time.perf_counter() reading"""
+    return round((time.perf_counter() - start) * 1000, 1)
+
+def extract_and_summarize(scanner, document, task_id, url, tenant):
+    """
+    Extract a page's text and queue its summary in the slot reserved for
+    the task; runs beside the rule checks
+    """
+    try:
+        start = time.perf_counter()
+        page_text = scanner.extract_page_content(document)
+        timings = {'extract_ms': elapsed_ms(start)}
+        if task_status.get(task_id) == 'cancelled':
+            return
+        # Requests are shared fairly across tenants
+        summarize_scheduler.submit(
+            task_id,
+            background_summarize_task,
+            (task_id, url, page_text, timings),
+            tenant=tenant,
+            on_error=summarize_task_failed
+        )
+    except Exception as e:
+        summarize_task_failed(task_id, e)
+    finally:
+        # A task that never reached the queue gives its slot back
+        summarize_scheduler.release(task_id)
+
+def scan_fetched_page(url, fetch_result, tenant, timings=None):
+    """
+    Scan a fetched page and start its summarization. The summary's queue
+    slot is reserved first, so a full queue answers 429 here rather than a
+    summary_error later. Text extraction runs on extract_executor at the
+    same time as the rule checks, on the same parsed document, and queues
+    the summary once the text is ready; the response goes out as soon as
+    the checks finish. Returns the /scan response body and HTTP status;
+    shared by the Flask and ASGI apps
+    """
+    started = time.perf_counter()
+    timings = dict(timings or {})
+    # Scan HTML content
+    # Uncomment the following lines when you import your scanner
+    scanner = HTMLSEOScanner(
+        parser=scanner_parser, cache=scan_cache, incremental=scan_incremental, config=tenant_rule_config(tenant)
+    )
+
+    # Parse once; extraction and the checks share the same tree
+    document = scanner.parse(fetch_result['html'])
+
+    task_id = str(uuid.uuid4())
+    try:
+        summarize_scheduler.reserve(task_id)
+    except Full:
+        return {
+            'success': False,
+            'error': 'Too many scans in progress, please try again shortly'
+        }, 429
+    
+    # Initialize task status
+    task_status[task_id] = "started"
+    extract_executor.submit(extract_and_summarize, scanner, document, task_id, url, tenant)
+
+    # The tree is built by whichever branch needs it first
+    start = time.perf_counter()
+    results = scanner.scan_html(document, fetch_result['final_url'])
+    timings['checks_ms'] = elapsed_ms(start)
+    timings['total_ms'] = round(timings.get('fetch_ms', 0) + elapsed_ms(started), 1)
+
+    return {
+        'success': True,
+        'url': fetch_result['final_url'],
+        'results': results,
+        'summary': {
+            'total_issues': len(results['vulnerabilities']) + len(results['warnings']),
+            'critical_issues': len(results['vulnerabilities']),
+            'warnings': len(results['warnings']),
+            'recommendations': len(results['recommendations'])
+        },
+        'task_id': task_id,
+        'timings': timings
+    }, 200
+
 @app.route('/scan', methods=['POST'])
 def scan_url():
     """Scan a URL for SEO vulnerabilities"""
@@ -308,9 +721,16 @@ def scan_url():
                 'success': False,
                 'error': 'Please enter a URL'
             })
+
+        # Push back before fetching when the summarization queue is already full
+        if summarize_scheduler.is_full():
+            return jsonify({
+                'success': False,
+                'error': 'Too many scans in progress, please try again shortly'
+            }), 429
         
         # Fetch HTML content
-        fetcher = URLFetcher()
+        start = time.perf_counter()
         fetch_result = fetcher.fetch_url(url)
         
         if not fetch_result['success']:
@@ -319,51 +739,164 @@ def scan_url():
                 'error': f'Failed to fetch URL: {fetch_result["error"]}'
             })
         
-        # Scan HTML content
-        # Uncomment the following lines when you import your scanner
-        scanner = HTMLSEOScanner()
-
-        page_text=scanner.extract_page_content(fetch_result['html'])
+        body, status = scan_fetched_page(
+            url, fetch_result, request.headers.get('X-Tenant-ID') or request.remote_addr,
+            {'fetch_ms': elapsed_ms(start)}
+        )
+        return jsonify(body), status
+        
+    except Exception as e:
+        return jsonify({    
+            'success': False,
+            'error': f'An error occurred: {str(e)}'
+        })
 
-        task_id = str(uuid.uuid4())
+@app.route('/scan/batch', methods=['POST'])
+def scan_batch():
+    """Fetch a list of URLs and scan them in parallel on the process pool"""
+    try:
+        data = request.get_json()
+        urls = [url.strip() for url in data.get('urls', []) if url and url.strip()]
+        
+        if not urls:
+            return jsonify({
+                'success': False,
+                'error': 'Please enter at least one URL'
+            })
+        if len(urls) > scan_batch_max_urls:
+            return jsonify({
+                'success': False,
+                'error': f'Too many URLs, the limit is {scan_batch_max_urls} per batch'
+            })
         
-        # Initialize task status
-        task_status[task_id] = "started"
+        # Fetching is I/O bound and stays on threads; scanning goes to the process pool
+        with ThreadPoolExecutor(max_workers=fetch_pool_maxsize) as pool:
+            fetch_results = list(pool.map(fetcher.fetch_url, urls))
         
-        # Start background summarization task
-        thread = threading.Thread(
-            target=background_summarize_task, 
-            args=(task_id, url)
-        )
-        thread.daemon = True
-        thread.start()
-        results = scanner.scan_html(fetch_result['html'], fetch_result['final_url'])
-
+        fetched = [result for result in fetch_results if result['success']]
+        scans = iter(get_scan_pool().scan_many(
+            [result['html'] for result in fetched],
+            [result['final_url'] for result in fetched],
+            rules=request.headers.get('X-Tenant-ID')
+        ))
         
+        pages = []
+        for url, fetch_result in zip(urls, fetch_results):
+            if not fetch_result['success']:
+                pages.append({
+                    'url': url,
+                    'success': False,
+                    'error': f'Failed to fetch URL: {fetch_result["error"]}'
+                })
+                continue
+            pages.append({
+                'url': fetch_result['final_url'],
+                'success': True,
+                'results': next(scans)['results']
+            })
         
         return jsonify({
             'success': True,
-            'url': fetch_result['final_url'],
-            'results': results,
-            'summary': {
-                'total_issues': len(results['vulnerabilities']) + len(results['warnings']),
-                'critical_issues': len(results['vulnerabilities']),
-                'warnings': len(results['warnings']),
-                'recommendations': len(results['recommendations'])
-            },
-            'task_id': task_id
+            'pages': pages
         })
         
     except Exception as e:
-        return jsonify({    
+        return jsonify({
             'success': False,
             'error': f'An error occurred: {str(e)}'
         })
 
+@app.route('/scan/stream', methods=['POST'])
+def scan_url_stream():
+    """Scan a URL while it downloads, streaming head findings before the full results"""
+    data = request.get_json()
+    url = data.get('url', '').strip()
+    
+    if not url:
+        return jsonify({
+            'success': False,
+            'error': 'Please enter a URL'
+        })
+    config = tenant_rule_config(request.headers.get('X-Tenant-ID') or request.remote_addr)
+    
+    def event_stream():
+        for event in fetcher.stream_scan(url, config):
+            yield f"event: {event['event']}\n"
+            yield f"data: {json.dumps(event['data'])}\n\n"
+    
+    return Response(event_stream(), mimetype='text/event-stream')
+
+@app.route('/crawl', methods=['POST'])
+def crawl_site():
+    """Crawl a site from a seed URL, streaming each page's findings as it is scanned"""
+    data = request.get_json()
+    url = data.get('url', '').strip()
+    
+    if not url:
+        return jsonify({
+            'success': False,
+            'error': 'Please enter a URL'
+        })
+
+    limits = {}
+    for name, default, minimum in (('max_depth', 3, 0), ('max_pages', 500, 1)):
+        value = data.get(name, default)
+        if isinstance(value, str) and value.strip().isdigit():
+            value = int(value)
+        if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+            return jsonify({
+                'success': False,
+                'error': f'{name} must be a whole number of at least {minimum}'
+            }), 400
+        limits[name] = value
+    
+    crawler = SiteCrawler(
+        fetcher,
+        max_depth=min(limits['max_depth'], crawl_max_depth),
+        max_pages=min(limits['max_pages'], crawl_max_pages),
+        workers=crawl_workers,
+        rate_limit=crawl_rate_limit,
+        parser=scanner_parser,
+        site_index=SiteIndex(),
+        config=tenant_rule_config(request.headers.get('X-Tenant-ID') or request.remote_addr),
+    )
+    
+    def event_stream():
+        pages = 0
+        for page in crawler.crawl(url):
+            pages += 1
+            yield f"event: page_scanned\n"
+            yield f"data: {json.dumps(page)}\n\n"
+        # Duplicates and canonical chains across the pages, known once all are scanned
+        yield f"event: site_issues\n"
+        yield f"data: {json.dumps(crawler.site_index.report())}\n\n"
+        yield f"event: crawl_complete\n"
+        yield f"data: {json.dumps({'pages': pages})}\n\n"
+    
+    return Response(event_stream(), mimetype='text/event-stream')
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Stage timings, request counters and job queue gauges in the Prometheus text format"""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/health')
 def health_check():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy'})
+    return jsonify({
+        'status': 'healthy',
+        'fetcher': fetcher.pool_stats(),
+        'http_cache': fetcher.http_cache_stats(),
+        'scan_cache': scan_cache.stats(),
+        'ai_cache': recommendation_cache.stats(),
+        'summary_cache': summary_completions.stats(),
+        'summarize_jobs': summarize_scheduler.stats(),
+        'tasks': {
+            'status': task_status.stats(),
+            'results': task_results.stats(),
+            'events': event_bus.stats()
+        }
+    })
 
 if __name__ == '__main__':  
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,372 @@
+"""
+Async (ASGI) serving mode for the endpoints that hold connections open:
+/scan, /events/<task_id> and /ai-recommendation, plus what the page needs
+alongside them. SSE subscribers and in-flight fetches and model calls wait
+on the event loop instead of each holding a worker thread.
+
+    uvicorn asgi:application --workers 4
+
+State (caches, task store, event bus, summarization scheduler) is shared
+with app.py. Every other endpoint is passed through to the Flask app, which
+runs on a thread per request as it would under a WSGI server. Set
+EVENT_BUS_PATH and TASK_STORE_PATH when running more than one worker.
+"""
+import asyncio
+import io
+import json
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from flask import render_template
+import metrics
+from app import (
+    app as flask_app,
+    deployment,
+    elapsed_ms,
+    event_bus,
+    fetcher,
+    generate_ai_recommendations_batch,
+    recommendation_cache,
+    recommendation_messages,
+    recommendation_params,
+    scan_fetched_page,
+    server_timing,
+    summarize_scheduler,
+    task_results,
+    task_status,
+)
+
+def header(scope, name):
+    """Value of a request header, or '' if it is missing"""
+    name = name.lower().encode('latin-1')
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return ''
+
+def tenant(scope):
+    return header(scope, 'X-Tenant-ID') or (scope.get('client') or ('unknown',))[0]
+
+async def read_json(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    return json.loads(body) if body else None
+
+async def send_response(send, body, status=200, content_type='application/json'):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type.encode('latin-1'))],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+async def send_json(send, data, status=200):
+    await send_response(send, json.dumps(data).encode('utf-8'), status)
+
+async def send_stream(receive, send, status, headers, chunks):
+    """Send an async iterator of body bytes, stopping early if the client disconnects"""
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+
+    async def pump():
+        async with aclosing(chunks):
+            async for chunk in chunks:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def wait_for_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(wait_for_disconnect())]
+    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    for task in done:
+        task.result()
+
+async def send_event_stream(receive, send, chunks):
+    """Send an async iterator of SSE strings, stopping early if the client disconnects"""
+    async def encoded():
+        async with aclosing(chunks):
+            async for chunk in chunks:
+                yield chunk.encode('utf-8')
+
+    await send_stream(receive, send, 200, [
+        (b'content-type', b'text/event-stream; charset=utf-8'), (b'cache-control', b'no-cache')
+    ], encoded())
+
+def wsgi_environ(scope, body):
+    """WSGI environ of an ASGI http request whose body has been read"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        value = value.decode('latin-1')
+        environ[name] = f'{environ[name]},{value}' if name in environ else value
+    # The body is read whole, chunked or not
+    environ['CONTENT_LENGTH'] = str(len(body))
+    return environ
+
+async def wsgi_fallback(scope, receive, send):
+    """
+    Serve a request with the Flask app. The app call and each chunk of its
+    response run one after another on a thread kept for the request, so
+    streamed responses (/crawl, /scan/stream) neither block the event loop
+    nor get closed while a chunk is being read
+    """
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='wsgi')
+    started = []
+
+    def start_response(status, headers, exc_info=None):
+        headers = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        started[:] = [int(status.split(' ', 1)[0]), headers]
+
+    response = None
+    try:
+        response = await loop.run_in_executor(executor, flask_app, wsgi_environ(scope, body), start_response)
+        chunks = iter(response)
+        # start_response() may wait for the first chunk
+        first = await loop.run_in_executor(executor, next, chunks, None)
+
+        async def body_chunks():
+            chunk = first
+            while chunk is not None:
+                if chunk:
+                    yield chunk
+                chunk = await loop.run_in_executor(executor, next, chunks, None)
+
+        await send_stream(receive, send, *started, body_chunks())
+    finally:
+        # Queued behind any read still running, and not waited for after a disconnect
+        if hasattr(response, 'close'):
+            executor.submit(response.close)
+        executor.shutdown(wait=False)
+
+async def index(scope, receive, send):
+    with flask_app.app_context():
+        html = render_template('index.html')
+    await send_response(send, html.encode('utf-8'), content_type='text/html; charset=utf-8')
+
+async def scan(scope, receive, send):
+    """Scan a URL for SEO vulnerabilities"""
+    try:
+        data = await read_json(receive)
+        url = data.get('url', '').strip()
+
+        if not url:
+            return await send_json(send, {
+                'success': False,
+                'error': 'Please enter a URL'
+            })
+
+        # Push back before fetching when the summarization queue is already full
+        if summarize_scheduler.is_full():
+            return await send_json(send, {
+                'success': False,
+                'error': 'Too many scans in progress, please try again shortly'
+            }, 429)
+
+        start = time.perf_counter()
+        fetch_result = await fetcher.fetch_url_async(url)
+
+        if not fetch_result['success']:
+            return await send_json(send, {
+                'success': False,
+                'error': f'Failed to fetch URL: {fetch_result["error"]}'
+            })
+
+        # Parsing is CPU-bound, so it runs off the event loop
+        body, status = await asyncio.to_thread(
+            scan_fetched_page, url, fetch_result, tenant(scope), {'fetch_ms': elapsed_ms(start)}
+        )
+        await send_json(send, body, status)
+
+    except Exception as e:
+        await send_json(send, {
+            'success': False,
+            'error': f'An error occurred: {str(e)}'
+        })
+
+async def events(scope, receive, send, task_id):
+    """Server-Sent Events endpoint for real-time updates"""
+    # EventSource sends the id of the last event it saw when it reconnects
+    last_event_id = header(scope, 'Last-Event-ID')
+    after = int(last_event_id) if last_event_id.isdigit() else 0
+
+    async def event_stream():
+        async with aclosing(event_bus.asubscribe(task_id, after, heartbeat=30)) as subscription:
+            async for event in subscription:
+                if event is None:
+                    yield f"event: heartbeat\ndata: {json.dumps({'timestamp': time.time()})}\n\n"
+                    continue
+
+                yield f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+                if event['event'] in ['summary_complete', 'summary_error', 'summary_cancelled']:
+                    break
+
+    await send_event_stream(receive, send, event_stream())
+
+async def ai_recommendation(scope, receive, send):
+    """Get AI-powered recommendations for SEO optimization"""
+    try:
+        data = await read_json(receive)
+        messages = recommendation_messages(
+            data.get('issue_type', ''),
+            data.get('description', ''),
+            data.get('current_content', ''),
+            data.get('context', '')
+        )
+
+        if data.get('stream'):
+            # Server-sent events: recommendation_delta as tokens arrive, then recommendation_complete
+            async def event_stream():
+                parts = []
+                try:
+                    async for delta in recommendation_cache.astream(deployment, messages, **recommendation_params):
+                        parts.append(delta)
+                        yield f"event: recommendation_delta\ndata: {json.dumps({'delta': delta})}\n\n"
+                    yield f"event: recommendation_complete\ndata: {json.dumps({'recommendations': [''.join(parts)]})}\n\n"
+                except Exception as e:
+                    yield f"event: recommendation_error\ndata: {json.dumps({'error': f'Failed to generate recommendations: {str(e)}'})}\n\n"
+
+            return await send_event_stream(receive, send, event_stream())
+
+        response = await recommendation_cache.acomplete(deployment, messages, **recommendation_params)
+        await send_json(send, {
+            'success': True,
+            'recommendations': [response]
+        })
+
+    except Exception as e:
+        await send_json(send, {
+            'success': False,
+            'error': f'Failed to generate recommendations: {str(e)}'
+        })
+
+async def ai_recommendations_batch(scope, receive, send):
+    """Get AI-powered recommendations for all issues of a scan in one round trip"""
+    try:
+        data = await read_json(receive)
+        issues = data.get('issues', [])
+
+        if not issues:
+            return await send_json(send, {
+                'success': False,
+                'error': 'No issues given'
+            })
+
+        # The batch path falls back to a thread pool of per-issue calls, so it keeps its thread
+        recommendations, fallbacks = await asyncio.to_thread(
+            generate_ai_recommendations_batch, issues, data.get('context', '')
+        )
+        await send_json(send, {
+            'success': True,
+            'recommendations': recommendations,
+            'fallbacks': fallbacks
+        })
+
+    except Exception as e:
+        await send_json(send, {
+            'success': False,
+            'error': f'Failed to generate recommendations: {str(e)}'
+        })
+
+async def get_task_status(scope, receive, send, task_id):
+    """Get current status of a background task"""
+    await send_json(send, {
+        'task_id': task_id,
+        'status': task_status.get(task_id, 'not_found'),
+        'result': task_results.get(task_id, {})
+    })
+
+async def metrics_endpoint(scope, receive, send):
+    """Stage timings and request counters of this worker in the Prometheus text format"""
+    await send_response(send, metrics.registry.render().encode('utf-8'), content_type='text/plain; version=0.0.4')
+
+ROUTES = [
+    ('GET', re.compile(r'/'), index),
+    ('POST', re.compile(r'/scan'), scan),
+    ('GET', re.compile(r'/events/(?P<task_id>[^/]+)'), events),
+    ('POST', re.compile(r'/ai-recommendation'), ai_recommendation),
+    ('POST', re.compile(r'/ai-recommendation/batch'), ai_recommendations_batch),
+    ('GET', re.compile(r'/task_status/(?P<task_id>[^/]+)'), get_task_status),
+    ('GET', re.compile(r'/metrics'), metrics_endpoint),
+]
+
+async def application(scope, receive, send):
+    """ASGI entry point"""
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await fetcher.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    if scope['type'] != 'http':
+        return
+
+    for method, pattern, handler in ROUTES:
+        match = pattern.fullmatch(scope['path'])
+        if match and scope['method'] == method:
+            break
+    else:
+        # The Flask app records its own metrics and Server-Timing header
+        return await wsgi_fallback(scope, receive, send)
+
+    start = time.perf_counter()
+    if server_timing:
+        metrics.start_request()
+    status = []
+
+    async def send_timed(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+            if server_timing:
+                headers = list(message['headers']) + [(b'server-timing', metrics.server_timing().encode('latin-1'))]
+                message = dict(message, headers=headers)
+        await send(message)
+
+    endpoint = handler.__name__
+    try:
+        await handler(scope, receive, send_timed, **match.groupdict())
+    finally:
+        metrics.http_requests.inc(endpoint=endpoint, method=scope['method'], status=status[0] if status else 500)
+        metrics.http_request_duration.observe(time.perf_counter() - start, endpoint=endpoint)
@@ -0,0 +1,445 @@
+"""
+Offline batch scanning: stream saved pages through HTMLSEOScanner on a pool
+of worker processes and write one result per page to JSONL or Parquet.
+
+    python batchscan.py site-mirror/ -o findings.jsonl
+    python batchscan.py pages.jsonl.gz --format parquet -o findings.parquet
+    python batchscan.py site-mirror/sitemap.xml --base-url https://example.com
+    python batchscan.py crawl.warc.gz --workers 8 --extract
+    python batchscan.py daily.jsonl.gz --state audit-state.db -o findings.jsonl
+    python batchscan.py site-mirror/ --rules client-rules.yaml
+
+Inputs are read lazily and only a few pages per worker are in flight, so
+memory stays flat however many pages the input holds.
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+import zlib
+import xml.etree.ElementTree as ElementTree
+from collections import deque
+from urllib.parse import unquote, urljoin, urlparse
+from scanpool import ScanPool
+from ruleconfig import load_rule_config
+import webalgo
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pyarrow is only needed for Parquet output
+    pyarrow = None
+
+# File extensions read as HTML pages when scanning a directory
+HTML_EXTENSIONS = ('.html', '.htm', '.xhtml')
+
+# Pages larger than this are reported as errors instead of scanned
+MAX_PAGE_BYTES = 10 * 1024 * 1024
+
+def open_input(path, mode='rb'):
+    """Open a file for reading, decompressing it on the fly if it ends in .gz"""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode) if 'b' in mode else gzip.open(path, mode, encoding='utf-8')
+    return open(path, mode) if 'b' in mode else open(path, mode, encoding='utf-8')
+
+def read_page(path):
+    """Contents of a saved page, undecodable bytes replaced"""
+    if os.path.getsize(path) > MAX_PAGE_BYTES:
+        raise ValueError(f'page is larger than {MAX_PAGE_BYTES} bytes')
+    with open(path, 'rb') as page:
+        return page.read().decode('utf-8', errors='replace')
+
+def page_record(source, url, path):
+    """Record for a page on disk, or an error record if it cannot be read"""
+    try:
+        return {'source': source, 'url': url, 'html': read_page(path)}
+    except (OSError, ValueError) as e:
+        return {'source': source, 'url': url, 'error': str(e)}
+
+def iter_directory(root, base_url=None):
+    """
+    Records for every HTML file under a directory, in a stable order. With
+    base_url, each file's URL is its path below root joined onto base_url
+    """
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories.sort()
+        for filename in sorted(filenames):
+            if not filename.lower().endswith(HTML_EXTENSIONS):
+                continue
+            path = os.path.join(directory, filename)
+            relative = os.path.relpath(path, root).replace(os.sep, '/')
+            url = urljoin(base_url.rstrip('/') + '/', relative) if base_url else None
+            yield page_record(relative, url, path)
+
+def iter_jsonl(path):
+    """Records from a JSONL file (optionally gzipped) of {"url": ..., "html": ...} objects"""
+    with open_input(path, 'rt') as lines:
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            source = f'{path}:{number}'
+            try:
+                data = json.loads(line)
+            except ValueError as e:
+                yield {'source': source, 'url': None, 'error': f'Invalid JSON: {e}'}
+                continue
+            if not isinstance(data, dict):
+                yield {'source': source, 'url': None, 'error': 'Record is not a JSON object'}
+                continue
+            if not isinstance(data.get('html'), str):
+                yield {'source': source, 'url': data.get('url'), 'error': 'Record has no "html" string'}
+                continue
+            yield {'source': source, 'url': data.get('url'), 'html': data['html']}
+
+def local_page_path(root, url):
+    """
+    The file under root that holds a mirrored page: /about/ is
+    about/index.html, /about is about, about.html or about/index.html.
+    None if there is no such file or the URL points outside root
+    """
+    path = unquote(urlparse(url).path).lstrip('/')
+    if not path or path.endswith('/'):
+        candidates = [os.path.join(root, path, 'index.html')]
+    else:
+        candidates = [os.path.join(root, path), os.path.join(root, path + '.html'), os.path.join(root, path, 'index.html')]
+    root = os.path.abspath(root)
+    for candidate in candidates:
+        candidate = os.path.abspath(candidate)
+        if candidate.startswith(root + os.sep) and os.path.isfile(candidate):
+            return candidate
+    return None
+
+def iter_sitemap_urls(path):
+    """
+    (kind, url) for every <loc> of a sitemap, kind being 'sitemapindex' or
+    'urlset'. The file is parsed incrementally, so large sitemaps are fine
+    """
+    kind = None
+    with open_input(path) as sitemap:
+        for event, element in ElementTree.iterparse(sitemap, events=('start', 'end')):
+            # Tags carry the sitemap namespace, as in {http://...}loc
+            tag = element.tag.rsplit('}', 1)[-1]
+            if event == 'start':
+                if kind is None:
+                    kind = tag
+                continue
+            if tag == 'loc' and element.text:
+                yield kind, element.text.strip()
+            elif tag in ('url', 'sitemap'):
+                element.clear()
+
+def iter_sitemap(path, seen=None):
+    """
+    Records for the pages listed in a local sitemap.xml, read from the site
+    mirror the sitemap sits in. Child sitemaps of a sitemap index are looked
+    up by file name next to it
+    """
+    root = os.path.dirname(os.path.abspath(path))
+    seen = seen if seen is not None else set()
+    seen.add(os.path.abspath(path))
+    for kind, url in iter_sitemap_urls(path):
+        if kind == 'sitemapindex':
+            child = os.path.join(root, os.path.basename(urlparse(url).path))
+            if os.path.abspath(child) in seen:
+                continue
+            if not os.path.isfile(child):
+                yield {'source': url, 'url': url, 'error': f'Sitemap {os.path.basename(child)} not found next to {path}'}
+                continue
+            yield from iter_sitemap(child, seen)
+            continue
+        page_path = local_page_path(root, url)
+        if page_path is None:
+            yield {'source': url, 'url': url, 'error': 'Page not found in the local mirror'}
+            continue
+        yield page_record(os.path.relpath(page_path, root), url, page_path)
+
+def read_header_block(stream):
+    """Header lines up to the next blank line, as a dict with lowercase names"""
+    headers = {}
+    while True:
+        line = stream.readline()
+        if not line or not line.strip():
+            return headers
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+def skip_bytes(stream, count, chunk_size=1024 * 1024):
+    """Read past count bytes without holding them in memory (gzip streams cannot seek cheaply)"""
+    while count > 0:
+        chunk = stream.read(min(chunk_size, count))
+        if not chunk:
+            return
+        count -= len(chunk)
+
+def decode_chunked(body):
+    """Body of an HTTP response sent with Transfer-Encoding: chunked"""
+    decoded = []
+    position = 0
+    while True:
+        line_end = body.find(b'\r\n', position)
+        if line_end == -1:
+            break
+        size = int(body[position:line_end].split(b';')[0].strip() or b'0', 16)
+        if size == 0:
+            break
+        decoded.append(body[line_end + 2:line_end + 2 + size])
+        position = line_end + 2 + size + 2
+    return b''.join(decoded)
+
+def http_response_html(block):
+    """
+    HTML of a WARC response block (HTTP status line, headers, body), or None
+    if the response is not a successful text/html page
+    """
+    head, _, body = block.partition(b'\r\n\r\n')
+    lines = head.split(b'\r\n')
+    status = lines[0].split(b' ', 2)
+    if len(status) < 2 or not status[1].isdigit() or not 200 <= int(status[1]) < 300:
+        return None
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    content_type = headers.get('content-type', '')
+    if 'html' not in content_type.lower():
+        return None
+
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        body = decode_chunked(body)
+    encoding = headers.get('content-encoding', '').lower()
+    if encoding in ('gzip', 'x-gzip'):
+        body = gzip.decompress(body)
+    elif encoding == 'deflate':
+        body = zlib.decompress(body)
+
+    charset = 'utf-8'
+    for parameter in content_type.split(';')[1:]:
+        name, _, value = parameter.partition('=')
+        if name.strip().lower() == 'charset' and value.strip():
+            charset = value.strip().strip('"\'')
+    try:
+        return body.decode(charset, errors='replace')
+    except LookupError:
+        return body.decode('utf-8', errors='replace')
+
+def iter_warc(path):
+    """
+    Records for the HTML responses in a WARC file (.warc or .warc.gz).
+    Other record types and non-HTML responses are skipped, one record in
+    memory at a time
+    """
+    with open_input(path) as warc:
+        while True:
+            line = warc.readline()
+            if not line:
+                return
+            if not line.strip():
+                continue
+            if not line.startswith(b'WARC/'):
+                raise ValueError(f'{path}: expected a WARC record header, got {line[:40]!r}')
+            headers = read_header_block(warc)
+            length = int(headers.get('content-length', 0))
+            url = headers.get('warc-target-uri')
+            source = headers.get('warc-record-id', url)
+
+            if headers.get('warc-type') != 'response':
+                skip_bytes(warc, length)
+                continue
+            if length > MAX_PAGE_BYTES:
+                skip_bytes(warc, length)
+                yield {'source': source, 'url': url, 'error': f'page is larger than {MAX_PAGE_BYTES} bytes'}
+                continue
+
+            try:
+                html_content = http_response_html(warc.read(length))
+            except (ValueError, OSError, zlib.error) as e:
+                yield {'source': source, 'url': url, 'error': f'Unreadable response: {e}'}
+                continue
+            if html_content is not None:
+                yield {'source': source, 'url': url, 'html': html_content}
+
+def input_records(path, input_type=None, base_url=None):
+    """Records of an input, its type guessed from the path unless given"""
+    if input_type is None:
+        name = path.lower()
+        if name.endswith('.gz'):
+            name = name[:-3]
+        if os.path.isdir(path):
+            input_type = 'directory'
+        elif name.endswith(('.jsonl', '.ndjson')):
+            input_type = 'jsonl'
+        elif name.endswith('.warc'):
+            input_type = 'warc'
+        elif name.endswith('.xml'):
+            input_type = 'sitemap'
+        else:
+            raise ValueError(f"Cannot tell the input type of '{path}', pass --input-type")
+
+    if input_type == 'directory':
+        return iter_directory(path, base_url)
+    if input_type == 'jsonl':
+        return iter_jsonl(path)
+    if input_type == 'sitemap':
+        return iter_sitemap(path)
+    if input_type == 'warc':
+        return iter_warc(path)
+    raise ValueError(f"Unknown input type '{input_type}'")
+
+class JSONLWriter:
+    """One JSON object per scanned page"""
+    def __init__(self, output):
+        self.output = output
+
+    def write(self, record):
+        self.output.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+    def close(self):
+        self.output.flush()
+
+class ParquetWriter:
+    """
+    One row per scanned page, written in row groups of batch_size rows so
+    only one group is held in memory. Findings are kept as JSON text next
+    to their counts, which is what most queries filter on
+    """
+    def __init__(self, path, extract=False, batch_size=1000):
+        if pyarrow is None:
+            raise ImportError('Parquet output requires the pyarrow package')
+        fields = [
+            ('source', pyarrow.string()),
+            ('url', pyarrow.string()),
+            ('error', pyarrow.string()),
+            ('vulnerabilities', pyarrow.int32()),
+            ('warnings', pyarrow.int32()),
+            ('recommendations', pyarrow.int32()),
+            ('findings', pyarrow.string()),
+        ]
+        if extract:
+            fields += [
+                ('title', pyarrow.string()),
+                ('meta_description', pyarrow.string()),
+                ('body_text', pyarrow.string()),
+            ]
+        self.schema = pyarrow.schema(fields)
+        self.extract = extract
+        self.batch_size = batch_size
+        self.rows = []
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write(self, record):
+        results = record.get('results')
+        row = {
+            'source': record['source'],
+            'url': record['url'],
+            'error': record.get('error'),
+            'vulnerabilities': len(results['vulnerabilities']) if results else None,
+            'warnings': len(results['warnings']) if results else None,
+            'recommendations': len(results['recommendations']) if results else None,
+            'findings': json.dumps(results, ensure_ascii=False) if results else None,
+        }
+        if self.extract:
+            content = record.get('content') or {}
+            row.update({name: content.get(name) for name in ('title', 'meta_description', 'body_text')})
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.writer.write_table(pyarrow.Table.from_pylist(self.rows, schema=self.schema))
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+def scan_records(records, writer, workers=None, parser='html.parser', extract=False, max_pending=None,
+                 state_path=None, config=None):
+    """
+    Scan records on a process pool and write a result for each, in input
+    order. Records that could not be read are written with their error.
+    With state_path, pages scanned before under the same URL only re-run
+    the checks whose part of the page changed. config is the
+    ruleconfig.RuleConfig to check with, default thresholds if None.
+    Returns {'pages', 'errors', 'seconds'}
+    """
+    stats = {'pages': 0, 'errors': 0}
+    start = time.perf_counter()
+    # Records read ahead by the pool, without their HTML, waiting for their results
+    waiting = deque()
+
+    def documents():
+        for record in records:
+            html_content = record.pop('html', None)
+            waiting.append(record)
+            if 'error' not in record:
+                yield record['url'], html_content
+
+    def write(record):
+        stats['pages'] += 1
+        if 'error' in record:
+            stats['errors'] += 1
+        writer.write(record)
+
+    with ScanPool(workers=workers, parser=parser, state_path=state_path, config=config) as pool:
+        for result in pool.scan_iter_json(documents(), extract, max_pending):
+            # Records that failed to read come out in their place in the input order
+            while 'error' in waiting[0]:
+                write(waiting.popleft())
+            record = waiting.popleft()
+            record.update(json.loads(result))
+            write(record)
+    while waiting:
+        write(waiting.popleft())
+
+    stats['seconds'] = round(time.perf_counter() - start, 3)
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Scan saved pages for SEO issues without the web app')
+    parser.add_argument('input', help='directory of HTML files, JSONL of {url, html}, local sitemap.xml, or WARC (.gz allowed)')
+    parser.add_argument('--input-type', choices=['directory', 'jsonl', 'sitemap', 'warc'], help='default: guessed from the path')
+    parser.add_argument('-o', '--output', default='-', help="output file, '-' for stdout (JSONL only)")
+    parser.add_argument('--format', choices=['jsonl', 'parquet'], default='jsonl')
+    parser.add_argument('--workers', type=int, help='worker processes (default: one per core)')
+    parser.add_argument('--parser', default='html.parser', choices=webalgo.PARSERS)
+    parser.add_argument('--extract', action='store_true', help='also extract title, meta description and body text')
+    parser.add_argument('--base-url', help='URL of the directory root, so directory pages get URLs for the URL checks')
+    parser.add_argument('--max-pending', type=int, help='pages read ahead of the workers (default: two chunks of pages per worker)')
+    parser.add_argument('--state', help='SQLite file of findings from earlier runs; pages with a URL then only '
+                                        're-run the checks whose part of the page changed')
+    parser.add_argument('--rules', help='JSON or YAML rule config with the check thresholds and patterns')
+    args = parser.parse_args(argv)
+
+    try:
+        config = load_rule_config(args.rules) if args.rules else None
+    except (OSError, ValueError) as e:
+        parser.error(f'Invalid rule config: {e}')
+
+    records = input_records(args.input, args.input_type, args.base_url)
+    if args.format == 'parquet':
+        if args.output == '-':
+            parser.error('Parquet output needs a file, pass -o')
+        writer = ParquetWriter(args.output, args.extract)
+        output = None
+    else:
+        output = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+        writer = JSONLWriter(output)
+
+    try:
+        stats = scan_records(
+            records, writer, args.workers, args.parser, args.extract, args.max_pending, args.state, config
+        )
+    finally:
+        writer.close()
+        if output is not None and output is not sys.stdout:
+            output.close()
+
+    rate = stats['pages'] / stats['seconds'] if stats['seconds'] else 0
+    print(f"{stats['pages']} pages ({stats['errors']} errors) in {stats['seconds']:.1f}s, {rate:.1f} pages/s",
+          file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,504 @@
+import argparse
+import asyncio
+import gc
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import threading
+import tracemalloc
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import webalgo
+from webalgo import HTMLSEOScanner, ParsedDocument, SEO_RULES
+from fetcher import URLFetcher
+from scanpool import ScanPool
+from ruleconfig import RuleConfig
+
+
+def generate_page(sections=500, depth=1, images=1, classes=2):
+    """
+    Build a synthetic page with the elements the scanner looks at.
+    Each section is nested `depth` divs deep and holds `images` images,
+    and every section div carries `classes` class names
+    """
+    class_names = ' '.join((['content', 'row'] + [f'u-{k}' for k in range(2, classes)])[:classes])
+    div = f'<div class="{class_names}">' if class_names else '<div>'
+    parts = [
+        '<html><head><title>Benchmark page with a reasonably descriptive title</title>',
+        '<meta name="description" content="' + 'x' * 130 + '">',
+        '<link rel="canonical" href="https://example.com/benchmark"></head><body>',
+        '<header class="site-header"><nav class="menu">Home</nav></header>',
+    ]
+    for i in range(sections):
+        parts.append(
+            div * depth + f'<h2>Section {i}</h2>'
+            f'<p>Paragraph {i} lorem ipsum dolor sit amet.</p>'
+            + ''.join(f'<img src="img{i}{f"-{k}" if k else ""}.jpg" alt="Image {i}">' for k in range(images))
+            + '<div class="share social">Share</div>' + '</div>' * depth
+        )
+    parts.append('<footer>Footer</footer></body></html>')
+    return ''.join(parts)
+
+
+class ParseCounter:
+    """Count BeautifulSoup parses made by the scanner module"""
+    def __init__(self):
+        self.count = 0
+        self.original = webalgo.BeautifulSoup
+
+    def __enter__(self):
+        def counting_parser(*args, **kwargs):
+            self.count += 1
+            return self.original(*args, **kwargs)
+        webalgo.BeautifulSoup = counting_parser
+        return self
+
+    def __exit__(self, *exc):
+        webalgo.BeautifulSoup = self.original
+
+
+def scan_pipeline(html, url, shared):
+    """Run extraction and scanning the way the /scan route does"""
+    scanner = HTMLSEOScanner()
+    if shared:
+        html = scanner.parse(html)
+    scanner.extract_page_content(html)
+    return scanner.scan_html(html, url)
+
+
+def benchmark_parse_sharing(rounds=5, sections=500):
+    """Compare parsing per call against one shared parse per scan"""
+    html = generate_page(sections)
+    url = 'https://example.com/benchmark'
+    for shared in (False, True):
+        with ParseCounter() as counter:
+            start = time.perf_counter()
+            for _ in range(rounds):
+                scan_pipeline(html, url, shared)
+            elapsed = (time.perf_counter() - start) / rounds
+        label = 'shared document' if shared else 'parse per call'
+        print(f"{label:>16}: {counter.count / rounds:.0f} parse(s) per scan, {elapsed * 1000:.1f} ms per scan")
+
+
+def benchmark_parsers(rounds=5, sections=500):
+    """Time a full scan on each available parser backend and compare findings with html.parser"""
+    html = generate_page(sections)
+    url = 'https://example.com/benchmark'
+    reference = None
+    for parser in webalgo.PARSERS:
+        try:
+            scanner = HTMLSEOScanner(parser=parser)
+            document = scanner.parse(html)
+        except ImportError as e:
+            print(f"{parser:>16}: skipped ({e})")
+            continue
+        start = time.perf_counter()
+        for _ in range(rounds):
+            document = scanner.parse(html)
+            content = scanner.extract_page_content(document)
+            results = scanner.scan_html(document, url)
+        elapsed = (time.perf_counter() - start) / rounds
+        if reference is None:
+            reference = (content, results)
+        parity = 'identical' if (content, results) == reference else 'DIFFERENT'
+        print(f"{parser:>16}: {elapsed * 1000:.1f} ms per scan, findings {parity}")
+
+
+class PageServer:
+    """Local keep-alive HTTP server standing in for a scanned site"""
+    def __init__(self, body):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes; avoid delayed-ACK stalls on keep-alive
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def benchmark_connection_reuse(rounds=200, sections=50):
+    """Compare a new URLFetcher per scan with one shared, pooled fetcher on repeated same-host fetches"""
+    body = generate_page(sections).encode('utf-8')
+    with PageServer(body) as server:
+        start = time.perf_counter()
+        for i in range(rounds):
+            URLFetcher().fetch_url(f'{server.url}/page-{i}')
+        per_request = (time.perf_counter() - start) / rounds
+
+        fetcher = URLFetcher()
+        start = time.perf_counter()
+        for i in range(rounds):
+            fetcher.fetch_url(f'{server.url}/page-{i}')
+        shared = (time.perf_counter() - start) / rounds
+        stats = fetcher.pool_stats()
+
+    print(f"{'fetcher per scan':>16}: {per_request * 1000:.2f} ms per fetch, {rounds} new connections")
+    print(f"{'shared fetcher':>16}: {shared * 1000:.2f} ms per fetch, "
+          f"{stats['new_connections']} new connection(s), {stats['pool_hits']} pool hits")
+
+
+def benchmark_scan_pool(documents=64, sections=200):
+    """Throughput of batch scans on the process pool with 1, 2, 4... workers up to the core count"""
+    docs = [generate_page(sections) for _ in range(documents)]
+    cores = os.cpu_count() or 1
+
+    start = time.perf_counter()
+    scanner = HTMLSEOScanner()
+    for html in docs:
+        scanner.scan_html(html)
+    baseline = documents / (time.perf_counter() - start)
+    print(f"{'in process':>16}: {baseline:.1f} docs/s")
+
+    workers = 1
+    while workers <= cores:
+        with ScanPool(workers=workers) as pool:
+            start = time.perf_counter()
+            pool.scan_many(docs)
+            throughput = documents / (time.perf_counter() - start)
+        print(f"{f'{workers} worker(s)':>16}: {throughput:.1f} docs/s, {throughput / baseline:.2f}x")
+        workers *= 2
+
+
+def benchmark_rule_evaluation(pages=2000, images=8):
+    """
+    Threshold checks of many small pages: one page at a time through
+    scan_html() against one scan_batch() call, and the threshold tables alone
+    one value at a time against whole columns, for the default and a custom
+    config
+    """
+    docs = [generate_page(sections=2, images=images) for _ in range(pages)]
+    configs = {'default': RuleConfig(), 'custom': RuleConfig({'title': {'min_length': 40}, 'image_alt': {'max_length': 100}})}
+    for name, config in configs.items():
+        scanner = HTMLSEOScanner(config=config)
+        start = time.perf_counter()
+        for html in docs:
+            scanner.scan_html(html)
+        per_page = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scanner.scan_batch(docs)
+        batch = time.perf_counter() - start
+        print(f"{name + ' scans':>16}: per page {pages / per_page:.0f} pages/s, batch {pages / batch:.0f} pages/s")
+
+        counts = [1] * (pages * images)
+        lengths = [i % 200 for i in range(pages * images)]
+        start = time.perf_counter()
+        for length in lengths:
+            config.classify('image_alt', 1, length)
+        one_at_a_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        config.classify_columns('image_alt', counts, lengths)
+        columns = time.perf_counter() - start
+        print(f"{name + ' tables':>16}: {len(lengths)} values one at a time {one_at_a_time * 1000:.1f} ms, "
+              f"as columns {columns * 1000:.1f} ms")
+
+
+def process_usage(pid):
+    """Thread count and resident memory in MB of a process (reads /proc, so Linux only)"""
+    usage = {}
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            key, _, value = line.partition(':')
+            if key == 'Threads':
+                usage['threads'] = int(value)
+            elif key == 'VmRSS':
+                usage['rss_mb'] = int(value.split()[0]) / 1024
+    return usage
+
+
+def start_server(command, port, timeout=30):
+    """Run a server process from the repo directory and wait until it accepts connections"""
+    process = subprocess.Popen(
+        command, cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server for port {port} exited; is the port already in use?')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'Server on port {port} did not start')
+
+
+async def open_sse_connections(port, count, concurrency=100, settle=3):
+    """
+    Open `count` idle /events streams and return their writers. Werkzeug only
+    sends the headers with the first event, so instead of waiting for them
+    the server gets `settle` seconds to pick up every request
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def connect(index):
+        async with semaphore:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(f'GET /events/idle-{index} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+            await writer.drain()
+            return writer
+
+    writers = await asyncio.gather(*[connect(index) for index in range(count)])
+    await asyncio.sleep(settle)
+    return writers
+
+
+def request_latency(url, rounds=20):
+    """Median latency in ms of a small request"""
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        urllib.request.urlopen(url).read()
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[rounds // 2] * 1000
+
+
+def benchmark_sse_connections(connections=1000):
+    """
+    Resources one server process uses to hold idle SSE clients: the Flask app
+    (a thread per connection) against the ASGI app under uvicorn
+    """
+    servers = [
+        ('flask', [sys.executable, '-c', 'import app; app.app.run(port=8797, threaded=True)'], 8797),
+        ('asgi', [sys.executable, '-m', 'uvicorn', 'asgi:application', '--port', '8798', '--log-level', 'warning'], 8798),
+    ]
+    for name, command, port in servers:
+        if name == 'asgi':
+            try:
+                import uvicorn
+            except ImportError:
+                print(f"{name:>16}: skipped, uvicorn is not installed")
+                continue
+
+        process = start_server(command, port)
+        try:
+            idle = process_usage(process.pid)
+            latency_idle = request_latency(f'http://127.0.0.1:{port}/task_status/probe')
+
+            async def hold():
+                writers = await open_sse_connections(port, connections)
+                loaded = process_usage(process.pid)
+                # Probe from a thread, since this loop owns the open connections
+                latency = await asyncio.to_thread(request_latency, f'http://127.0.0.1:{port}/task_status/probe')
+                for writer in writers:
+                    writer.close()
+                return loaded, latency
+
+            loaded, latency = asyncio.run(hold())
+        finally:
+            process.terminate()
+            process.wait()
+
+        print(f"{name:>16}: {connections} open streams, "
+              f"threads {idle['threads']} -> {loaded['threads']}, "
+              f"RSS {idle['rss_mb']:.0f} -> {loaded['rss_mb']:.0f} MB "
+              f"({(loaded['rss_mb'] - idle['rss_mb']) * 1024 / connections:.1f} KB per stream), "
+              f"request latency {latency_idle:.1f} -> {latency:.1f} ms")
+
+
+# Synthetic pages of the suite, each stretching one dimension of generate_page()
+SUITE_CASES = [
+    ('small', {'sections': 20}),
+    ('large', {'sections': 500}),
+    ('deep', {'sections': 200, 'depth': 40}),
+    ('image-heavy', {'sections': 200, 'images': 10}),
+    ('class-dense', {'sections': 500, 'classes': 20}),
+]
+
+# Saved real-world pages: a long article, a utility-class product grid and an API docs page
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_pages')
+
+
+def suite_pages():
+    """(name, html) of every page the suite measures"""
+    pages = [(name, generate_page(**options)) for name, options in SUITE_CASES]
+    for filename in sorted(os.listdir(PAGES_DIR)):
+        if filename.endswith('.html'):
+            with open(os.path.join(PAGES_DIR, filename), encoding='utf-8') as page:
+                pages.append((f'saved/{filename[:-5]}', page.read()))
+    return pages
+
+
+def suite_steps(html, url, parser):
+    """
+    (step, function) of everything measured on a page. parse and scan start
+    from the HTML; the other steps reuse one parsed document, so each check
+    is timed as its own walk and report, and each extraction step on its own
+    """
+    scanner = HTMLSEOScanner(parser=parser)
+    document = scanner.parse(html)
+    document.tree
+
+    def check(rule):
+        def run():
+            scanner = HTMLSEOScanner(parser=parser, rules=[rule])
+            return scanner.collect_findings(scanner._run_rules(document))
+        return run
+
+    steps = [
+        ('parse', lambda: ParsedDocument(html, parser).tree),
+        ('scan', lambda: HTMLSEOScanner(parser=parser).scan_html(html, url)),
+        ('walk', lambda: scanner._run_rules(document)),
+    ]
+    steps += [(f'check:{rule.__name__}', check(rule)) for rule in SEO_RULES]
+    steps += [
+        ('check:url_structure', lambda: scanner._check_url_structure(url)),
+        ('extract', lambda: scanner.extract_page_content(document)),
+        ('extract:title', lambda: scanner._extract_title(document)),
+        ('extract:meta_description', lambda: scanner._extract_meta_description(document)),
+        ('extract:body_text', lambda: scanner._extract_body_text(document)),
+    ]
+    return steps
+
+
+def measure(function, rounds):
+    """
+    Best-of-rounds time in ms, then one traced run for memory: peak_kb is the
+    most memory held at once during the call and net_kb what is still
+    allocated when it returns, its result included
+    """
+    # Like timeit, keep collection pauses out of the timings
+    gc.collect()
+    gc.disable()
+    try:
+        best = None
+        for _ in range(rounds):
+            start = time.perf_counter()
+            function()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        gc.enable()
+
+    # Tracing slows every allocation down, so it gets a run of its own
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        result = function()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return {
+        'ms': round(best * 1000, 4),
+        'peak_kb': round((peak - before) / 1024, 1),
+        'net_kb': round((current - before) / 1024, 1),
+    }
+
+
+def run_suite(rounds=5, parser='html.parser'):
+    """Measure every step on every suite page; returns {page: {'kb': size, 'steps': {step: measurement}}}"""
+    url = 'https://example.com/benchmark/page'
+    results = {}
+    for name, html in suite_pages():
+        size_kb = len(html.encode('utf-8')) / 1024
+        steps = {step: measure(function, rounds) for step, function in suite_steps(html, url, parser)}
+        results[name] = {'kb': round(size_kb, 1), 'steps': steps}
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold, min_ms):
+    """
+    Steps whose throughput fell by more than `threshold` (0.2 = 20%) against
+    the baseline, as (page, step, baseline ms, ms). Steps that took under
+    min_ms in the baseline are too noisy to compare and are left out
+    """
+    regressions = []
+    for name, page in results.items():
+        baseline_steps = baseline.get(name, {}).get('steps', {})
+        for step, measurement in page['steps'].items():
+            before = baseline_steps.get(step)
+            if before is None or before['ms'] < min_ms:
+                continue
+            if before['ms'] / measurement['ms'] < 1 - threshold:
+                regressions.append((name, step, before['ms'], measurement['ms']))
+    return regressions
+
+
+def benchmark_suite(rounds=5, parser='html.parser', baseline_path=None, save_baseline=None,
+                    threshold=0.2, min_ms=0.5):
+    """
+    Time and memory of every check and extraction step across the suite pages.
+    Returns False when a step regressed past `threshold` against the saved baseline
+    """
+    results = run_suite(rounds, parser)
+    baseline = None
+    if baseline_path:
+        with open(baseline_path) as f:
+            saved = json.load(f)
+        if saved['parser'] != parser:
+            print(f"warning: baseline was measured with {saved['parser']}, this run uses {parser}")
+        baseline = saved['pages']
+
+    for name, page in results.items():
+        print(f"{name} ({page['kb']:.0f} KB)")
+        for step, measurement in page['steps'].items():
+            line = (f"  {step:>26}: {measurement['ms']:9.3f} ms {page['kb'] / 1024 / (measurement['ms'] / 1000):8.1f} MB/s "
+                    f"peak {measurement['peak_kb']:8.1f} KB, net {measurement['net_kb']:8.1f} KB")
+            before = (baseline or {}).get(name, {}).get('steps', {}).get(step)
+            if before:
+                line += f", {before['ms'] / measurement['ms']:.2f}x baseline throughput"
+            print(line)
+
+    if save_baseline:
+        with open(save_baseline, 'w') as f:
+            json.dump({'parser': parser, 'rounds': rounds, 'python': sys.version.split()[0], 'pages': results}, f, indent=1)
+        print(f"baseline saved to {save_baseline}")
+
+    if baseline is None:
+        return True
+    regressions = compare_to_baseline(results, baseline, threshold, min_ms)
+    for name, step, before, after in regressions:
+        print(f"REGRESSION {name} {step}: {before:.3f} -> {after:.3f} ms ({before / after:.2f}x throughput)")
+    if not regressions:
+        print(f"no step lost more than {threshold:.0%} throughput against {baseline_path}")
+    return not regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Scanner benchmarks; with no command, runs all of them except the suite')
+    commands = parser.add_subparsers(dest='command')
+    suite = commands.add_parser('suite', help='time and memory per check and extraction step, compared against a baseline')
+    suite.add_argument('--rounds', type=int, default=5, help='timed runs per step; the fastest counts')
+    suite.add_argument('--parser', default='html.parser', choices=webalgo.PARSERS)
+    suite.add_argument('--baseline', help='baseline JSON to compare against; exits 1 on a regression')
+    suite.add_argument('--save-baseline', help='write this run to a baseline JSON')
+    suite.add_argument('--threshold', type=float, default=0.2, help='throughput loss that fails the run (default 0.2)')
+    suite.add_argument('--min-ms', type=float, default=0.5, help='skip comparing steps faster than this in the baseline')
+    args = parser.parse_args()
+
+    if args.command == 'suite':
+        passed = benchmark_suite(args.rounds, args.parser, args.baseline, args.save_baseline, args.threshold, args.min_ms)
+        sys.exit(0 if passed else 1)
+
+    benchmark_parse_sharing()
+    benchmark_parsers()
+    benchmark_connection_reuse()
+    benchmark_scan_pool()
+    benchmark_rule_evaluation()
+    benchmark_sse_connections()
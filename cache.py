@@ -0,0 +1,234 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+class LRUCache:
+    """
+    Thread-safe in-memory cache with a maximum entry count and a TTL.
+    The least recently used entry is evicted when the cache is full.
+    Cached values are shared, so callers must treat them as read-only.
+    """
+    def __init__(self, max_entries=1024, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Return the cached value, or None if it is missing or expired"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                self.expirations += 1
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def prune(self):
+        """Drop every expired entry"""
+        now = time.monotonic()
+        with self.lock:
+            expired = [key for key, (_, expires) in self.entries.items() if expires < now]
+            for key in expired:
+                del self.entries[key]
+            self.expirations += len(expired)
+
+    def __len__(self):
+        return len(self.entries)
+
+class SQLiteStore:
+    """
+    On-disk cache tier: JSON values in a SQLite table with a TTL and a
+    maximum row count. SQLite's locking makes it safe to share between
+    processes.
+    """
+    # Expired and excess rows are pruned once every this many writes
+    PRUNE_EVERY = 100
+
+    def __init__(self, path, table, max_entries=100000, ttl=86400):
+        self.table = table
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.evictions = 0
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                f'CREATE TABLE IF NOT EXISTS {table} '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)'
+            )
+
+    def get(self, key):
+        """Return the cached value, or None if it is missing or expired"""
+        with self.lock:
+            row = self.connection.execute(
+                f'SELECT value FROM {self.table} WHERE key = ? AND expires >= ?',
+                (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value):
+        with self.lock, self.connection:
+            self.connection.execute(
+                f'INSERT OR REPLACE INTO {self.table} (key, value, expires) VALUES (?, ?, ?)',
+                (key, json.dumps(value, separators=(',', ':')), time.time() + self.ttl)
+            )
+            self.writes += 1
+            if self.writes % self.PRUNE_EVERY == 0:
+                self._prune()
+
+    def delete(self, key):
+        with self.lock, self.connection:
+            self.connection.execute(f'DELETE FROM {self.table} WHERE key = ?', (key,))
+
+    def prune(self):
+        with self.lock, self.connection:
+            self._prune()
+
+    def _prune(self):
+        """Drop expired rows, then the rows closest to expiring beyond max_entries"""
+        expired = self.connection.execute(
+            f'DELETE FROM {self.table} WHERE expires < ?', (time.time(),)
+        ).rowcount
+        excess = self.connection.execute(
+            f'DELETE FROM {self.table} WHERE key IN '
+            f'(SELECT key FROM {self.table} ORDER BY expires DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        ).rowcount
+        self.evictions += expired + excess
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+
+class ResultCache:
+    """
+    Two-tier cache: an in-memory LRU in front of an optional SQLite store.
+    Disk hits are copied into memory. Values must be JSON-serializable.
+    """
+    def __init__(self, max_entries=1024, ttl=3600, path=None, table='results', disk_max_entries=100000):
+        self.memory = LRUCache(max_entries, ttl)
+        self.disk = SQLiteStore(path, table, disk_max_entries, ttl) if path else None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+                with self.lock:
+                    self.disk_hits += 1
+                return value
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def stats(self):
+        """Hit, miss and eviction counters for both tiers"""
+        stats = {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'entries': len(self.memory),
+            'evictions': self.memory.evictions,
+            'expirations': self.memory.expirations
+        }
+        if self.disk is not None:
+            stats['disk_entries'] = len(self.disk)
+            stats['disk_evictions'] = self.disk.evictions
+        return stats
+
+class TaskStore:
+    """
+    Dict-like store for per-task state. Entries expire ttl seconds after
+    they were last written and the oldest are dropped beyond max_entries;
+    a background thread sweeps expired entries every sweep_interval
+    seconds. With a path the entries live in SQLite, so they survive
+    restarts and are shared by every worker process; values must then be
+    JSON-serializable.
+    """
+    def __init__(self, ttl=3600, max_entries=10000, path=None, table='tasks', sweep_interval=60):
+        if path:
+            self.backend = SQLiteStore(path, table, max_entries, ttl)
+        else:
+            self.backend = LRUCache(max_entries, ttl)
+        self.peak = 0
+        self.sweeps = 0
+        if sweep_interval:
+            threading.Thread(target=self._sweep_loop, args=(sweep_interval,), daemon=True).start()
+
+    def get(self, key, default=None):
+        value = self.backend.get(key)
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self.backend.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.backend.set(key, value)
+        self.peak = max(self.peak, len(self.backend))
+
+    def __delitem__(self, key):
+        self.backend.delete(key)
+
+    def __contains__(self, key):
+        return self.backend.get(key) is not None
+
+    def __len__(self):
+        return len(self.backend)
+
+    def _sweep_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.backend.prune()
+                self.sweeps += 1
+            except Exception as e:
+                # Keep sweeping whatever a single pass runs into
+                print(f"Task store sweep failed: {e}")
+
+    def stats(self):
+        """Current and peak entry counts"""
+        return {
+            'entries': len(self.backend),
+            'peak_entries': self.peak,
+            'max_entries': self.backend.max_entries,
+            'evictions': self.backend.evictions,
+            'sweeps': self.sweeps
+        }
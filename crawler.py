@@ -0,0 +1,123 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse, urldefrag
+from webalgo import HTMLSEOScanner
+
+class HostRateLimiter:
+    """Spaces out requests to each host so none gets more than `rate` per second"""
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.lock = threading.Lock()
+        self.next_slot = {}
+    
+    def wait(self, url):
+        """Block until the URL's host may be requested again"""
+        if not self.interval:
+            return
+        host = urlparse(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+class SiteCrawler:
+    """
+    Whole-site SEO scan: starts at a seed URL, follows same-origin links
+    breadth-first and scans pages on a pool of worker threads.
+    Results are yielded as each page finishes. With a siteindex.SiteIndex,
+    every scanned page is also added to it for the cross-page checks.
+    """
+    def __init__(self, fetcher, max_depth=3, max_pages=500, workers=16, rate_limit=10, parser='html.parser',
+                 site_index=None, config=None):
+        self.fetcher = fetcher
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.workers = workers
+        self.rate_limiter = HostRateLimiter(rate_limit)
+        self.parser = parser
+        self.site_index = site_index
+        # ruleconfig.RuleConfig for the checks, default thresholds if None
+        self.config = config
+    
+    def crawl(self, seed_url):
+        """Yield a result dict for every page scanned, in completion order"""
+        if not urlparse(seed_url).scheme:
+            seed_url = 'https://' + seed_url
+        seed_url = urldefrag(seed_url)[0]
+        
+        seen = {seed_url}
+        origin = None
+        scheduled = 1
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+        pending = {pool.submit(self._scan_page, seed_url, 0)}
+        
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    page = future.result()
+                    links = page.pop('links')
+                    yield page
+                    
+                    if origin is None:
+                        # Redirects on the seed (http -> https, www) decide the origin
+                        origin = self._origin(page.get('final_url') or seed_url)
+                    if page['depth'] >= self.max_depth:
+                        continue
+                    
+                    for link in links:
+                        if scheduled >= self.max_pages:
+                            break
+                        if link in seen or self._origin(link) != origin:
+                            continue
+                        seen.add(link)
+                        scheduled += 1
+                        pending.add(pool.submit(self._scan_page, link, page['depth'] + 1))
+        finally:
+            # Stop queued pages if the consumer stops early
+            pool.shutdown(wait=False, cancel_futures=True)
+    
+    def _origin(self, url):
+        parsed = urlparse(url)
+        return parsed.scheme, parsed.netloc.lower()
+    
+    def _scan_page(self, url, depth):
+        """Fetch and scan one page, returning its findings and outgoing links"""
+        self.rate_limiter.wait(url)
+        fetch_result = self.fetcher.fetch_url(url)
+        page = {
+            'url': url,
+            'depth': depth,
+            'success': fetch_result['success'],
+            'links': []
+        }
+        
+        if not fetch_result['success']:
+            page['error'] = fetch_result['error']
+            return page
+        
+        page['final_url'] = fetch_result['final_url']
+        page['status_code'] = fetch_result['status_code']
+        if 'html' not in fetch_result['content_type']:
+            # Images, PDFs and other files linked from the site
+            page['skipped'] = True
+            return page
+        
+        try:
+            scanner = HTMLSEOScanner(parser=self.parser, config=self.config)
+            document = scanner.parse(fetch_result['html'])
+            page['results'] = scanner.scan_html(document, fetch_result['final_url'])
+            page['links'] = scanner.extract_links(document, fetch_result['final_url'])
+            if self.site_index is not None:
+                self.site_index.add(
+                    fetch_result['final_url'],
+                    scanner.extract_page_content(document),
+                    scanner.extract_canonical(document, fetch_result['final_url'])
+                )
+        except Exception as e:
+            page['success'] = False
+            page['error'] = f'Scan failed: {str(e)}'
+        return page
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from cache import LRUCache
+
+class EventBus:
+    """
+    Per-task publish/subscribe channel that keeps the last `replay` events of
+    every task, so a subscriber that connects late, or reconnects with the
+    id of the last event it saw, still gets everything it missed.
+
+    Without a path, events live in this process only. With a path they go
+    through a SQLite table, so a task running in one worker process can be
+    followed from any other; subscribers poll it every poll_interval seconds.
+    Channels expire ttl seconds after their last event.
+    """
+    # Expired rows are pruned once every this many SQLite publishes
+    PRUNE_EVERY = 100
+
+    def __init__(self, path=None, replay=200, ttl=3600, max_tasks=10000, poll_interval=0.25):
+        self.replay = replay
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self.condition = threading.Condition()
+        self.published = 0
+        self.next_id = 0
+        # task_id -> (loop, asyncio.Event) of every asubscribe() waiting on the task
+        self.async_waiters = {}
+        if path:
+            self.channels = None
+            self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            with self.condition, self.connection:
+                # WAL lets subscribers in other processes read while a task publishes
+                self.connection.execute('PRAGMA journal_mode=WAL')
+                self.connection.execute(
+                    'CREATE TABLE IF NOT EXISTS events '
+                    '(id INTEGER PRIMARY KEY AUTOINCREMENT, task_id TEXT NOT NULL, '
+                    'event TEXT NOT NULL, data TEXT NOT NULL, created REAL NOT NULL)'
+                )
+                self.connection.execute('CREATE INDEX IF NOT EXISTS events_task ON events (task_id, id)')
+        else:
+            self.connection = None
+            # task_id -> deque of the task's most recent events
+            self.channels = LRUCache(max_tasks, ttl)
+
+    def publish(self, task_id, event, data):
+        """Append an event to the task's channel and wake its subscribers"""
+        with self.condition:
+            self.published += 1
+            if self.connection is None:
+                self.next_id += 1
+                channel = self.channels.get(task_id) or deque(maxlen=self.replay)
+                channel.append({'id': self.next_id, 'event': event, 'data': data})
+                # Setting the channel again restarts its TTL
+                self.channels.set(task_id, channel)
+            else:
+                with self.connection:
+                    self.connection.execute(
+                        'INSERT INTO events (task_id, event, data, created) VALUES (?, ?, ?, ?)',
+                        (task_id, event, json.dumps(data, separators=(',', ':')), time.time())
+                    )
+                    self.connection.execute(
+                        'DELETE FROM events WHERE task_id = ? AND id NOT IN '
+                        '(SELECT id FROM events WHERE task_id = ? ORDER BY id DESC LIMIT ?)',
+                        (task_id, task_id, self.replay)
+                    )
+                    if self.published % self.PRUNE_EVERY == 0:
+                        self.connection.execute(
+                            'DELETE FROM events WHERE task_id IN '
+                            '(SELECT task_id FROM events GROUP BY task_id HAVING MAX(created) < ?)',
+                            (time.time() - self.ttl,)
+                        )
+            self.condition.notify_all()
+            for loop, wakeup in self.async_waiters.get(task_id, ()):
+                loop.call_soon_threadsafe(wakeup.set)
+
+    def _read(self, task_id, after):
+        """Events of a task with an id above `after`, oldest first; call with the condition held"""
+        if self.connection is None:
+            channel = self.channels.get(task_id) or ()
+            return [event for event in channel if event['id'] > after]
+        rows = self.connection.execute(
+            'SELECT id, event, data FROM events WHERE task_id = ? AND id > ? ORDER BY id',
+            (task_id, after)
+        ).fetchall()
+        return [{'id': row[0], 'event': row[1], 'data': json.loads(row[2])} for row in rows]
+
+    def subscribe(self, task_id, after=0, heartbeat=30):
+        """
+        Yield the task's retained events with an id above `after`, then new
+        ones as they are published. None is yielded after `heartbeat` quiet
+        seconds so the caller can keep the connection alive.
+        """
+        deadline = time.monotonic() + heartbeat
+        while True:
+            with self.condition:
+                events = self._read(task_id, after)
+                if not events:
+                    remaining = deadline - time.monotonic()
+                    if remaining > 0:
+                        if self.connection is not None:
+                            # Events from other processes do not notify us
+                            remaining = min(remaining, self.poll_interval)
+                        self.condition.wait(remaining)
+                        continue
+            if not events:
+                yield None
+            for event in events:
+                after = event['id']
+                yield event
+            deadline = time.monotonic() + heartbeat
+
+    async def asubscribe(self, task_id, after=0, heartbeat=30):
+        """subscribe() for coroutines; a waiting subscriber holds no thread"""
+        loop = asyncio.get_running_loop()
+        waiter = (loop, asyncio.Event())
+        with self.condition:
+            self.async_waiters.setdefault(task_id, set()).add(waiter)
+        try:
+            deadline = loop.time() + heartbeat
+            while True:
+                # Cleared before reading, so a publish in between still wakes us
+                waiter[1].clear()
+                with self.condition:
+                    events = self._read(task_id, after)
+                if not events:
+                    remaining = deadline - loop.time()
+                    if remaining > 0:
+                        if self.connection is not None:
+                            remaining = min(remaining, self.poll_interval)
+                        try:
+                            await asyncio.wait_for(waiter[1].wait(), remaining)
+                        except asyncio.TimeoutError:
+                            pass
+                        continue
+                    yield None
+                for event in events:
+                    after = event['id']
+                    yield event
+                deadline = loop.time() + heartbeat
+        finally:
+            with self.condition:
+                waiters = self.async_waiters[task_id]
+                waiters.discard(waiter)
+                if not waiters:
+                    del self.async_waiters[task_id]
+
+    def stats(self):
+        with self.condition:
+            if self.connection is None:
+                channels = len(self.channels)
+            else:
+                channels = self.connection.execute('SELECT COUNT(DISTINCT task_id) FROM events').fetchone()[0]
+            return {
+                'published': self.published,
+                'channels': channels,
+                'async_subscribers': sum(len(waiters) for waiters in self.async_waiters.values())
+            }
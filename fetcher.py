@@ -0,0 +1,311 @@
+import codecs
+import threading
+import requests
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from webalgo import StreamingHTMLSEOScanner
+from cache import SQLiteStore
+from metrics import timer
+
+try:
+    import httpx
+except ImportError:  # httpx is only needed for fetch_url_async()
+    httpx = None
+
+class URLFetcher:
+    """
+    HTTP fetcher meant to be created once and shared across threads.
+    Connections are pooled per host: pool_hosts host pools are kept, each with
+    up to pool_maxsize connections. A request waits for a free connection
+    rather than opening more, so pool_maxsize also caps per-host concurrency.
+    With http_cache_path set, pages that send an ETag or Last-Modified are
+    stored on disk and revalidated with a conditional GET on the next fetch.
+    fetch_url_async() does the same on a pooled httpx client for the async app.
+    """
+    def __init__(self, max_bytes=10 * 1024 * 1024, chunk_size=64 * 1024, pool_hosts=10, pool_maxsize=10,
+                 http_cache_path=None, http_cache_ttl=30 * 86400, http_cache_max_entries=100000):
+        # Streaming limits: pages are cut off after max_bytes, and at most
+        # chunk_size bytes of the body are held in memory at a time
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.pool_hosts = pool_hosts
+        self.pool_maxsize = pool_maxsize
+        self.async_client = None
+        self.http_cache = None
+        if http_cache_path:
+            self.http_cache = SQLiteStore(http_cache_path, 'http_cache', http_cache_max_entries, http_cache_ttl)
+        self.stats_lock = threading.Lock()
+        self.not_modified = 0
+        self.stored = 0
+        self.session = requests.Session()
+        
+        # Set up retry strategy
+        retry_strategy = Retry(
+            total=3,
+            backoff_factor=1,
+            status_forcelist=[429, 500, 502, 503, 504],
+        )
+        
+        self.adapter = HTTPAdapter(
+            max_retries=retry_strategy,
+            pool_connections=pool_hosts,
+            pool_maxsize=pool_maxsize,
+            pool_block=True,
+        )
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        
+        # Set headers to mimic a real browser
+        self.session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+        })
+    
+    def pool_stats(self):
+        """Connection reuse counters summed over the host pools currently kept"""
+        pools = self.adapter.poolmanager.pools
+        hosts = 0
+        requests_sent = 0
+        new_connections = 0
+        for key in pools.keys():
+            try:
+                pool = pools[key]
+            except KeyError:
+                # Evicted while we were reading
+                continue
+            hosts += 1
+            requests_sent += pool.num_requests
+            new_connections += pool.num_connections
+        
+        return {
+            'hosts': hosts,
+            'requests': requests_sent,
+            'new_connections': new_connections,
+            'pool_hits': requests_sent - new_connections
+        }
+    
+    def http_cache_stats(self):
+        """Conditional revalidation counters"""
+        stats = {
+            'enabled': self.http_cache is not None,
+            'not_modified': self.not_modified,
+            'stored': self.stored
+        }
+        if self.http_cache is not None:
+            stats['entries'] = len(self.http_cache)
+        return stats
+    
+    def fetch_url(self, url):
+        """
+        Fetch HTML content from a URL.
+        'not_modified' is True when the page came from the HTTP cache after a 304
+        """
+        try:
+            # Validate URL
+            parsed = urlparse(url)
+            if not parsed.scheme:
+                url = 'https://' + url
+            
+            # Revalidate a stored copy instead of downloading it again
+            cached, headers = self._conditional_headers(url)
+            
+            # Set timeout
+            with timer('fetch'):
+                response = self.session.get(url, timeout=10, headers=headers)
+            
+            if cached and response.status_code == 304:
+                return self._not_modified_result(cached, response.url)
+            
+            response.raise_for_status()
+            result = {
+                'success': True,
+                'html': response.text,
+                'status_code': response.status_code,
+                'final_url': response.url,
+                'content_type': response.headers.get('Content-Type', ''),
+                'not_modified': False
+            }
+            
+            if self.http_cache is not None:
+                self._store_validators(url, response, result)
+            return result
+            
+        except requests.exceptions.RequestException as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'html': None
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Unexpected error: {str(e)}',
+                'html': None
+            }
+    
+    async def fetch_url_async(self, url):
+        """fetch_url() on the async client, for use inside an event loop"""
+        if httpx is None:
+            raise ImportError('fetch_url_async() requires the httpx package')
+        if self.async_client is None:
+            self.async_client = httpx.AsyncClient(
+                headers=dict(self.session.headers),
+                follow_redirects=True,
+                timeout=10,
+                limits=httpx.Limits(max_connections=self.pool_hosts * self.pool_maxsize,
+                                    max_keepalive_connections=self.pool_hosts * self.pool_maxsize),
+                transport=httpx.AsyncHTTPTransport(retries=3),
+            )
+        try:
+            # Validate URL
+            parsed = urlparse(url)
+            if not parsed.scheme:
+                url = 'https://' + url
+            
+            cached, headers = self._conditional_headers(url)
+            with timer('fetch'):
+                response = await self.async_client.get(url, headers=headers)
+            
+            if cached and response.status_code == 304:
+                return self._not_modified_result(cached, str(response.url))
+            
+            response.raise_for_status()
+            result = {
+                'success': True,
+                'html': response.text,
+                'status_code': response.status_code,
+                'final_url': str(response.url),
+                'content_type': response.headers.get('Content-Type', ''),
+                'not_modified': False
+            }
+            
+            if self.http_cache is not None:
+                self._store_validators(url, response, result)
+            return result
+            
+        except httpx.HTTPError as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'html': None
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Unexpected error: {str(e)}',
+                'html': None
+            }
+    
+    async def aclose(self):
+        if self.async_client is not None:
+            await self.async_client.aclose()
+            self.async_client = None
+    
+    def _conditional_headers(self, url):
+        """The stored copy of a page, if any, and the headers that revalidate it"""
+        cached = self.http_cache.get(url) if self.http_cache is not None else None
+        headers = {}
+        if cached:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+        return cached, headers
+    
+    def _not_modified_result(self, cached, final_url):
+        with self.stats_lock:
+            self.not_modified += 1
+        return {
+            'success': True,
+            'html': cached['html'],
+            'status_code': cached['status_code'],
+            'final_url': final_url,
+            'content_type': cached['content_type'],
+            'not_modified': True
+        }
+    
+    def _store_validators(self, url, response, result):
+        """Keep the page and its validators on disk if the server sent any"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+        with self.stats_lock:
+            self.stored += 1
+        self.http_cache.set(url, {
+            'etag': etag,
+            'last_modified': last_modified,
+            'html': result['html'],
+            'status_code': result['status_code'],
+            'content_type': result['content_type']
+        })
+    
+    def stream_scan(self, url, config=None):
+        """
+        Fetch a URL in chunks and scan it while it downloads.
+        Yields a 'head_results' event as soon as </head> is parsed, then a
+        'scan_complete' event with the findings for the whole page (or
+        'scan_error'). The full body is never held in memory.
+        config is the ruleconfig.RuleConfig to check with, default thresholds if None.
+        """
+        try:
+            # Validate URL
+            parsed = urlparse(url)
+            if not parsed.scheme:
+                url = 'https://' + url
+            
+            with self.session.get(url, timeout=10, stream=True) as response:
+                response.raise_for_status()
+                
+                scanner = StreamingHTMLSEOScanner(url=response.url, config=config)
+                decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+                head_sent = False
+                bytes_read = 0
+                truncated = False
+                
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    if bytes_read + len(chunk) > self.max_bytes:
+                        chunk = chunk[:self.max_bytes - bytes_read]
+                        truncated = True
+                    bytes_read += len(chunk)
+                    scanner.feed(decoder.decode(chunk))
+                    
+                    if not head_sent and scanner.head_results is not None:
+                        head_sent = True
+                        yield {
+                            'event': 'head_results',
+                            'data': {'results': scanner.head_results}
+                        }
+                    if truncated:
+                        break
+                
+                scanner.feed(decoder.decode(b'', final=True))
+                results = scanner.close()
+                if not head_sent:
+                    yield {
+                        'event': 'head_results',
+                        'data': {'results': scanner.head_results}
+                    }
+                
+                yield {
+                    'event': 'scan_complete',
+                    'data': {
+                        'success': True,
+                        'url': response.url,
+                        'status_code': response.status_code,
+                        'results': results,
+                        'bytes_read': bytes_read,
+                        'truncated': truncated
+                    }
+                }
+        
+        except requests.exceptions.RequestException as e:
+            yield {
+                'event': 'scan_error',
+                'data': {'success': False, 'error': str(e)}
+            }
+        except Exception as e:
+            yield {
+                'event': 'scan_error',
+                'data': {'success': False, 'error': f'Unexpected error: {str(e)}'}
+            }
@@ -0,0 +1,258 @@
+import asyncio
+import hashlib
+import json
+import re
+import textwrap
+import threading
+from metrics import timer
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key: the first caller runs the
+    function and everyone who arrives while it is running waits for its result
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.coalesced = 0
+
+    def do(self, key, function):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = {'done': threading.Event(), 'result': None, 'error': None}
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = function()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call['done'].set()
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines running on one event loop"""
+    def __init__(self):
+        self.calls = {}
+        self.coalesced = 0
+
+    async def do(self, key, function):
+        call = self.calls.get(key)
+        if call is not None:
+            self.coalesced += 1
+            # shield() so a cancelled waiter does not cancel the shared call
+            return await asyncio.shield(call)
+
+        call = self.calls[key] = asyncio.ensure_future(function())
+        try:
+            return await asyncio.shield(call)
+        finally:
+            if call.done():
+                del self.calls[key]
+            else:
+                call.add_done_callback(lambda _: self.calls.pop(key, None))
+
+def normalize_prompt(messages):
+    """Messages with runs of whitespace collapsed, so trivially different prompts share a key"""
+    normalized = []
+    for message in messages:
+        content = message['content']
+        if isinstance(content, str):
+            content = re.sub(r'\s+', ' ', content).strip()
+        else:
+            content = [
+                {**part, 'text': re.sub(r'\s+', ' ', part['text']).strip()} if part.get('type') == 'text' else part
+                for part in content
+            ]
+        normalized.append({'role': message['role'], 'content': content})
+    return normalized
+
+def estimate_tokens(text):
+    """Rough token count for budgeting prompts: about four characters per token"""
+    return len(text) // 4 + 1
+
+def pack_chunks(pieces, max_tokens, separator=' '):
+    """
+    Join consecutive pieces into as few chunks as fit in max_tokens each.
+    A piece that is over budget on its own is wrapped at word boundaries,
+    or mid-word for text without spaces.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    for piece in pieces:
+        if estimate_tokens(piece) > max_tokens:
+            parts = textwrap.wrap(piece, width=max_tokens * 4, break_long_words=True)
+        else:
+            parts = [piece]
+        for part in parts:
+            tokens = estimate_tokens(part)
+            if current and current_tokens + tokens > max_tokens:
+                chunks.append(separator.join(current))
+                current = []
+                current_tokens = 0
+            current.append(part)
+            current_tokens += tokens
+    if current:
+        chunks.append(separator.join(current))
+    return chunks
+
+def split_text(text, max_tokens):
+    """Split text into chunks of at most max_tokens, breaking between sentences where possible"""
+    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
+    return pack_chunks([sentence for sentence in sentences if sentence], max_tokens)
+
+def parse_batch_answers(content, count):
+    """
+    Parse a {"recommendations": [{"id": n, "recommendation": "..."}]} reply
+    into a list of `count` answers, with None for every id that is missing
+    or empty. A reply that is not valid JSON gives all None.
+    """
+    answers = [None] * count
+    # Models sometimes wrap JSON in a markdown fence
+    content = re.sub(r'^```(?:json)?\s*|\s*```$', '', (content or '').strip())
+    try:
+        items = json.loads(content)['recommendations']
+    except (ValueError, KeyError, TypeError):
+        return answers
+
+    if not isinstance(items, list):
+        return answers
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        index = item.get('id')
+        text = item.get('recommendation')
+        if isinstance(index, int) and 0 <= index < count and isinstance(text, str) and text.strip():
+            answers[index] = text.strip()
+    return answers
+
+def stream_completion(client, model, messages, **params):
+    """Yield the text deltas of a streamed chat completion as they arrive"""
+    for chunk in client.chat.completions.create(model=model, messages=messages, stream=True, **params):
+        # Azure sends a first chunk with only content filter results and no choices
+        if chunk.choices:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+async def astream_completion(client, model, messages, **params):
+    """stream_completion() for an async client"""
+    async for chunk in await client.chat.completions.create(model=model, messages=messages, stream=True, **params):
+        if chunk.choices:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+class CompletionCache:
+    """
+    Chat completions memoized on the normalized prompt and model parameters.
+    Identical requests already in flight are coalesced into one upstream call.
+    `cache` is a cache.ResultCache (in-memory LRU with TTL, optionally on disk).
+    With an async_client, acomplete() and astream() serve the async app from
+    the same cache.
+    """
+    def __init__(self, client, cache, async_client=None):
+        self.client = client
+        self.cache = cache
+        self.async_client = async_client
+        self.flights = SingleFlight()
+        self.async_flights = AsyncSingleFlight()
+
+    def prompt_key(self, model, messages, params):
+        payload = json.dumps(
+            {'model': model, 'messages': normalize_prompt(messages), 'params': params},
+            sort_keys=True, separators=(',', ':')
+        )
+        return 'completion|' + hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+    def complete(self, model, messages, **params):
+        """Return the completion text, calling the model only on a cache miss"""
+        key = self.prompt_key(model, messages, params)
+        content = self.cache.get(key)
+        if content is not None:
+            return content
+
+        def call_model():
+            with timer('completion', mode='complete'):
+                completion = self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    stream=False,
+                    **params
+                )
+            content = completion.choices[0].message.content
+            self.cache.set(key, content)
+            return content
+
+        return self.flights.do(key, call_model)
+
+    def stream(self, model, messages, **params):
+        """
+        Yield the completion text as deltas. A cached completion comes back as a
+        single delta; a fresh one is cached once the stream has finished.
+        Streamed calls are not coalesced.
+        """
+        key = self.prompt_key(model, messages, params)
+        content = self.cache.get(key)
+        if content is not None:
+            yield content
+            return
+
+        parts = []
+        with timer('completion', mode='stream'):
+            for delta in stream_completion(self.client, model, messages, **params):
+                parts.append(delta)
+                yield delta
+        self.cache.set(key, ''.join(parts))
+
+    async def acomplete(self, model, messages, **params):
+        """complete() on the async client"""
+        key = self.prompt_key(model, messages, params)
+        content = self.cache.get(key)
+        if content is not None:
+            return content
+
+        async def call_model():
+            with timer('completion', mode='complete'):
+                completion = await self.async_client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    stream=False,
+                    **params
+                )
+            content = completion.choices[0].message.content
+            self.cache.set(key, content)
+            return content
+
+        return await self.async_flights.do(key, call_model)
+
+    async def astream(self, model, messages, **params):
+        """stream() on the async client"""
+        key = self.prompt_key(model, messages, params)
+        content = self.cache.get(key)
+        if content is not None:
+            yield content
+            return
+
+        parts = []
+        with timer('completion', mode='stream'):
+            async for delta in astream_completion(self.async_client, model, messages, **params):
+                parts.append(delta)
+                yield delta
+        self.cache.set(key, ''.join(parts))
+
+    def stats(self):
+        return {**self.cache.stats(), 'coalesced': self.flights.coalesced + self.async_flights.coalesced}
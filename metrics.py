@@ -0,0 +1,161 @@
+import bisect
+import contextvars
+import threading
+import time
+
+# Histogram buckets in seconds, from sub-millisecond rule checks up to slow model calls
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def label_key(labels):
+    """Labels as a hashable, consistently ordered key"""
+    return tuple(sorted(labels.items()))
+
+def escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label_value(value)}"' for name, value in pairs) + '}'
+
+class Counter:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self.lock:
+            for key, value in self.values.items():
+                lines.append(f'{self.name}{format_labels(key)} {value}')
+        return lines
+
+class Histogram:
+    def __init__(self, name, help, buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        # label key -> [per-bucket counts (last one is +Inf), sum]
+        self.series = {}
+
+    def observe(self, value, **labels):
+        self.observe_key(value, label_key(labels))
+
+    def observe_key(self, value, key):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            for key, (counts, total) in self.series.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + ('+Inf',), counts):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{format_labels(key, [("le", bound)])} {cumulative}')
+                lines.append(f'{self.name}_sum{format_labels(key)} {total}')
+                lines.append(f'{self.name}_count{format_labels(key)} {cumulative}')
+        return lines
+
+class Gauge:
+    """Value read from a function when the metrics are rendered"""
+    def __init__(self, name, help, function):
+        self.name = name
+        self.help = help
+        self.function = function
+
+    def render(self):
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} gauge', f'{self.name} {self.function()}']
+
+class MetricsRegistry:
+    """
+    Counters, histograms and gauges rendered in the Prometheus text format.
+    Each process keeps its own registry, so scrape every worker.
+    """
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help):
+        return self._register(Counter(name, help))
+
+    def histogram(self, name, help, buckets=BUCKETS):
+        return self._register(Histogram(name, help, buckets))
+
+    def gauge(self, name, help, function):
+        return self._register(Gauge(name, help, function))
+
+    def _register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+stage_duration = registry.histogram('seo_stage_duration_seconds', 'Time spent in each stage of a scan')
+stage_errors = registry.counter('seo_stage_errors_total', 'Stages that raised an exception')
+http_requests = registry.counter('seo_http_requests_total', 'HTTP requests by endpoint, method and status')
+http_request_duration = registry.histogram('seo_http_request_duration_seconds', 'Time to produce each HTTP response')
+incremental_rules = registry.counter('seo_incremental_rules_total', 'Rules an incremental re-scan re-ran or reused stored findings for')
+
+# Set to False to turn every timer into a no-op
+enabled = True
+
+# Stage timings of the current request, collected for its Server-Timing header
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+class timer:
+    """
+    Context manager that records how long a stage took in
+    seo_stage_duration_seconds, and in the current request's Server-Timing
+    when one is being collected. Costs a couple of microseconds.
+    """
+    __slots__ = ('stage', 'key', 'start')
+
+    def __init__(self, stage, **labels):
+        self.stage = stage
+        self.key = label_key(dict(labels, stage=stage))
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if not enabled:
+            return
+        elapsed = time.perf_counter() - self.start
+        stage_duration.observe_key(elapsed, self.key)
+        if exc_type is not None:
+            stage_errors.inc(stage=self.stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            name = '.'.join(str(value) for name, value in self.key if name != 'stage')
+            timings.append((f'{self.stage}.{name}' if name else self.stage, elapsed))
+
+def start_request():
+    """Start collecting stage timings for the current request's Server-Timing header"""
+    _request_timings.set([])
+
+def server_timing():
+    """Server-Timing header value for the stages timed so far in this request, same names summed"""
+    totals = {}
+    for name, elapsed in _request_timings.get() or ():
+        totals[name] = totals.get(name, 0.0) + elapsed
+    return ', '.join(f'{name};dur={elapsed * 1000:.2f}' for name, elapsed in totals.items())
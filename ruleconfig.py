@@ -0,0 +1,207 @@
+"""
+Declarative thresholds and patterns for the SEO checks.
+
+A rule config is a JSON or YAML mapping that overrides any of the values in
+DEFAULT_RULE_CONFIG, e.g.
+
+    title:
+      min_length: 40
+    url:
+      max_path_length: 80
+      non_descriptive_pattern: '/(id|p)=?\\d+'
+
+RuleConfig compiles it once: patterns into regexes and every length check
+into a threshold table, an ordered list of cases where the first one that
+matches decides the outcome. classify() looks an outcome up for one value;
+scans run the tables over whole columns of values with classify_columns(),
+on NumPy arrays when NumPy is installed and the columns are long enough.
+"""
+import copy
+import hashlib
+import json
+import operator
+import os
+import re
+
+try:
+    import numpy
+except ImportError:  # numpy only speeds up classify_columns()
+    numpy = None
+
+try:
+    import yaml
+except ImportError:  # PyYAML is only needed for .yaml rule configs
+    yaml = None
+
+# Columns shorter than this are classified in Python, where NumPy's per-call
+# overhead costs more than it saves
+NUMPY_MIN_ROWS = 64
+
+DEFAULT_RULE_CONFIG = {
+    'title': {
+        'min_length': 30,
+        'max_length': 160,
+        'ideal_min_length': 150,
+    },
+    'h1': {
+        'min_length': 20,
+        'max_length': 70,
+    },
+    'meta_description': {
+        'min_length': 120,
+        'max_length': 160,
+    },
+    'image_alt': {
+        'ideal_min_length': 80,
+        'max_length': 125,
+    },
+    'image_filename': {
+        'non_descriptive_pattern': r'^(img|image|photo|pic)\d*\.(jpg|jpeg|png|gif|webp)$',
+    },
+    'url': {
+        'max_path_length': 100,
+        'non_descriptive_pattern': r'/(id|page|post|article)=?\d+',
+    },
+}
+
+OPERATORS = {
+    '==': operator.eq,
+    '>': operator.gt,
+    '<': operator.lt,
+}
+
+# Position of each fact in the tuples classify() compares
+FACTS = ('count', 'length', 'stripped')
+
+class RuleConfig:
+    """
+    A rule config compiled for evaluation. Compile each config once, at
+    startup, and share it: scanners only read it.
+    `digest` identifies the settings, so cached findings of one config are
+    never served for another.
+    """
+    def __init__(self, config=None):
+        self.settings = merge_rule_config(config or {})
+        self.digest = hashlib.blake2b(
+            json.dumps(self.settings, sort_keys=True).encode('utf-8'), digest_size=8
+        ).hexdigest()
+
+        title = self.settings['title']
+        h1 = self.settings['h1']
+        meta = self.settings['meta_description']
+        alt = self.settings['image_alt']
+        # Threshold tables: (outcome, fact, operator, value), first match wins.
+        # Facts are the element count, the text length and the stripped text length
+        self.tables = {
+            'title': [
+                ('missing', 'count', '==', 0),
+                ('multiple', 'count', '>', 1),
+                ('empty', 'length', '==', 0),
+                ('short', 'length', '<', title['min_length']),
+                ('long', 'length', '>', title['max_length']),
+                ('optimize', 'length', '<', title['ideal_min_length']),
+            ],
+            'h1': [
+                ('missing', 'count', '==', 0),
+                ('multiple', 'count', '>', 1),
+                ('empty', 'length', '==', 0),
+                ('short', 'length', '<', h1['min_length']),
+                ('long', 'length', '>', h1['max_length']),
+            ],
+            'meta_description': [
+                ('missing', 'count', '==', 0),
+                ('empty', 'length', '==', 0),
+                ('short', 'length', '<', meta['min_length']),
+                ('long', 'length', '>', meta['max_length']),
+            ],
+            # count is 0 for an image without an alt attribute
+            'image_alt': [
+                ('missing', 'count', '==', 0),
+                ('empty', 'stripped', '==', 0),
+                ('long', 'length', '>', alt['max_length']),
+                ('short', 'length', '<', alt['ideal_min_length']),
+            ],
+        }
+        # The same tables with operators and fact positions resolved, for classify()
+        self.compiled_tables = {
+            check: [(outcome, FACTS.index(fact), OPERATORS[op], value) for outcome, fact, op, value in table]
+            for check, table in self.tables.items()
+        }
+        self.image_filename_pattern = re.compile(self.settings['image_filename']['non_descriptive_pattern'])
+        self.url_pattern = re.compile(self.settings['url']['non_descriptive_pattern'])
+        self.url_max_path_length = self.settings['url']['max_path_length']
+
+    def __getitem__(self, section):
+        return self.settings[section]
+
+    def classify(self, check, count, length, stripped=None):
+        """Outcome of a length check for one element, or None if it passes"""
+        facts = (count, length, length if stripped is None else stripped)
+        for outcome, fact, op, value in self.compiled_tables[check]:
+            if op(facts[fact], value):
+                return outcome
+        return None
+
+    def classify_columns(self, check, counts, lengths, stripped=None):
+        """classify() over equal-length sequences of facts at once; returns a list of outcomes"""
+        if stripped is None:
+            stripped = lengths
+        if numpy is None or len(counts) < NUMPY_MIN_ROWS:
+            return [self.classify(check, *facts) for facts in zip(counts, lengths, stripped)]
+
+        columns = {
+            'count': numpy.asarray(counts, dtype=numpy.int64),
+            'length': numpy.asarray(lengths, dtype=numpy.int64),
+            'stripped': numpy.asarray(stripped, dtype=numpy.int64),
+        }
+        table = self.tables[check]
+        conditions = [OPERATORS[op](columns[fact], value) for _, fact, op, value in table]
+        # 0 means no case matched; numpy.select takes the first true condition
+        codes = numpy.select(conditions, numpy.arange(1, len(table) + 1), 0)
+        outcomes = [None] + [outcome for outcome, _, _, _ in table]
+        return [outcomes[code] for code in codes.tolist()]
+
+def merge_rule_config(config):
+    """DEFAULT_RULE_CONFIG with a config's values laid over it, checked for unknown keys and bad values"""
+    if not isinstance(config, dict):
+        raise ValueError('Rule config must be a mapping of sections')
+    merged = copy.deepcopy(DEFAULT_RULE_CONFIG)
+    for section, values in config.items():
+        if section not in merged:
+            raise ValueError(f"Unknown rule config section '{section}', expected one of: {', '.join(merged)}")
+        if not isinstance(values, dict):
+            raise ValueError(f"Rule config section '{section}' must be a mapping")
+        for key, value in values.items():
+            if key not in merged[section]:
+                raise ValueError(f"Unknown setting '{section}.{key}', expected one of: {', '.join(merged[section])}")
+            if key.endswith('_pattern'):
+                try:
+                    re.compile(value)
+                except (re.error, TypeError) as e:
+                    raise ValueError(f"Invalid regex for '{section}.{key}': {e}")
+            elif isinstance(value, bool) or not isinstance(value, int) or value < 0:
+                raise ValueError(f"'{section}.{key}' must be a non-negative integer")
+            merged[section][key] = value
+    return merged
+
+def load_rule_config(path):
+    """Compile a rule config from a .json, .yaml or .yml file"""
+    with open(path, encoding='utf-8') as f:
+        if path.endswith(('.yaml', '.yml')):
+            if yaml is None:
+                raise ImportError('YAML rule configs require the PyYAML package')
+            config = yaml.safe_load(f)
+        else:
+            config = json.load(f)
+    return RuleConfig(config)
+
+def load_rule_configs(directory):
+    """Compile every .json, .yaml and .yml file in a directory, keyed by file name without the extension"""
+    configs = {}
+    for filename in sorted(os.listdir(directory)):
+        name, extension = os.path.splitext(filename)
+        if extension in ('.json', '.yaml', '.yml'):
+            configs[name] = load_rule_config(os.path.join(directory, filename))
+    return configs
+
+default_rule_config = RuleConfig()
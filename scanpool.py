@@ -0,0 +1,189 @@
+import json
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from webalgo import HTMLSEOScanner
+from cache import ResultCache
+from ruleconfig import RuleConfig
+
+# Documents a worker task walks together
+CHUNK_SIZE = 8
+
+# Pages scan_iter_json() evaluates together, so each threshold table
+# classifies this many pages' rows in one classify_columns() call
+EVALUATE_EVERY = 1024
+
+# Scanners owned by each worker process, created once by the pool initializer:
+# one per rule config, keyed by its name (None for the pool's default config)
+_worker_scanners = {}
+
+def _init_worker(parser, state_path, state_ttl, rule_settings):
+    cache = None
+    if state_path:
+        cache = ResultCache(ttl=state_ttl, path=state_path, table='scan_state', disk_max_entries=10000000)
+    # Configs travel as their settings and are compiled once per worker
+    for name, settings in rule_settings.items():
+        _worker_scanners[name] = HTMLSEOScanner(
+            parser=parser, cache=cache, incremental=cache is not None,
+            config=RuleConfig(settings) if settings is not None else None
+        )
+
+def _warm_worker(_):
+    """No-op task used to start worker processes before the first batch"""
+    return os.getpid()
+
+def _scan_chunk(html_docs, urls, extract, rules=None, errors=False):
+    """
+    Walk a chunk of documents in a worker process with the named rule config
+    (the default one if it is unknown), reducing each to its page facts; the
+    pool evaluates them into findings. Each result goes back as one compact
+    JSON string, which is much cheaper to pickle across the process boundary
+    than nested dicts. With errors set, a document that fails gives
+    {'error': message} instead of raising, so one bad page does not end a batch
+    """
+    scanner = _worker_scanners.get(rules) or _worker_scanners[None]
+    results = []
+    for html_content, url in zip(html_docs, urls):
+        try:
+            document = scanner.parse(html_content)
+            result = {'facts': scanner.page_facts(document, url)}
+            if extract:
+                result['content'] = scanner.extract_page_content(document)
+        except Exception as e:
+            if not errors:
+                raise
+            result = {'error': f'{type(e).__name__}: {e}'}
+        results.append(json.dumps(result, separators=(',', ':')))
+    return results
+
+class ScanPool:
+    """
+    Pool of worker processes for CPU-bound scanning, so batches use every
+    core instead of sharing one GIL. Workers are started and given their
+    scanner when the pool is created. They parse and walk the pages, and
+    the pool evaluates the page facts they send back for the whole batch at
+    once, so the threshold tables run over the rows of every page together.
+    With state_path, workers keep each URL's page facts and region fingerprints
+    in that SQLite file, so scanning the same URLs again only re-runs the
+    checks whose part of a page changed.
+    Workers check with `config` (a ruleconfig.RuleConfig, default thresholds
+    if None), or with one of the named `rule_configs` when a scan asks for it.
+    """
+    def __init__(self, workers=None, parser='html.parser', state_path=None, state_ttl=30 * 86400,
+                 config=None, rule_configs=None):
+        self.workers = workers or os.cpu_count() or 1
+        rule_settings = {name: rule_config.settings for name, rule_config in (rule_configs or {}).items()}
+        rule_settings[None] = config.settings if config is not None else None
+        # Scanners that evaluate the workers' page facts, by rule config name
+        self.scanners = {name: HTMLSEOScanner(parser=parser, config=rule_config)
+                         for name, rule_config in (rule_configs or {}).items()}
+        self.scanners[None] = HTMLSEOScanner(parser=parser, config=config)
+        # spawn keeps workers clear of locks held by the parent's threads
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(parser, state_path, state_ttl, rule_settings),
+        )
+        list(self.executor.map(_warm_worker, range(self.workers)))
+
+    def scan_many_json(self, html_docs, urls=None, extract=False, chunksize=None, rules=None):
+        """
+        Scan documents in parallel, returning each result as a JSON string in
+        input order. Workers take chunksize documents at a time (by default
+        the batch split evenly over the workers, at most CHUNK_SIZE), and the
+        whole batch is evaluated together. rules names one of the pool's
+        rule_configs
+        """
+        html_docs = list(html_docs)
+        if urls is None:
+            urls = [None] * len(html_docs)
+        chunksize = chunksize or max(1, min(CHUNK_SIZE, -(-len(html_docs) // self.workers)))
+        futures = [
+            self.executor.submit(_scan_chunk, html_docs[start:start + chunksize], urls[start:start + chunksize], extract, rules)
+            for start in range(0, len(html_docs), chunksize)
+        ]
+        results = [result for future in futures for result in future.result()]
+        return self._evaluate(list(zip(urls, results)), rules)
+
+    def scan_many(self, html_docs, urls=None, extract=False, chunksize=None, rules=None):
+        """
+        Scan documents in parallel. Each result is {'results': findings}, plus
+        {'content': extracted content} when extract is set
+        """
+        return [json.loads(result) for result in self.scan_many_json(html_docs, urls, extract, chunksize, rules)]
+
+    def scan_iter_json(self, documents, extract=False, max_pending=None, rules=None, chunksize=CHUNK_SIZE,
+                       evaluate_every=EVALUATE_EVERY):
+        """
+        Scan (url, html) pairs from any iterable, yielding each result as a
+        JSON string in input order. Workers take chunksize documents at a
+        time, and only max_pending documents (default two chunks per worker)
+        are read ahead, so memory stays bounded however long the input is.
+        Results come out evaluate_every pages at a time, evaluated together.
+        A document that fails to scan gives {'error': message}
+        """
+        max_pending = max(max_pending or self.workers * chunksize * 2, chunksize)
+        # (urls, future) of the chunks submitted to the workers
+        pending = deque()
+        chunk = []
+        # (url, worker result) of the scanned pages waiting to be evaluated
+        scanned = []
+        try:
+            for url, html_content in documents:
+                chunk.append((url, html_content))
+                if len(chunk) < chunksize:
+                    continue
+                pending.append(self._submit_chunk(chunk, extract, rules))
+                chunk = []
+                if len(pending) * chunksize >= max_pending:
+                    urls, future = pending.popleft()
+                    scanned.extend(zip(urls, future.result()))
+                    if len(scanned) >= evaluate_every:
+                        yield from self._evaluate(scanned, rules)
+                        scanned = []
+            if chunk:
+                pending.append(self._submit_chunk(chunk, extract, rules))
+            while pending:
+                urls, future = pending.popleft()
+                scanned.extend(zip(urls, future.result()))
+            yield from self._evaluate(scanned, rules)
+        finally:
+            # Drop what was read ahead if the consumer stops early
+            for _, future in pending:
+                future.cancel()
+
+    def _submit_chunk(self, chunk, extract, rules):
+        urls, html_docs = zip(*chunk)
+        return urls, self.executor.submit(_scan_chunk, list(html_docs), list(urls), extract, rules, True)
+
+    def _evaluate(self, scanned, rules):
+        """
+        Evaluate the page facts of (url, worker result) pairs together,
+        returning each result as a JSON string
+        """
+        scanner = self.scanners.get(rules) or self.scanners[None]
+        results = [(url, json.loads(result)) for url, result in scanned]
+        pages = [(url, result) for url, result in results if 'error' not in result]
+        findings = iter(scanner.evaluate([result.pop('facts') for _, result in pages], [url for url, _ in pages]))
+        encoded = []
+        for _, result in results:
+            if 'error' not in result:
+                result = {'results': next(findings), **result}
+            encoded.append(json.dumps(result, separators=(',', ':')))
+        return encoded
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def scan_many(html_docs, urls=None, extract=False, workers=None, parser='html.parser', config=None):
+    """Scan a batch of documents on a temporary process pool"""
+    with ScanPool(workers=workers, parser=parser, config=config) as pool:
+        return pool.scan_many(html_docs, urls, extract)
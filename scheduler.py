@@ -0,0 +1,197 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from queue import Full
+
+class JobScheduler:
+    """
+    Fixed pool of worker threads fed from a bounded queue.
+    submit() raises queue.Full once max_queue jobs are waiting, so callers can
+    push back instead of piling up threads. Waiting jobs are taken round-robin
+    across tenants, so one busy tenant cannot starve the others. A job that
+    raises is retried up to max_retries times with exponential backoff before
+    its on_error callback runs.
+    A caller that must answer before it has a job's arguments can reserve()
+    its slot first; submit() with the same job_id then takes that slot.
+    """
+    def __init__(self, workers=4, max_queue=100, max_retries=2, retry_backoff=2.0):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.condition = threading.Condition()
+        # tenant -> deque of queued jobs, in round-robin order
+        self.tenants = OrderedDict()
+        # job_id -> job, for every job that is queued, running or waiting to retry
+        self.jobs = {}
+        # job_ids holding a queue slot for a job not submitted yet
+        self.reserved = set()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.cancelled = 0
+        self.rejected = 0
+        # Queue wait times of the most recently started jobs, in seconds
+        self.wait_times = deque(maxlen=1000)
+
+        for index in range(workers):
+            threading.Thread(target=self._worker, name=f'job-worker-{index}', daemon=True).start()
+
+    def is_full(self):
+        return self.queued + len(self.reserved) >= self.max_queue
+
+    def reserve(self, job_id):
+        """Hold a queue slot for job_id until it is submitted or released; raises queue.Full like submit()"""
+        with self.condition:
+            if self.is_full():
+                self.rejected += 1
+                raise Full(f'Job queue is full ({self.max_queue} waiting)')
+            self.reserved.add(job_id)
+
+    def release(self, job_id):
+        """Give back the slot reserved for job_id, if it still holds one"""
+        with self.condition:
+            self.reserved.discard(job_id)
+
+    def submit(self, job_id, function, args=(), tenant='default', on_error=None):
+        """
+        Queue function(*args), in the slot reserved for job_id if there is one;
+        on_error(job_id, error) runs if every attempt fails
+        """
+        with self.condition:
+            if job_id in self.reserved:
+                self.reserved.remove(job_id)
+            elif self.is_full():
+                self.rejected += 1
+                raise Full(f'Job queue is full ({self.max_queue} waiting)')
+            job = {
+                'id': job_id,
+                'function': function,
+                'args': args,
+                'tenant': tenant,
+                'on_error': on_error,
+                'attempt': 0,
+                'state': 'queued',
+                'cancelled': False,
+                'enqueued': time.monotonic()
+            }
+            self.jobs[job_id] = job
+            self._enqueue(job)
+
+    def cancel(self, job_id):
+        """
+        Cancel a job. A queued or retrying job never runs again; a running job
+        is only flagged, and can stop early by checking is_cancelled()
+        """
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job is None or job['cancelled']:
+                return False
+            job['cancelled'] = True
+            self.cancelled += 1
+            if job['state'] == 'queued':
+                self.tenants[job['tenant']].remove(job)
+                if not self.tenants[job['tenant']]:
+                    del self.tenants[job['tenant']]
+                self.queued -= 1
+            if job['state'] != 'running':
+                del self.jobs[job_id]
+            return True
+
+    def attempt(self, job_id):
+        """Number of earlier attempts of a job that failed; 0 on its first run or if it is unknown"""
+        job = self.jobs.get(job_id)
+        return job['attempt'] if job is not None else 0
+
+    def is_cancelled(self, job_id):
+        job = self.jobs.get(job_id)
+        return job is not None and job['cancelled']
+
+    def _enqueue(self, job):
+        job['state'] = 'queued'
+        self.tenants.setdefault(job['tenant'], deque()).append(job)
+        self.queued += 1
+        self.condition.notify()
+
+    def _next_job(self):
+        """Take the oldest job of the next tenant in rotation"""
+        tenant, jobs = next(iter(self.tenants.items()))
+        job = jobs.popleft()
+        if jobs:
+            self.tenants.move_to_end(tenant)
+        else:
+            del self.tenants[tenant]
+        self.queued -= 1
+        return job
+
+    def _requeue(self, job):
+        with self.condition:
+            if job['cancelled']:
+                return
+            job['enqueued'] = time.monotonic()
+            self._enqueue(job)
+
+    def _worker(self):
+        while True:
+            with self.condition:
+                while not self.queued:
+                    self.condition.wait()
+                job = self._next_job()
+                job['state'] = 'running'
+                self.running += 1
+                self.wait_times.append(time.monotonic() - job['enqueued'])
+
+            error = None
+            try:
+                job['function'](*job['args'])
+            except Exception as e:
+                error = e
+
+            with self.condition:
+                self.running -= 1
+                if error is None:
+                    self.completed += 1
+                    del self.jobs[job['id']]
+                    continue
+                job['attempt'] += 1
+                retry = job['attempt'] <= self.max_retries and not job['cancelled']
+                if retry:
+                    self.retried += 1
+                    job['state'] = 'retrying'
+                else:
+                    self.failed += 1
+                    del self.jobs[job['id']]
+
+            if retry:
+                delay = self.retry_backoff * 2 ** (job['attempt'] - 1)
+                timer = threading.Timer(delay, self._requeue, (job,))
+                timer.daemon = True
+                timer.start()
+            elif job['on_error'] is not None and not job['cancelled']:
+                try:
+                    job['on_error'](job['id'], error)
+                except Exception as e:
+                    # Keep the worker alive whatever the callback does
+                    print(f"Error handler for job {job['id']} failed: {e}")
+
+    def stats(self):
+        """Queue depth, throughput counters and queue wait times"""
+        with self.condition:
+            wait_times = list(self.wait_times)
+            return {
+                'workers': self.workers,
+                'queued': self.queued,
+                'reserved': len(self.reserved),
+                'max_queue': self.max_queue,
+                'running': self.running,
+                'tenants_waiting': len(self.tenants),
+                'completed': self.completed,
+                'failed': self.failed,
+                'retried': self.retried,
+                'cancelled': self.cancelled,
+                'rejected': self.rejected,
+                'wait_time_avg': sum(wait_times) / len(wait_times) if wait_times else 0.0,
+                'wait_time_max': max(wait_times) if wait_times else 0.0
+            }
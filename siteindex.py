@@ -0,0 +1,262 @@
+import hashlib
+import re
+import threading
+from urllib.parse import urldefrag
+
+def normalize_text(text):
+    """Collapse whitespace and case so trivially different copies of a title compare equal"""
+    return re.sub(r'\s+', ' ', text or '').strip().casefold()
+
+class DuplicateMap:
+    """
+    Pages grouped by a normalized value, keeping track of the values more
+    than one page shares so listing duplicates never scans every page
+    """
+    def __init__(self):
+        # normalized value -> set of urls
+        self.pages = {}
+        # normalized value -> the text as first seen, for reports
+        self.display = {}
+        self.shared = set()
+
+    def add(self, key, text, url):
+        urls = self.pages.setdefault(key, set())
+        self.display.setdefault(key, text)
+        urls.add(url)
+        if len(urls) > 1:
+            self.shared.add(key)
+
+    def discard(self, key, url):
+        urls = self.pages.get(key)
+        if urls is None:
+            return
+        urls.discard(url)
+        if len(urls) < 2:
+            self.shared.discard(key)
+        if not urls:
+            del self.pages[key]
+            del self.display[key]
+
+    def others(self, key, url):
+        """The other pages with the same value"""
+        return sorted(self.pages.get(key, set()) - {url})
+
+    def groups(self):
+        return [{'text': self.display[key], 'urls': sorted(self.pages[key])} for key in self.shared]
+
+class MinHasher:
+    """
+    MinHash signatures of word shingles, built with one-permutation hashing:
+    each shingle is hashed once, the hash's top bits pick one of num_perm
+    bins and every bin keeps its smallest value. Empty bins borrow from the
+    next filled one (rotation densification). The share of equal slots in two
+    signatures estimates the Jaccard similarity of the pages' shingle sets,
+    as with num_perm independent hash functions, at the cost of one.
+    """
+    def __init__(self, num_perm=64, shingle_size=5):
+        if num_perm & (num_perm - 1):
+            raise ValueError('num_perm must be a power of two')
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.shift = 64 - (num_perm.bit_length() - 1)
+        self.mask = (1 << self.shift) - 1
+
+    def shingles(self, text):
+        """64-bit hashes of the text's overlapping word shingles"""
+        words = text.casefold().split()
+        size = self.shingle_size
+        return {
+            int.from_bytes(hashlib.blake2b(' '.join(words[i:i + size]).encode('utf-8'), digest_size=8).digest(), 'little')
+            for i in range(max(1, len(words) - size + 1))
+        } if words else set()
+
+    def signature(self, text):
+        """Tuple of num_perm slot values, or None for a page without text"""
+        hashes = self.shingles(text)
+        if not hashes:
+            return None
+        bins = [None] * self.num_perm
+        for value in hashes:
+            index = value >> self.shift
+            value &= self.mask
+            current = bins[index]
+            if current is None or value < current:
+                bins[index] = value
+
+        signature = list(bins)
+        for index, value in enumerate(bins):
+            if value is None:
+                # Offset by the distance, so a borrowed value never equals a real one
+                distance = 1
+                while bins[(index + distance) % self.num_perm] is None:
+                    distance += 1
+                signature[index] = bins[(index + distance) % self.num_perm] + distance * (self.mask + 1)
+        return tuple(signature)
+
+    @staticmethod
+    def similarity(first, second):
+        """Estimated Jaccard similarity of two signatures"""
+        return sum(1 for a, b in zip(first, second) if a == b) / len(first)
+
+class SiteIndex:
+    """
+    Cross-page index of a site's pages, updated one page at a time as they
+    are scanned. Finds what no single-page scan can:
+    duplicate titles and meta descriptions (hash maps of the normalized text),
+    near-duplicate body text (MinHash signatures banded into LSH buckets, so
+    only pages sharing a bucket are compared) and canonical chains and loops.
+    Adding a page only compares it with the pages it shares a bucket with,
+    and the reports only visit pages that have an issue, so neither grows
+    with the size of the index.
+    """
+    def __init__(self, threshold=0.8, num_perm=64, bands=16, shingle_size=5):
+        if num_perm % bands:
+            raise ValueError('bands must divide num_perm')
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm, shingle_size)
+        self.lock = threading.Lock()
+        # url -> what the page was indexed with, to undo it when the page changes
+        self.pages = {}
+        self.titles = DuplicateMap()
+        self.descriptions = DuplicateMap()
+        # One dict per band: band values -> set of urls
+        self.buckets = [{} for _ in range(bands)]
+        # url -> {near-duplicate url: similarity}, only for pages that have any
+        self.similar = {}
+        # url -> canonical url, only for pages whose canonical points elsewhere
+        self.canonicals = {}
+
+    def add(self, url, content, canonical=None):
+        """
+        Index a page from its extract_page_content() dict and canonical URL,
+        replacing what was indexed for the URL before
+        """
+        signature = self.hasher.signature(content.get('body_text', ''))
+        title = normalize_text(content.get('title'))
+        description = normalize_text(content.get('meta_description'))
+        canonical = urldefrag(canonical)[0] if canonical else None
+        with self.lock:
+            self._remove(url)
+            self.pages[url] = (title, description, signature)
+            if title:
+                self.titles.add(title, content['title'].strip(), url)
+            if description:
+                self.descriptions.add(description, content['meta_description'].strip(), url)
+            if canonical and canonical != url:
+                self.canonicals[url] = canonical
+            if signature is not None:
+                self._add_signature(url, signature)
+
+    def remove(self, url):
+        with self.lock:
+            self._remove(url)
+
+    def _band_keys(self, signature):
+        return [signature[band * self.rows:(band + 1) * self.rows] for band in range(self.bands)]
+
+    def _add_signature(self, url, signature):
+        candidates = set()
+        for bucket, key in zip(self.buckets, self._band_keys(signature)):
+            urls = bucket.setdefault(key, set())
+            candidates.update(urls)
+            urls.add(url)
+
+        for other in candidates:
+            score = MinHasher.similarity(signature, self.pages[other][2])
+            if score >= self.threshold:
+                self.similar.setdefault(url, {})[other] = score
+                self.similar.setdefault(other, {})[url] = score
+
+    def _remove(self, url):
+        entry = self.pages.pop(url, None)
+        if entry is None:
+            return
+        title, description, signature = entry
+        self.titles.discard(title, url)
+        self.descriptions.discard(description, url)
+        self.canonicals.pop(url, None)
+        if signature is not None:
+            for bucket, key in zip(self.buckets, self._band_keys(signature)):
+                urls = bucket[key]
+                urls.discard(url)
+                if not urls:
+                    del bucket[key]
+            for other in self.similar.pop(url, ()):
+                del self.similar[other][url]
+                if not self.similar[other]:
+                    del self.similar[other]
+
+    def page_issues(self, url):
+        """Cross-page issues of one indexed page"""
+        with self.lock:
+            entry = self.pages.get(url)
+            if entry is None:
+                return None
+            title, description, _ = entry
+            return {
+                'duplicate_title': self.titles.others(title, url) if title else [],
+                'duplicate_meta_description': self.descriptions.others(description, url) if description else [],
+                'near_duplicates': sorted(
+                    ({'url': other, 'similarity': round(score, 3)} for other, score in self.similar.get(url, {}).items()),
+                    key=lambda page: -page['similarity']
+                ),
+                'canonical': self._canonical_issue(url)
+            }
+
+    def _canonical_issue(self, url):
+        """
+        A canonical that points at a page which itself canonicalizes elsewhere
+        is a chain; one that leads back round is a loop. None when the
+        canonical is fine or points at a page that is not indexed
+        """
+        path = [url]
+        target = self.canonicals.get(url)
+        while target is not None:
+            if target in path:
+                return {'issue': 'loop', 'path': path[path.index(target):] + [target]}
+            path.append(target)
+            target = self.canonicals.get(target)
+        if len(path) > 2:
+            return {'issue': 'chain', 'path': path}
+        return None
+
+    def report(self):
+        """Every cross-page issue in the index"""
+        with self.lock:
+            pairs = [
+                {'urls': [url, other], 'similarity': round(score, 3)}
+                for url, similar in sorted(self.similar.items()) for other, score in sorted(similar.items()) if url < other
+            ]
+
+            chains = []
+            loops = {}
+            for url in sorted(self.canonicals):
+                issue = self._canonical_issue(url)
+                if issue is None:
+                    continue
+                if issue['issue'] == 'chain':
+                    chains.append(issue['path'])
+                else:
+                    # Every page on a loop finds the same loop
+                    loops.setdefault(frozenset(issue['path']), issue['path'])
+
+            return {
+                'pages': len(self.pages),
+                'duplicate_titles': self.titles.groups(),
+                'duplicate_meta_descriptions': self.descriptions.groups(),
+                'near_duplicates': pairs,
+                'canonical_chains': chains,
+                'canonical_loops': list(loops.values())
+            }
+
+    def stats(self):
+        with self.lock:
+            return {
+                'pages': len(self.pages),
+                'duplicate_titles': len(self.titles.shared),
+                'duplicate_meta_descriptions': len(self.descriptions.shared),
+                'near_duplicate_pairs': sum(len(similar) for similar in self.similar.values()) // 2,
+                'canonicalized': len(self.canonicals)
+            }
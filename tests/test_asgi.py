@@ -0,0 +1,81 @@
+import asyncio
+import json
+import threading
+import app
+import asgi
+
+def call(path, method='GET', body=None, disconnect=False):
+    """
+    Run one request through the ASGI app and return (status, headers, body).
+    With disconnect, the client goes away once the request body is read
+    """
+    requests = [{'type': 'http.request', 'body': json.dumps(body).encode('utf-8') if body is not None else b''}]
+    sent = []
+
+    async def receive():
+        if requests:
+            return requests.pop(0)
+        if disconnect:
+            return {'type': 'http.disconnect'}
+        await asyncio.Future()
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'content-type', b'application/json'), (b'x-tenant-id', b'tenant')],
+        'client': ('127.0.0.1', 50000),
+        'server': ('testserver', 80),
+    }
+    asyncio.run(asgi.application(scope, receive, send))
+    start = sent[0]
+    return start['status'], dict(start['headers']), b''.join(message.get('body', b'') for message in sent[1:])
+
+def test_flask_endpoints_are_served_through_the_asgi_app():
+    status, headers, body = call('/health')
+    assert status == 200
+    assert json.loads(body)['status'] == 'healthy'
+
+    status, headers, body = call('/cancel/unknown-task', 'POST')
+    assert status == 404
+    assert json.loads(body) == {'success': False, 'error': 'Task is not queued or running'}
+
+def test_wrong_method_gets_flasks_answer():
+    status, headers, body = call('/scan', 'GET')
+    assert status == 405
+
+def test_streamed_flask_responses_pass_through(monkeypatch):
+    def stream_scan(url, config):
+        yield {'event': 'head_results', 'data': {'url': url}}
+        yield {'event': 'scan_complete', 'data': {'pages': 1}}
+    monkeypatch.setattr(app.fetcher, 'stream_scan', stream_scan)
+
+    status, headers, body = call('/scan/stream', 'POST', {'url': 'https://example.com/'})
+    assert status == 200
+    assert headers[b'content-type'].startswith(b'text/event-stream')
+    assert body.decode('utf-8') == (
+        'event: head_results\ndata: {"url": "https://example.com/"}\n\n'
+        'event: scan_complete\ndata: {"pages": 1}\n\n'
+    )
+
+def test_disconnect_closes_the_streamed_response(monkeypatch):
+    closed = threading.Event()
+
+    def stream_scan(url, config):
+        try:
+            while True:
+                yield {'event': 'heartbeat', 'data': {}}
+        finally:
+            closed.set()
+    monkeypatch.setattr(app.fetcher, 'stream_scan', stream_scan)
+
+    status, headers, body = call('/scan/stream', 'POST', {'url': 'https://example.com/'}, disconnect=True)
+    assert status == 200
+    assert closed.wait(5)
@@ -0,0 +1,38 @@
+import json
+from batchscan import JSONLWriter, iter_jsonl, scan_records
+
+LINES = [
+    json.dumps({'url': 'https://example.com/a', 'html': '<title>A</title>'}),
+    '[1, 2]',
+    '"just a string"',
+    '42',
+    'null',
+    '{not json',
+    json.dumps({'url': 'https://example.com/b'}),
+    '',
+    json.dumps({'url': 'https://example.com/c', 'html': '<title>C</title>'}),
+]
+
+def write_input(tmp_path):
+    path = tmp_path / 'pages.jsonl'
+    path.write_text('\n'.join(LINES) + '\n', encoding='utf-8')
+    return str(path)
+
+def test_iter_jsonl_turns_bad_lines_into_error_records(tmp_path):
+    path = write_input(tmp_path)
+    records = list(iter_jsonl(path))
+    assert [record['source'] for record in records] == [f'{path}:{number}' for number in (1, 2, 3, 4, 5, 6, 7, 9)]
+    assert records[0]['html'] == '<title>A</title>'
+    assert all(record['error'] == 'Record is not a JSON object' for record in records[1:5])
+    assert records[5]['error'].startswith('Invalid JSON')
+    assert records[6] == {'source': f'{path}:7', 'url': 'https://example.com/b', 'error': 'Record has no "html" string'}
+    assert records[7]['url'] == 'https://example.com/c'
+
+def test_bad_lines_do_not_stop_a_batch(tmp_path):
+    output = tmp_path / 'findings.jsonl'
+    with open(output, 'w', encoding='utf-8') as f:
+        stats = scan_records(iter_jsonl(write_input(tmp_path)), JSONLWriter(f), workers=1)
+    results = [json.loads(line) for line in output.read_text(encoding='utf-8').splitlines()]
+    assert stats['pages'] == 8 and stats['errors'] == 6
+    assert [result['url'] for result in results if 'results' in result] == ['https://example.com/a', 'https://example.com/c']
+    assert ['results' in result for result in results] == [True, False, False, False, False, False, False, True]
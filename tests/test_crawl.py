@@ -0,0 +1,40 @@
+import pytest
+import app
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+@pytest.mark.parametrize('limits', [
+    {'max_depth': 'deep'},
+    {'max_depth': -1},
+    {'max_depth': None},
+    {'max_depth': 2.5},
+    {'max_depth': True},
+    {'max_pages': '10 pages'},
+    {'max_pages': 0},
+    {'max_pages': [5]},
+])
+def test_bad_limits_answer_400(client, limits):
+    response = client.post('/crawl', json={'url': 'https://example.com/', **limits})
+    assert response.status_code == 400
+    body = response.get_json()
+    assert body['success'] is False
+    assert next(iter(limits)) in body['error']
+
+def test_limits_are_capped_by_the_server_settings(client, monkeypatch):
+    crawlers = []
+
+    class FakeCrawler:
+        def __init__(self, fetcher, max_depth, max_pages, **options):
+            crawlers.append((max_depth, max_pages))
+            self.site_index = options['site_index']
+
+        def crawl(self, url):
+            return iter(())
+    monkeypatch.setattr(app, 'SiteCrawler', FakeCrawler)
+
+    response = client.post('/crawl', json={'url': 'https://example.com/', 'max_depth': '2', 'max_pages': 10 ** 9})
+    assert response.status_code == 200
+    assert b'event: crawl_complete' in response.data
+    assert crawlers == [(2, app.crawl_max_pages)]
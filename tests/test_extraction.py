@@ -0,0 +1,23 @@
+import pytest
+import webalgo
+from webalgo import HTMLSEOScanner
+
+PAGE = '''<html><head><title>Sample Page</title></head>
+<body class="{body_class}">
+<nav class="site">Home About</nav>
+<main class="nav-open"><article>Actual article words</article></main>
+<div class="menu">Menu entries</div>
+<div class="Sidebar">Side links</div>
+<div class="has-header-image">Hero caption</div>
+</body></html>'''
+
+@pytest.mark.parametrize('parser', webalgo.PARSERS)
+@pytest.mark.parametrize('body_class', ['has-header-image', 'nav-open', 'nav', 'menu footer'])
+def test_body_and_main_are_never_skipped(parser, body_class):
+    content = HTMLSEOScanner(parser=parser).extract_page_content(PAGE.format(body_class=body_class))
+    assert content['body_text'] == 'Actual article words Hero caption'
+
+@pytest.mark.parametrize('parser', webalgo.PARSERS)
+def test_non_content_classes_match_whole_tokens(parser):
+    html = '<body><p class="x ads">Ad</p><p class="shared-post">Kept</p><p class="Footer">Foot</p></body>'
+    assert HTMLSEOScanner(parser=parser).extract_page_content(html)['body_text'] == 'Kept'
@@ -0,0 +1,87 @@
+import pytest
+import webalgo
+from cache import ResultCache
+from webalgo import HTMLSEOScanner, region_fingerprints
+
+LONG_TEXT = 'words that push the text well past every length limit ' * 4
+
+def page(head='', body=''):
+    return (
+        '<html><head><title>A title that is long enough to pass</title>'
+        '<meta name="description" content="A description that is long enough to pass the length check.">'
+        f'{head}</head><body><h1>A heading that is long enough</h1>{body}</body></html>'
+    )
+
+# (markup before, markup after) of the same URL; the edit sits past markup a
+# regex over the raw HTML reads differently from the parser
+CHANGES = {
+    'gt_in_meta_content': (
+        '<html><head><meta name="description" content="A > B short"></head><body></body></html>',
+        f'<html><head><meta name="description" content="A > B {LONG_TEXT}"></head><body></body></html>',
+    ),
+    'gt_in_img_alt': (
+        page(body='<img src="/a.jpg" alt="x > y">'),
+        page(body='<img src="/a.jpg" alt="x > y IMG_1234.jpg">'),
+    ),
+    'title_inside_textarea': (
+        page(body='<textarea>Notes</textarea>'),
+        page(body='<textarea><title>Notes</title></textarea>'),
+    ),
+    'comment_open_in_attribute': (
+        page(body='<img src="/a.jpg" alt="<!-- not a comment"><h1>Second heading</h1>'),
+        page(body='<img src="/a.jpg" alt="<!-- not a comment"><h1>Changed</h1><h3>Skipped level</h3>'),
+    ),
+    'comment_open_in_meta_content': (
+        page(head='<meta name="keywords" content="a <!-- b">'),
+        page(head='<meta name="keywords" content="a <!-- b"><title>Second title</title>'),
+    ),
+    'end_tag_closes_region': (
+        f'<html><body><div><h1>A heading that is long enough</div><p>{LONG_TEXT}</p></body></html>',
+        f'<html><body><h1>A heading that is long enough</div><p>{LONG_TEXT}</p></body></html>',
+    ),
+    'uppercase_tags': (
+        page(body='<IMG SRC="/a.jpg" ALT="Photo">'),
+        page(body='<IMG SRC="/a.jpg" ALT="">'),
+    ),
+    'unclosed_heading': (
+        f'<html><body><h1>A heading that is long enough</h1><p>{LONG_TEXT}</p></body></html>',
+        f'<html><body><h1>A heading that is long enough<p>{LONG_TEXT}</p></body></html>',
+    ),
+    'entity_in_title': (
+        '<html><head><title>Fish &amp; Chips</title></head><body></body></html>',
+        '<html><head><title>Fish &amp;&amp; Chips &#8212; and a much longer title than before it was</title></head><body></body></html>',
+    ),
+}
+
+@pytest.mark.parametrize('name', sorted(CHANGES))
+@pytest.mark.parametrize('parser', webalgo.PARSERS)
+def test_incremental_scan_matches_full_scan(parser, name):
+    before, after = CHANGES[name]
+    url = f'https://example.com/{name}'
+    scanner = HTMLSEOScanner(parser=parser, cache=ResultCache(), incremental=True)
+    full = HTMLSEOScanner(parser=parser)
+
+    assert scanner.scan_html(before, url) == full.scan_html(before, url)
+    assert scanner.scan_html(after, url) == full.scan_html(after, url)
+    # And back again, with the stored findings now from the second version
+    assert scanner.scan_html(before, url) == full.scan_html(before, url)
+
+@pytest.mark.parametrize('name', sorted(CHANGES))
+def test_changes_reach_the_findings(name):
+    before, after = CHANGES[name]
+    scanner = HTMLSEOScanner()
+    assert scanner.scan_html(before) != scanner.scan_html(after)
+
+def test_fingerprints_ignore_markup_outside_regions():
+    before = page(body='<p>First paragraph</p><div class="a">x</div>')
+    after = page(body='<p>Rewritten paragraph</p><div class="b">y</div>')
+    assert region_fingerprints(before, webalgo.SEO_RULES) == region_fingerprints(after, webalgo.SEO_RULES)
+
+def test_unchanged_regions_reuse_findings():
+    scanner = HTMLSEOScanner(cache=ResultCache(), incremental=True)
+    url = 'https://example.com/reuse'
+    scanner.scan_html(page(body='<p>One</p>'), url)
+    document = scanner.parse(page(body='<p>Two</p>'))
+    scanner.scan_html(document, url)
+    # No rule region changed, so the page was never parsed
+    assert document._tree is None
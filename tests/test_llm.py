@@ -0,0 +1,165 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+import cache
+from cache import ResultCache
+from llm import AsyncSingleFlight, CompletionCache, SingleFlight
+
+MESSAGES = [{'role': 'user', 'content': 'Suggest a better title'}]
+
+def completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+class FakeClient:
+    """Stands in for the OpenAI client's chat.completions.create(); blocks until released"""
+    def __init__(self, answer='A better title', error=None):
+        self.answer = answer
+        self.error = error
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, stream=False, **params):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return completion(self.answer)
+
+class FakeAsyncClient:
+    def __init__(self, answer='A better title', error=None):
+        self.answer = answer
+        self.error = error
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages, stream=False, **params):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.error is not None:
+            raise self.error
+        return completion(self.answer)
+
+def run_concurrently(client, function, callers=8):
+    """Call function from several threads while the first upstream call is held open"""
+    client.release.clear()
+    results = [None] * callers
+
+    def call(index):
+        try:
+            results[index] = function()
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=call, args=(0,))]
+    threads[0].start()
+    assert client.started.wait(5)
+    threads += [threading.Thread(target=call, args=(index,)) for index in range(1, callers)]
+    for thread in threads[1:]:
+        thread.start()
+    # Let the followers reach the flight before the leader finishes
+    time.sleep(0.1)
+    client.release.set()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+def test_concurrent_identical_calls_make_one_upstream_call():
+    client = FakeClient()
+    completions = CompletionCache(client, ResultCache(16, 60))
+    results = run_concurrently(client, lambda: completions.complete('model', MESSAGES, temperature=0.2))
+    assert results == ['A better title'] * 8
+    assert client.calls == 1
+    assert completions.stats()['coalesced'] == 7
+
+def test_different_params_are_separate_calls():
+    client = FakeClient()
+    completions = CompletionCache(client, ResultCache(16, 60))
+    completions.complete('model', MESSAGES, temperature=0.2)
+    completions.complete('model', MESSAGES, temperature=0.7)
+    assert client.calls == 2
+
+def test_cache_hits_skip_upstream_until_ttl_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache, 'time', SimpleNamespace(monotonic=lambda: now[0], time=time.time))
+    client = FakeClient()
+    completions = CompletionCache(client, ResultCache(16, ttl=60))
+
+    assert completions.complete('model', MESSAGES) == 'A better title'
+    # Whitespace differences normalize to the same prompt
+    assert completions.complete('model', [{'role': 'user', 'content': '  Suggest a better   title '}]) == 'A better title'
+    assert list(completions.stream('model', MESSAGES)) == ['A better title']
+    assert client.calls == 1
+
+    now[0] += 61
+    assert completions.complete('model', MESSAGES) == 'A better title'
+    assert client.calls == 2
+
+def test_upstream_error_reaches_every_waiter_and_is_not_cached():
+    client = FakeClient(error=RuntimeError('rate limited'))
+    completions = CompletionCache(client, ResultCache(16, 60))
+    results = run_concurrently(client, lambda: completions.complete('model', MESSAGES))
+    assert all(isinstance(result, RuntimeError) and str(result) == 'rate limited' for result in results)
+    assert client.calls == 1
+
+    client.error = None
+    assert completions.complete('model', MESSAGES) == 'A better title'
+    assert client.calls == 2
+
+def test_single_flight_runs_again_once_finished():
+    flights = SingleFlight()
+    assert flights.do('key', lambda: 1) == 1
+    assert flights.do('key', lambda: 2) == 2
+    assert flights.calls == {}
+
+def test_async_concurrent_identical_calls_make_one_upstream_call():
+    client = FakeAsyncClient()
+    completions = CompletionCache(None, ResultCache(16, 60), async_client=client)
+
+    async def main():
+        return await asyncio.gather(*(completions.acomplete('model', MESSAGES) for _ in range(8)))
+
+    assert asyncio.run(main()) == ['A better title'] * 8
+    assert client.calls == 1
+    assert asyncio.run(completions.acomplete('model', MESSAGES)) == 'A better title'
+    assert client.calls == 1
+
+def test_async_upstream_error_reaches_every_waiter_and_is_not_cached():
+    client = FakeAsyncClient(error=RuntimeError('rate limited'))
+    completions = CompletionCache(None, ResultCache(16, 60), async_client=client)
+
+    async def main():
+        return await asyncio.gather(*(completions.acomplete('model', MESSAGES) for _ in range(4)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert client.calls == 1
+    assert completions.async_flights.calls == {}
+
+    client.error = None
+    assert asyncio.run(completions.acomplete('model', MESSAGES)) == 'A better title'
+    assert client.calls == 2
+
+def test_async_cancelled_waiter_does_not_cancel_the_shared_call():
+    flights = AsyncSingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return 'done'
+
+    async def main():
+        first = asyncio.ensure_future(flights.do('key', slow))
+        second = asyncio.ensure_future(flights.do('key', slow))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == 'done'
+    assert flights.coalesced == 1
@@ -0,0 +1,88 @@
+import glob
+import os
+import pytest
+import webalgo
+from webalgo import HTMLSEOScanner, StreamingHTMLSEOScanner
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmark_pages')
+
+EDGE_CASES = {
+    'title_comment': '<html><head><title>Short <!-- draft --> title</title></head><body><h1>Heading</h1></body></html>',
+    'title_markup': '<html><head><title>Plain <b>bold</b> &lt; title</title></head><body></body></html>',
+    'h1_inline_style': '<html><body><h1>Hi<style>.hero{color:red;font-size:3em}</style></h1></body></html>',
+    'h1_inline_script': '<html><body><h1>Brand<script>window.track("h1 impression with a long name")</script></h1></body></html>',
+    'header_comment_only': '<html><body><h1>A heading that is long enough</h1><h2><!-- todo --></h2><h4>x</h4></body></html>',
+    'entities': (
+        '<html><head><title>Caf&eacute; &amp; Bar &#8212; &quot;menu&quot; &copy; 2024</title>'
+        '<meta name="description" content="Fish &amp; chips, &lt;fresh&gt; daily &mdash; &#x263A;"></head>'
+        '<body><h1>Fish &amp; Chips&nbsp;&nbsp;</h1><img src="/IMG1.JPG" alt="&quot;plate&quot;"></body></html>'
+    ),
+    'body_comments': (
+        '<html><body><!-- header --><main><p>Words <!-- inline --> and more words</p>'
+        '<div class="menu">Skip me</div><noscript>Enable JS</noscript><style>p{}</style></main></body></html>'
+    ),
+    'no_head_or_body': '<title>Bare</title><h1>Bare heading</h1><p>Text</p><img alt="">',
+    'title_escaped_markup': (
+        '<html><head><title>Use &lt;div&gt; tags correctly when building accessible HTML pages</title></head>'
+        '<body><h1>Escaped &lt;b&gt; markup</h1></body></html>'
+    ),
+    'svg_title': (
+        '<html><head><title>Page title</title></head><body><p>Download</p>'
+        '<svg viewBox="0 0 10 10"><title>Download &amp; share icon</title><path d="M0 0h10"/></svg></body></html>'
+    ),
+    'svg_title_without_head': '<title>Bare title</title><p>Text</p><svg><title>Icon label</title></svg>',
+    'canonical_and_meta': (
+        '<html><head><link rel="Canonical Alternate" href="/a"><link rel="canonical" href="/b">'
+        '<meta name="description" content="   "><meta name="description" content="second"></head><body></body></html>'
+    ),
+}
+
+def pages():
+    cases = [(os.path.basename(path), open(path, encoding='utf-8').read()) for path in sorted(glob.glob(os.path.join(PAGES_DIR, '*.html')))]
+    return cases + sorted(EDGE_CASES.items())
+
+@pytest.mark.parametrize('name,html', pages(), ids=[name for name, _ in pages()])
+@pytest.mark.parametrize('parser', [parser for parser in webalgo.PARSERS if parser != 'html.parser'])
+def test_backends_give_the_same_findings(parser, name, html):
+    url = f'https://example.com/{name}'
+    expected = HTMLSEOScanner().scan_html(html, url)
+    assert HTMLSEOScanner(parser=parser).scan_html(html, url) == expected
+
+@pytest.mark.parametrize('name,html', pages(), ids=[name for name, _ in pages()])
+@pytest.mark.parametrize('parser', [parser for parser in webalgo.PARSERS if parser != 'html.parser'])
+def test_backends_extract_the_same_content(parser, name, html):
+    expected = HTMLSEOScanner().extract_page_content(html)
+    assert HTMLSEOScanner(parser=parser).extract_page_content(html) == expected
+
+@pytest.mark.parametrize('name,html', sorted(EDGE_CASES.items()), ids=sorted(EDGE_CASES))
+def test_streaming_scanner_gives_the_same_findings(name, html):
+    url = f'https://example.com/{name}'
+    scanner = StreamingHTMLSEOScanner(url=url)
+    for start in range(0, len(html), 17):
+        scanner.feed(html[start:start + 17])
+    assert scanner.close() == HTMLSEOScanner().scan_html(html, url)
+
+def test_h1_style_text_is_not_counted():
+    html = EDGE_CASES['h1_inline_style']
+    for parser in webalgo.PARSERS:
+        issues = [finding['issue'] for finding in HTMLSEOScanner(parser=parser).scan_html(html)['warnings']]
+        assert 'H1 too short' in issues, parser
+
+@pytest.mark.parametrize('parser', webalgo.PARSERS)
+def test_escaped_markup_stays_in_the_title(parser):
+    scanner = HTMLSEOScanner(parser=parser)
+    html = EDGE_CASES['title_escaped_markup']
+    title = 'Use <div> tags correctly when building accessible HTML pages'
+    assert scanner.extract_page_content(html)['title'] == title
+    findings = scanner.scan_html(html)
+    assert [finding['actual_text'] for finding in findings['warnings'] if finding['element'] == 'Title Tag'] == []
+    assert [finding['description'] for finding in findings['recommendations'] if finding['element'] == 'Title Tag'] == [
+        'Title is 60 characters, ideal range is 150-160'
+    ]
+
+@pytest.mark.parametrize('parser', webalgo.PARSERS)
+def test_only_the_document_title_is_left_out_of_body_text(parser):
+    scanner = HTMLSEOScanner(parser=parser)
+    assert scanner.extract_page_content(EDGE_CASES['svg_title'])['body_text'] == 'Download Download & share icon'
+    content = scanner.extract_page_content(EDGE_CASES['svg_title_without_head'])
+    assert content == {'title': 'Bare title', 'meta_description': '', 'body_text': 'Text Icon label'}
@@ -0,0 +1,95 @@
+import glob
+import json
+import os
+import pytest
+import ruleconfig
+import webalgo
+from cache import ResultCache
+from ruleconfig import RuleConfig
+from scanpool import ScanPool
+from webalgo import HTMLSEOScanner
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmark_pages')
+
+CONFIGS = {
+    'default': None,
+    'custom': RuleConfig({
+        'title': {'min_length': 40, 'max_length': 60, 'ideal_min_length': 50},
+        'h1': {'min_length': 5},
+        'meta_description': {'min_length': 20, 'max_length': 90},
+        'image_alt': {'ideal_min_length': 10, 'max_length': 30},
+        'image_filename': {'non_descriptive_pattern': r'^dsc_\d+\.jpg$'},
+        'url': {'max_path_length': 10},
+    }),
+}
+
+def generated_page(number):
+    """Pages whose titles, headings, descriptions and images cover every outcome of the tables"""
+    images = ''.join(
+        f'<img src="/{"dsc_%04d.jpg" % i if i % 3 else "IMG%d.png" % i}"{"" if i % 5 == 0 else " alt=%r" % ("x" * (i * 7 % 140))}>'
+        for i in range(number % 12)
+    )
+    titles = '' if number % 7 == 0 else '<title>' + 'T' * (number * 11 % 200) + '</title>' * (1 + (number % 9 == 0))
+    h1s = ''.join(f'<h1>{"H" * (number * 3 % 90)}</h1>' for _ in range(number % 3))
+    meta = '' if number % 4 == 0 else f'<meta name="description" content="{"d" * (number * 13 % 190)}">'
+    return f'<html><head>{titles}{meta}</head><body>{h1s}<h2>Section</h2><h4>Deep</h4>{images}</body></html>'
+
+def batch():
+    docs = [open(path, encoding='utf-8').read() for path in sorted(glob.glob(os.path.join(PAGES_DIR, '*.html')))]
+    docs += [generated_page(number) for number in range(120)]
+    urls = [f'https://example.com/section_{number}/page-{number}' if number % 2 else None for number in range(len(docs))]
+    return docs, urls
+
+@pytest.mark.parametrize('config', sorted(CONFIGS))
+@pytest.mark.parametrize('parser', webalgo.PARSERS)
+def test_scan_batch_matches_scan_html(parser, config):
+    docs, urls = batch()
+    scanner = HTMLSEOScanner(parser=parser, config=CONFIGS[config])
+    expected = [HTMLSEOScanner(parser=parser, config=CONFIGS[config]).scan_html(html, url) for html, url in zip(docs, urls)]
+    assert scanner.scan_batch(docs, urls) == expected
+
+def test_custom_config_changes_the_findings():
+    docs, urls = batch()
+    assert HTMLSEOScanner(config=CONFIGS['custom']).scan_batch(docs, urls) != HTMLSEOScanner().scan_batch(docs, urls)
+
+@pytest.mark.parametrize('config', sorted(CONFIGS))
+def test_scan_batch_uses_the_cache_and_incremental_state(config):
+    docs, urls = batch()
+    urls = [f'https://example.com/page-{number}' for number in range(len(docs))]
+    expected = HTMLSEOScanner(config=CONFIGS[config]).scan_batch(docs, urls)
+    scanner = HTMLSEOScanner(config=CONFIGS[config], cache=ResultCache(max_entries=10000), incremental=True)
+    # Half the pages scanned before, one at a time, under the URL another page now has
+    for html, url in zip(docs[::2], urls[1::2]):
+        scanner.scan_html(html, url)
+    assert scanner.scan_batch(docs, urls) == expected
+    assert scanner.scan_batch(docs, urls) == expected
+
+def test_scan_pool_matches_scan_html():
+    docs, urls = batch()
+    config = CONFIGS['custom']
+    expected = [HTMLSEOScanner(config=config).scan_html(html, url) for html, url in zip(docs, urls)]
+    with ScanPool(workers=2, config=config) as pool:
+        assert [result['results'] for result in pool.scan_many(docs, urls)] == expected
+        results = list(pool.scan_iter_json(zip(urls, docs), chunksize=5))
+    assert [json.loads(result)['results'] for result in results] == expected
+
+def test_whole_batches_are_classified_together(monkeypatch):
+    docs, urls = batch()
+    calls = []
+    classify_columns = RuleConfig.classify_columns
+    def counting(self, check, *columns):
+        calls.append((check, len(columns[0])))
+        return classify_columns(self, check, *columns)
+    monkeypatch.setattr(RuleConfig, 'classify_columns', counting)
+
+    HTMLSEOScanner().scan_batch(docs, urls)
+    # One call per table for every page of the batch, enough rows for numpy
+    assert sorted(check for check, _ in calls) == ['h1', 'image_alt', 'meta_description', 'title']
+    assert all(rows >= ruleconfig.NUMPY_MIN_ROWS for check, rows in calls if check != 'image_alt')
+
+def test_page_facts_are_plain_data():
+    docs, urls = batch()
+    scanner = HTMLSEOScanner()
+    for html, url in zip(docs, urls):
+        facts = scanner.page_facts(html, url)
+        assert json.loads(json.dumps(facts)) == facts
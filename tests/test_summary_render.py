@@ -0,0 +1,69 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+import pytest
+
+pytestmark = pytest.mark.skipif(shutil.which('node') is None, reason='needs node to run the page script')
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates', 'index.html')
+
+# Just enough of a browser for startEventSource(): the handlers it registers
+# are fed the given events, and the summary element's text is recorded after each
+HARNESS = '''
+const handlers = {};
+class EventSource {
+    constructor(url) {}
+    addEventListener(name, handler) { handlers[name] = handler; }
+    close() {}
+}
+const summaryDiv = {textContent: 'Summary of the previous scan', innerHTML: '', style: {display: 'block'}};
+const document = {cookie: '', querySelectorAll: () => []};
+const actionBtn = {disabled: true};
+let eventSource = null;
+let prefetchPromise = null;
+function prefetchAIRecommendations(context) { return null; }
+%s
+startEventSource('task-1');
+const shown = [summaryDiv.textContent];
+for (const [name, data] of %s) {
+    handlers[name]({data: JSON.stringify(data)});
+    shown.push(summaryDiv.textContent);
+}
+console.log(JSON.stringify(shown));
+'''
+
+def shown_summary(events):
+    """Text of the summary element after startEventSource() and then after each (event, data)"""
+    with open(TEMPLATE, encoding='utf-8') as f:
+        template = f.read()
+    function = re.search(r'function startEventSource\(taskId\) \{.*?\n    \}\n', template, re.DOTALL).group(0)
+    script = HARNESS % (function, json.dumps(events))
+    output = subprocess.run(['node', '-e', script], capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+def test_deltas_are_shown_as_they_arrive():
+    shown = shown_summary([
+        ('summary_delta', {'delta': 'A shop '}),
+        ('summary_delta', {'delta': 'for garden tools.'}),
+        ('summary_complete', {'summary': 'A shop for garden tools.', 'task_id': 'task-1'}),
+    ])
+    assert shown == ['', 'A shop ', 'A shop for garden tools.', 'A shop for garden tools.']
+
+def test_complete_replaces_the_streamed_text():
+    shown = shown_summary([
+        ('summary_delta', {'delta': 'A shop '}),
+        ('summary_complete', {'summary': 'A shop for garden tools.', 'task_id': 'task-1'}),
+    ])
+    assert shown[-1] == 'A shop for garden tools.'
+
+def test_reset_clears_the_shown_text():
+    shown = shown_summary([
+        ('summary_delta', {'delta': 'A shop '}),
+        ('summary_delta', {'delta': 'for '}),
+        ('summary_reset', {'attempt': 1, 'task_id': 'task-1'}),
+        ('summary_delta', {'delta': 'A shop '}),
+        ('summary_delta', {'delta': 'for garden tools.'}),
+    ])
+    assert shown == ['', 'A shop ', 'A shop for ', '', 'A shop ', 'A shop for garden tools.']
@@ -0,0 +1,151 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import pytest
+import app
+from cache import ResultCache
+from eventbus import EventBus
+from llm import stream_completion
+from scheduler import JobScheduler
+
+CONTENT = {'title': 'Garden tools', 'meta_description': 'Tools for gardeners', 'body_text': 'Spades, rakes and hoes for every garden.'}
+TERMINAL_EVENTS = ('summary_complete', 'summary_error', 'summary_cancelled')
+
+def chunk(content=None):
+    """A streamed completion chunk; without content it has no choices, like Azure's content filter chunk"""
+    if content is None:
+        return SimpleNamespace(choices=[])
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+class FakeStreamingClient:
+    """
+    chat.completions.create(stream=True) yielding the given deltas, then
+    raising `error` if set. `attempts` gives (deltas, error) per call instead
+    """
+    def __init__(self, deltas=(), error=None, attempts=None):
+        self.attempts = list(attempts) if attempts is not None else None
+        self.deltas = deltas
+        self.error = error
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, stream=False, **params):
+        assert stream
+        self.calls += 1
+        if self.attempts is not None:
+            return self.stream(*self.attempts.pop(0))
+        return self.stream(self.deltas, self.error)
+
+    def stream(self, deltas, error):
+        yield chunk()
+        for delta in deltas:
+            yield chunk(delta)
+            yield chunk('')
+        if error is not None:
+            raise error
+
+@pytest.fixture
+def summarizer(monkeypatch):
+    """Point the app's summarization at fresh in-memory state and return a function installing a fake client"""
+    monkeypatch.setattr(app, 'ai_stream', True)
+    monkeypatch.setattr(app, 'event_bus', EventBus())
+    monkeypatch.setattr(app, 'summary_cache', ResultCache(16, 60))
+    monkeypatch.setattr(app, 'summarize_scheduler', JobScheduler(workers=1, max_retries=0, retry_backoff=0.01))
+
+    def install(client):
+        monkeypatch.setattr(app, 'client', client)
+        return client
+    return install
+
+def task_events(task_id):
+    """Events published for a task up to the first terminal one"""
+    events = []
+    for event in app.event_bus.subscribe(task_id, heartbeat=5):
+        assert event is not None, f'no terminal event, got {events}'
+        events.append(event)
+        if event['event'] in TERMINAL_EVENTS:
+            return events
+
+def test_stream_completion_yields_deltas_in_order():
+    client = FakeStreamingClient(['Spades', ', rakes', ' and hoes.'])
+    assert list(stream_completion(client, 'model', [])) == ['Spades', ', rakes', ' and hoes.']
+
+def test_summary_deltas_arrive_in_order_then_complete(summarizer):
+    client = summarizer(FakeStreamingClient(['A shop ', 'for garden ', 'tools.']))
+    app.background_summarize_task('task-1', 'https://example.com/', CONTENT, {'extract_ms': 1.0})
+
+    events = task_events('task-1')
+    assert [event['event'] for event in events] == ['summary_delta'] * 3 + ['summary_complete']
+    assert [event['data']['delta'] for event in events[:3]] == ['A shop ', 'for garden ', 'tools.']
+    assert [event['id'] for event in events] == sorted(event['id'] for event in events)
+
+    complete = events[-1]['data']
+    assert complete['summary'] == 'A shop for garden tools.'
+    assert complete['task_id'] == 'task-1'
+    assert complete['timings']['extract_ms'] == 1.0
+    assert 'summarize_ms' in complete['timings']
+    assert app.task_status['task-1'] == 'completed'
+    assert app.task_results['task-1']['summary'] == 'A shop for garden tools.'
+    assert client.calls == 1
+
+def test_cached_summary_completes_without_deltas(summarizer):
+    client = summarizer(FakeStreamingClient(['Cached ', 'summary.']))
+    app.background_summarize_task('task-2', 'https://example.com/', CONTENT)
+    app.background_summarize_task('task-3', 'https://example.com/', CONTENT)
+
+    events = task_events('task-3')
+    assert [event['event'] for event in events] == ['summary_complete']
+    assert events[0]['data']['summary'] == 'Cached summary.'
+    assert client.calls == 1
+
+def test_stream_error_partway_sends_summary_error(summarizer):
+    summarizer(FakeStreamingClient(['A shop ', 'for '], error=RuntimeError('connection reset')))
+    app.summarize_scheduler.submit(
+        'task-4', app.background_summarize_task, ('task-4', 'https://example.com/', CONTENT),
+        on_error=app.summarize_task_failed
+    )
+
+    events = task_events('task-4')
+    assert [event['event'] for event in events] == ['summary_delta', 'summary_delta', 'summary_error']
+    assert events[-1]['data'] == {'error': 'connection reset', 'task_id': 'task-4'}
+    assert app.task_status['task-4'] == 'failed'
+    assert app.summary_cache.stats()['entries'] == 0
+
+def test_retried_stream_resets_before_streaming_again(summarizer, monkeypatch):
+    monkeypatch.setattr(app, 'summarize_scheduler', JobScheduler(workers=1, max_retries=1, retry_backoff=0.01))
+    client = summarizer(FakeStreamingClient(attempts=[
+        (['A shop ', 'for '], RuntimeError('connection reset')),
+        (['A shop ', 'for garden ', 'tools.'], None),
+    ]))
+    app.summarize_scheduler.submit(
+        'task-5', app.background_summarize_task, ('task-5', 'https://example.com/', CONTENT),
+        on_error=app.summarize_task_failed
+    )
+
+    events = task_events('task-5')
+    assert [event['event'] for event in events] == (
+        ['summary_delta'] * 2 + ['summary_reset'] + ['summary_delta'] * 3 + ['summary_complete']
+    )
+    assert events[2]['data'] == {'attempt': 1, 'task_id': 'task-5'}
+    # A client that drops its deltas on summary_reset ends up with the final summary
+    text = ''
+    for event in events[:-1]:
+        text = '' if event['event'] == 'summary_reset' else text + event['data']['delta']
+    assert text == events[-1]['data']['summary'] == 'A shop for garden tools.'
+    assert client.calls == 2
+
+def test_full_queue_answers_429_before_the_summary_is_queued(summarizer, monkeypatch):
+    # No workers, so queued summaries stay queued
+    monkeypatch.setattr(app, 'summarize_scheduler', JobScheduler(workers=0, max_queue=1))
+    monkeypatch.setattr(app, 'extract_executor', ThreadPoolExecutor(max_workers=1))
+    page = {'html': '<html><head><title>Garden tools</title></head><body>Spades</body></html>',
+            'final_url': 'https://example.com/'}
+
+    body, status = app.scan_fetched_page('https://example.com/', page, 'tenant')
+    assert status == 200
+    # The slot is taken as the response goes out, before extraction queues the summary
+    body, status = app.scan_fetched_page('https://example.com/', page, 'tenant')
+    assert (body['success'], status) == (False, 429)
+
+    app.extract_executor.shutdown(wait=True)
+    stats = app.summarize_scheduler.stats()
+    assert (stats['queued'], stats['reserved']) == (1, 0)
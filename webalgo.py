@@ -1,152 +1,1096 @@
 import re
-from bs4 import BeautifulSoup
-from urllib.parse import urlparse
+import hashlib
+import html
+import threading
+from html.parser import HTMLParser
+from bs4 import BeautifulSoup, NavigableString, CData, Tag
+from bs4.builder import HTMLTreeBuilder
+from urllib.parse import urlparse, urljoin, urldefrag
 import os
+from metrics import timer, incremental_rules
+from ruleconfig import default_rule_config
 
-class HTMLSEOScanner:
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # selectolax is only needed for the 'selectolax' parser
+    LexborHTMLParser = None
+
+# Elements whose text never counts as page content
+STRIPPED_TAGS = ['script', 'style', 'noscript']
+
+# Layout elements left out of the extracted body text
+BOILERPLATE_TAGS = ['nav', 'footer', 'aside', 'header']
+
+# Class names that mark non-content elements, matched against whole class tokens
+NON_CONTENT_CLASSES = frozenset([
+    'navigation', 'nav', 'menu', 'sidebar', 'footer', 'header',
+    'advertisement', 'ads', 'social', 'share', 'comments'
+])
+
+# Elements that hold the page content, never left out whatever their classes
+# (themes put classes like "nav-open" or "has-header-image" on <body>)
+CONTENT_ROOT_TAGS = frozenset(['html', 'body', 'main'])
+
+# Document metadata, never body text. The document's own <title> is left
+# out too, wherever it is: html.parser keeps a page without <head> in one
+# tree, where the other backends move it into <head>
+METADATA_TAGS = ['head']
+
+# Subtrees whose <title> is never the document's title
+FOREIGN_TAGS = ['svg', 'math']
+
+# Tags whose whole subtree is left out of the extracted body text
+SKIPPED_CONTENT_TAGS = frozenset(STRIPPED_TAGS + BOILERPLATE_TAGS + METADATA_TAGS)
+
+# String types BeautifulSoup's get_text() treats as visible text
+TEXT_STRING_TYPES = (NavigableString, CData)
+
+# Elements whose text BeautifulSoup's get_text() leaves out (it keeps it as
+# Script and Stylesheet strings); the other backends skip them to match
+NON_TEXT_TAGS = frozenset(['script', 'style'])
+
+# Start tag and raw contents of a <title> in the page source, up to its end
+# tag. lxml and selectolax keep these contents as text, as HTML5 does, with
+# references decoded, while html.parser parses the markup in them out
+TITLE_SOURCE_PATTERN = re.compile(
+    r'<title(?:\s+[^\s/>=]+(?:\s*=\s*(?:"[^"]*"|\'[^\']*\'|[^\s>]+))?)*\s*/?>(.*?)(?:</title[\s/>]|\Z)',
+    re.IGNORECASE | re.DOTALL
+)
+
+# Parser backends accepted by HTMLSEOScanner and ParsedDocument
+PARSERS = ['html.parser', 'lxml', 'selectolax']
+
+# Version of the checks' findings; bump it whenever a check changes what it
+# reports so cached scan results are no longer used
+RULESET_VERSION = '2'
+
+# Version of the extracted content, bumped like RULESET_VERSION
+EXTRACTION_VERSION = '3'
+
+class MarkupTextReader(HTMLParser):
+    """Text html.parser reads from a fragment of markup: tags and comments left out, script and style contents skipped"""
     def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+    
+    def handle_data(self, data):
+        if self.cdata_elem is None:
+            self.parts.append(data)
+
+def markup_text(markup):
+    """The text of a fragment of markup as html.parser reads it, or None if it rejects the markup"""
+    reader = MarkupTextReader()
+    try:
+        reader.feed(markup)
+        reader.close()
+    except AssertionError:
+        return None
+    return ''.join(reader.parts)
+
+def title_texts_as_markup(html_content, texts):
+    """
+    Read the text of <title> elements that lxml or selectolax kept as raw
+    text the way html.parser does, given those texts in document order.
+    The trees only hold them with references decoded, which loses whether
+    a '<' was markup or &lt;, so each is read from the raw contents in the
+    source that decode to it. A text without '<' has no markup to leave out
+    and a text with no such source is kept, so both come back unchanged
+    """
+    sources = None
+    results = []
+    for text in texts:
+        result = text
+        if '<' in text:
+            if sources is None:
+                sources = [match.group(1) for match in TITLE_SOURCE_PATTERN.finditer(html_content or '')]
+            for index, raw in enumerate(sources):
+                # The parsers read CR and CRLF line ends as LF
+                if raw is not None and html.unescape(raw.replace('\r\n', '\n').replace('\r', '\n')) == text:
+                    sources[index] = None
+                    result = markup_text(raw)
+                    if result is None:
+                        result = text
+                    break
+        results.append(result)
+    return results
+
+class SoupTree:
+    """
+    BeautifulSoup tree built with html.parser or lxml.
+    bs4 Tags already provide the element interface the checks use:
+    .name, .attrs, .get(attribute, default) and .get_text()
+    With lxml, titles kept as raw text are read as html.parser reads them.
+    """
+    def __init__(self, html_content, features):
+        self.soup = BeautifulSoup(html_content, features)
+        if features != 'html.parser':
+            titles = [tag for tag in self.soup.find_all('title')
+                      if len(tag.contents) == 1 and type(tag.contents[0]) is NavigableString]
+            texts = title_texts_as_markup(html_content, [tag.contents[0] for tag in titles])
+            for tag, text in zip(titles, texts):
+                if text != tag.contents[0]:
+                    tag.string = text
+    
+    def same_element(self, first, second):
+        return first is second
+    
+    def iter_elements(self, skip=()):
+        """Yield elements in document order, leaving out the subtrees of tags in skip"""
+        if not skip:
+            for node in self.soup.descendants:
+                if isinstance(node, Tag):
+                    yield node
+            return
+        
+        stack = list(reversed(self.soup.contents))
+        while stack:
+            node = stack.pop()
+            if not isinstance(node, Tag) or node.name in skip:
+                continue
+            yield node
+            stack.extend(reversed(node.contents))
+    
+    def collect_text(self, skip_element):
+        """
+        Collect the stripped, non-empty visible strings of the first <body>
+        (or the whole document if there is none) in document order. Elements
+        for which skip_element() returns True are left out with their subtrees.
+        """
+        strings = []
+        body_found = False
+        # Iterative walk in document order: (node, inside the first <body>)
+        stack = [(child, False) for child in reversed(self.soup.contents)]
+        while stack:
+            node, in_body = stack.pop()
+            if isinstance(node, NavigableString):
+                if type(node) in TEXT_STRING_TYPES:
+                    text = node.strip()
+                    if text:
+                        strings.append((text, in_body))
+                continue
+            if skip_element(node):
+                continue
+            if node.name == 'body' and not body_found:
+                body_found = True
+                in_body = True
+            stack.extend((child, in_body) for child in reversed(node.contents))
+        
+        if body_found:
+            return [text for text, in_body in strings if in_body]
+        return [text for text, in_body in strings]
+
+class LexborElement:
+    """Element wrapper giving selectolax nodes the same interface as bs4 Tags"""
+    __slots__ = ('node', 'name')
+    
+    def __init__(self, node):
+        self.node = node
+        self.name = node.tag
+    
+    def get(self, key, default=None):
+        attributes = self.node.attributes
+        if key not in attributes:
+            return default
+        # Valueless attributes (<img alt>) read as '' like in bs4
+        value = attributes[key]
+        return '' if value is None else value
+    
+    @property
+    def attrs(self):
+        return self.node.attributes
+    
+    def get_text(self):
+        """Text of the element's visible text nodes, leaving out script and style contents like bs4"""
+        parts = []
+        stack = [self.node]
+        while stack:
+            node = stack.pop()
+            if node.is_text_node:
+                parts.append(node.text(deep=False))
+            elif node.is_element_node and (node is self.node or node.tag not in NON_TEXT_TAGS):
+                stack.extend(reversed(list(node.iter(include_text=True))))
+        return ''.join(parts)
+
+class LexborTree:
+    """
+    selectolax tree built with the lexbor HTML5 parser. Titles kept as raw
+    text are read as html.parser reads them
+    """
+    def __init__(self, html_content):
+        if LexborHTMLParser is None:
+            raise ImportError("The 'selectolax' parser requires the selectolax package")
+        self.tree = LexborHTMLParser(html_content)
+        titles = [node for node in self.tree.css('title')
+                  if node.child is not None and node.child.is_text_node and node.child.next is None]
+        texts = title_texts_as_markup(html_content, [node.child.text(deep=False) for node in titles])
+        for node, text in zip(titles, texts):
+            if text != node.child.text(deep=False):
+                node.child.replace_with(text)
+    
+    def same_element(self, first, second):
+        return first.node == second.node
+    
+    def _children(self, node):
+        return list(node.iter(include_text=True))
+    
+    def iter_elements(self, skip=()):
+        """Yield elements in document order, leaving out the subtrees of tags in skip"""
+        root = self.tree.root
+        stack = [root] if root is not None else []
+        while stack:
+            node = stack.pop()
+            if not node.is_element_node or node.tag in skip:
+                continue
+            yield LexborElement(node)
+            stack.extend(reversed(self._children(node)))
+    
+    def collect_text(self, skip_element):
+        """
+        Collect the stripped, non-empty visible strings of the first <body>
+        (or the whole document if there is none) in document order. Elements
+        for which skip_element() returns True are left out with their subtrees.
+        """
+        root = self.tree.root
+        strings = []
+        body_found = False
+        stack = [(root, False)] if root is not None else []
+        while stack:
+            node, in_body = stack.pop()
+            if node.is_text_node:
+                text = node.text(deep=False).strip()
+                if text:
+                    strings.append((text, in_body))
+                continue
+            if not node.is_element_node or skip_element(LexborElement(node)):
+                continue
+            if node.tag == 'body' and not body_found:
+                body_found = True
+                in_body = True
+            stack.extend((child, in_body) for child in reversed(self._children(node)))
+        
+        if body_found:
+            return [text for text, in_body in strings if in_body]
+        return [text for text, in_body in strings]
+
+class ParsedDocument:
+    """
+    HTML content parsed once and shared by the SEO checks and content extraction.
+    Nothing that reads the document modifies the tree, and the checks and
+    extractors only go through iter_elements() and collect_text(), so they run
+    unchanged on every parser backend. The tree is built on first use, so a
+    document whose results come from a cache is never parsed, and only once
+    when several threads read the document at the same time.
+    """
+    def __init__(self, html_content, parser='html.parser'):
+        if parser not in PARSERS:
+            raise ValueError(f"Unknown parser '{parser}', expected one of: {', '.join(PARSERS)}")
+        self.html_content = html_content
+        self.parser = parser
+        self._tree = None
+        self._tree_lock = threading.Lock()
+        self._content_hash = None
+    
+    @property
+    def tree(self):
+        if self._tree is None:
+            with self._tree_lock:
+                if self._tree is None:
+                    with timer('parse', parser=self.parser):
+                        if self.parser == 'selectolax':
+                            self._tree = LexborTree(self.html_content)
+                        else:
+                            self._tree = SoupTree(self.html_content, self.parser)
+        return self._tree
+    
+    @property
+    def content_hash(self):
+        """BLAKE2 digest of the HTML, used to key cached results"""
+        if self._content_hash is None:
+            data = (self.html_content or '').encode('utf-8', 'surrogatepass')
+            self._content_hash = hashlib.blake2b(data, digest_size=16).hexdigest()
+        return self._content_hash
+    
+    def iter_elements(self, skip=()):
+        """Yield elements in document order, leaving out the subtrees of tags in skip"""
+        return self.tree.iter_elements(skip)
+    
+    def collect_text(self, skip_element):
+        """Collect the visible body strings outside skipped elements"""
+        return self.tree.collect_text(skip_element)
+    
+    def same_element(self, first, second):
+        """Check whether two elements from the document are the same node"""
+        return self.tree.same_element(first, second)
+
+class SEORule:
+    """
+    A check that runs during the single walk over the document.
+    visit() is called for every element whose tag name is in `tags`, in
+    document order; report() adds the findings to the scanner once the walk is done.
+    Rules with `head` set only read elements that belong in <head>, so the
+    streaming scanner can report them as soon as </head> arrives.
+    Rules with a `table` are length checks against that threshold table of
+    the rule config instead. Once the walk is done, facts() reduces what they
+    visited to plain, JSON-serializable values; rows() gives the (count,
+    length[, stripped length]) rows of those facts to classify, and
+    table_findings() the findings for the outcomes of the rows. Scanners
+    only keep the facts, so a page's tree can be freed right after its walk
+    and the rows of many pages classified in one pass.
+    """
+    tags = ()
+    head = False
+    table = None
+    
+    def visit(self, element):
+        pass
+    
+    def report(self, scanner):
+        pass
+    
+    def facts(self):
+        return None
+    
+    @staticmethod
+    def rows(facts):
+        return []
+    
+    @staticmethod
+    def table_findings(facts, outcomes, config):
+        return []
+
+class TitleTagRule(SEORule):
+    tags = ('title',)
+    head = True
+    table = 'title'
+    
+    def __init__(self):
+        self.title_tags = []
+    
+    def visit(self, element):
+        self.title_tags.append(element)
+    
+    def facts(self):
+        text = self.title_tags[0].get_text().strip() if len(self.title_tags) == 1 else ''
+        return {'count': len(self.title_tags), 'text': text}
+    
+    @staticmethod
+    def rows(facts):
+        return [(facts['count'], len(facts['text']))]
+    
+    @staticmethod
+    def table_findings(facts, outcomes, config):
+        return title_findings(outcomes[0], facts['count'], facts['text'], config)
+
+class H1TagRule(SEORule):
+    tags = ('h1',)
+    table = 'h1'
+    
+    def __init__(self):
+        self.h1_tags = []
+    
+    def visit(self, element):
+        self.h1_tags.append(element)
+    
+    def facts(self):
+        text = self.h1_tags[0].get_text().strip() if len(self.h1_tags) == 1 else ''
+        return {'count': len(self.h1_tags), 'text': text}
+    
+    @staticmethod
+    def rows(facts):
+        return [(facts['count'], len(facts['text']))]
+    
+    @staticmethod
+    def table_findings(facts, outcomes, config):
+        return h1_findings(outcomes[0], facts['count'], facts['text'], config)
+
+class HeaderHierarchyRule(SEORule):
+    tags = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+    
+    def __init__(self):
+        self.headers = []
+    
+    def visit(self, element):
+        self.headers.append(element)
+    
+    def report(self, scanner):
+        scanner._check_header_hierarchy(self.headers)
+
+class MetaDescriptionRule(SEORule):
+    tags = ('meta',)
+    head = True
+    table = 'meta_description'
+    
+    def __init__(self):
+        self.meta_desc = None
+    
+    def visit(self, element):
+        # Only the first description counts
+        if self.meta_desc is None and element.get('name') == 'description':
+            self.meta_desc = element
+    
+    def facts(self):
+        if self.meta_desc is None:
+            return {'count': 0, 'content': ''}
+        return {'count': 1, 'content': self.meta_desc.get('content', '').strip()}
+    
+    @staticmethod
+    def rows(facts):
+        return [(facts['count'], len(facts['content']))]
+    
+    @staticmethod
+    def table_findings(facts, outcomes, config):
+        return meta_description_findings(outcomes[0], facts['content'], config)
+
+class ImageRule(SEORule):
+    tags = ('img',)
+    table = 'image_alt'
+    
+    def __init__(self):
+        self.images = []
+    
+    def visit(self, element):
+        self.images.append(element)
+    
+    def facts(self):
+        return {'alts': [img.get('alt') for img in self.images], 'srcs': [img.get('src', '') for img in self.images]}
+    
+    @staticmethod
+    def rows(facts):
+        return [alt_facts(alt_text) for alt_text in facts['alts']]
+    
+    @staticmethod
+    def table_findings(facts, outcomes, config):
+        if not facts['alts']:
+            return []
+        filenames = [non_descriptive_filename(src, config) for src in facts['srcs']]
+        return image_findings(facts['alts'], outcomes, filenames, config)
+
+def is_canonical_link(element):
+    """Check whether a <link> element has rel=canonical"""
+    rel = element.get('rel') or []
+    # bs4 splits rel into a list of values, other backends keep the string
+    if isinstance(rel, str):
+        rel = rel.split()
+    return 'canonical' in rel or ' '.join(rel) == 'canonical'
+
+class CanonicalTagRule(SEORule):
+    tags = ('link',)
+    head = True
+    
+    def __init__(self):
+        self.canonical_tags = []
+    
+    def visit(self, element):
+        if is_canonical_link(element):
+            self.canonical_tags.append(element)
+    
+    def report(self, scanner):
+        scanner._check_canonical_tags(self.canonical_tags)
+
+# Document rules in report order; add a rule here to have it run in the same walk
+SEO_RULES = [
+    TitleTagRule,
+    H1TagRule,
+    HeaderHierarchyRule,
+    MetaDescriptionRule,
+    ImageRule,
+    CanonicalTagRule,
+]
+
+def rule_dispatch(rules):
+    """Map each tag name to the rules registered for it"""
+    dispatch = {}
+    for rule in rules:
+        for tag in rule.tags:
+            dispatch.setdefault(tag, []).append(rule)
+    return dispatch
+
+# Void elements of BeautifulSoup's html.parser builder, closed as soon as they open
+SOUP_VOID_TAGS = HTMLTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS
+
+class RegionTokenizer(HTMLParser):
+    """
+    Fingerprints the elements each rule visits for the html.parser backend
+    without building the tree. It tokenizes with the same HTMLParser that
+    BeautifulSoup's html.parser builder uses, and opens and closes elements
+    the way that builder does: void elements close at once, and an end tag
+    closes the most recent open element with its name along with everything
+    opened inside it, or is ignored when there is none. Every token read
+    while one of a rule's elements is open goes into the rule's digest.
+    """
+    def __init__(self, rules):
+        super().__init__(convert_charrefs=False)
+        self.digests = {rule.__name__: hashlib.blake2b(digest_size=16) for rule in rules}
+        self.tag_rules = {}
+        for rule in rules:
+            for tag in rule.tags:
+                self.tag_rules.setdefault(tag, []).append(rule.__name__)
+        # Open elements as (tag, names of the rules that visit it)
+        self.open_elements = []
+        # Rule name -> number of its elements that are open
+        self.open_counts = {}
+    
+    def _token(self, kind, value):
+        if self.open_counts:
+            token = f'{kind}\0{value}\0'.encode('utf-8', 'surrogatepass')
+            for name in self.open_counts:
+                self.digests[name].update(token)
+    
+    def _open(self, tag, attrs):
+        names = self.tag_rules.get(tag, ())
+        for name in names:
+            self.open_counts[name] = self.open_counts.get(name, 0) + 1
+        self._token('start', f'{tag}{attrs!r}')
+        self.open_elements.append((tag, names))
+    
+    def _close(self, tag):
+        for index in range(len(self.open_elements) - 1, -1, -1):
+            if self.open_elements[index][0] == tag:
+                break
+        else:
+            return
+        self._token('end', tag)
+        for _, names in self.open_elements[index:]:
+            for name in names:
+                self.digests[name].update(b'close\0')
+                if self.open_counts[name] == 1:
+                    del self.open_counts[name]
+                else:
+                    self.open_counts[name] -= 1
+        del self.open_elements[index:]
+    
+    def handle_starttag(self, tag, attrs):
+        self._open(tag, attrs)
+        if tag in SOUP_VOID_TAGS:
+            self._close(tag)
+    
+    def handle_startendtag(self, tag, attrs):
+        self._open(tag, attrs)
+        self._close(tag)
+    
+    def handle_endtag(self, tag):
+        self._close(tag)
+    
+    def handle_data(self, data):
+        self._token('data', data)
+    
+    def handle_entityref(self, name):
+        self._token('entityref', name)
+    
+    def handle_charref(self, name):
+        self._token('charref', name)
+    
+    def handle_comment(self, data):
+        self._token('comment', data)
+    
+    def handle_decl(self, decl):
+        self._token('decl', decl)
+    
+    def handle_pi(self, data):
+        self._token('pi', data)
+    
+    def unknown_decl(self, data):
+        self._token('unknown_decl', data)
+
+def region_fingerprints(html_content, rules):
+    """
+    BLAKE2 digest of the markup of the elements each rule visits, by rule
+    name, for the html.parser backend. It covers more than the rule reads,
+    so an unchanged fingerprint means unchanged findings, and costs a
+    tokenizer pass instead of a parse. Returns None when the tokenizer
+    rejects the markup
+    """
+    tokenizer = RegionTokenizer(rules)
+    try:
+        tokenizer.feed(html_content or '')
+        tokenizer.close()
+    except Exception:
+        return None
+    return {name: digest.hexdigest() for name, digest in tokenizer.digests.items()}
+
+def element_fingerprint(element):
+    """Bytes of everything a rule can read from an element: its name, attributes and text"""
+    attributes = sorted(element.attrs.items())
+    return f'{element.name}\0{attributes!r}\0{element.get_text()}\0'.encode('utf-8', 'surrogatepass')
+
+def title_findings(outcome, count, title_text, config):
+    """(list name, finding) pairs for the outcome of the title check"""
+    limits = config['title']
+    title_length = len(title_text)
+    if outcome == 'missing':
+        return [('vulnerabilities', {
+            'type': 'CRITICAL',
+            'element': 'Title Tag',
+            'issue': 'Missing title tag',
+            'description': 'No title tag found in the HTML',
+            'suggest':True
+        })]
+    if outcome == 'multiple':
+        return [('vulnerabilities', {
+            'type': 'WARNING',
+            'element': 'Title Tag',
+            'issue': 'Multiple title tags',
+            'description': f'Found {count} title tags, should have only one'
+        })]
+    if outcome == 'empty':
+        return [('vulnerabilities', {
+            'type': 'CRITICAL',
+            'element': 'Title Tag',
+            'issue': 'Empty title tag',
+            'description': 'Title tag is empty',
+            'suggest':True
+        })]
+    if outcome == 'short':
+        return [('warnings', {
+            'type': 'WARNING',
+            'element': 'Title Tag',
+            'issue': 'Title too short',
+            'actual_text': title_text,
+            'description': f'Title is {title_length} characters, recommended minimum is {limits["min_length"]}',
+            'suggest':True
+        })]
+    if outcome == 'long':
+        return [('vulnerabilities', {
+            'type': 'WARNING',
+            'element': 'Title Tag',
+            'issue': 'Title too long',
+            'actual_text': title_text,
+            'description': f'Title is {title_length} characters, recommended maximum is {limits["max_length"]}',
+            'suggest':True
+        })]
+    if outcome == 'optimize':
+        return [('recommendations', {
+            'type': 'RECOMMENDATION',
+            'element': 'Title Tag',
+            'issue': 'Title could be optimized',
+            'actual_text': title_text,
+            'description': f'Title is {title_length} characters, ideal range is {limits["ideal_min_length"]}-{limits["max_length"]}',
+            'suggest':True
+        })]
+    return []
+
+def h1_findings(outcome, count, h1_text, config):
+    """(list name, finding) pairs for the outcome of the H1 check"""
+    limits = config['h1']
+    h1_length = len(h1_text)
+    if outcome == 'missing':
+        return [('vulnerabilities', {
+            'type': 'CRITICAL',
+            'element': 'H1 Tag',
+            'issue': 'Missing H1 tag',
+            'description': 'No H1 tag found on the page',
+            'suggest':True
+        })]
+    if outcome == 'multiple':
+        return [('vulnerabilities', {
+            'type': 'WARNING',
+            'element': 'H1 Tag',
+            'issue': 'Multiple H1 tags',
+            'description': f'Found {count} H1 tags, should have only one per page'
+        })]
+    if outcome == 'empty':
+        return [('vulnerabilities', {
+            'type': 'CRITICAL',
+            'element': 'H1 Tag',
+            'issue': 'Empty H1 tag',
+            'description': 'H1 tag is empty',
+            'suggest':True
+        })]
+    if outcome == 'short':
+        return [('warnings', {
+            'type': 'WARNING',
+            'element': 'H1 Tag',
+            'issue': 'H1 too short',
+            'actual_text': h1_text,
+            'description': f'H1 is {h1_length} characters, recommended minimum is {limits["min_length"]}',
+            'suggest':True
+        })]
+    if outcome == 'long':
+        return [('warnings', {
+            'type': 'WARNING',
+            'element': 'H1 Tag',
+            'issue': 'H1 too long',
+            'actual_text': h1_text,
+            'description': f'H1 is {h1_length} characters, recommended maximum is {limits["max_length"]}',
+            'suggest':True
+        })]
+    return []
+
+def meta_description_findings(outcome, content, config):
+    """(list name, finding) pairs for the outcome of the meta description check"""
+    limits = config['meta_description']
+    desc_length = len(content)
+    if outcome == 'missing':
+        return [('vulnerabilities', {
+            'type': 'CRITICAL',
+            'element': 'Meta Description',
+            'issue': 'Missing meta description',
+            'description': 'No meta description tag found',
+            'suggest':True
+        })]
+    if outcome == 'empty':
+        return [('vulnerabilities', {
+            'type': 'CRITICAL',
+            'element': 'Meta Description',
+            'issue': 'Empty meta description',
+            'description': 'Meta description is empty',
+            'suggest':True
+        })]
+    if outcome == 'short':
+        return [('warnings', {
+            'type': 'WARNING',
+            'element': 'Meta Description',
+            'issue': 'Meta description too short',
+            'actual_text': content,
+            'description': f'Meta description is {desc_length} characters, recommended minimum is {limits["min_length"]}',
+            'suggest':True
+        })]
+    if outcome == 'long':
+        return [('vulnerabilities', {
+            'type': 'WARNING',
+            'element': 'Meta Description',
+            'issue': 'Meta description too long',
+            'actual_text': content,
+            'description': f'Meta description is {desc_length} characters, recommended maximum is {limits["max_length"]}',
+            'suggest':True
+        })]
+    return []
+
+def alt_facts(alt_text):
+    """(count, length, stripped length) of an ALT attribute for the image_alt table; count is 0 when it is missing"""
+    if alt_text is None:
+        return 0, 0, 0
+    return 1, len(alt_text), len(alt_text.strip())
+
+def non_descriptive_filename(src, config):
+    """The image's lowercased file name if it matches the non-descriptive pattern, else None"""
+    if not src:
+        return None
+    filename = os.path.basename(src).lower()
+    return filename if config.image_filename_pattern.match(filename) else None
+
+def image_findings(alts, outcomes, filenames, config):
+    """
+    (list name, finding) pairs for a page's images, from each image's ALT
+    text, image_alt outcome and non_descriptive_filename()
+    """
+    limits = config['image_alt']
+    findings = []
+    for alt_text, outcome, filename in zip(alts, outcomes, filenames):
+        if outcome == 'short':
+            findings.append(('recommendations', {
+                'type': 'RECOMMENDATION',
+                'element': 'Image ALT',
+                'issue': 'ALT text could be longer',
+                'actual_text': alt_text,
+                'description': f'Image ALT text is {len(alt_text)} characters, ideal range is {limits["ideal_min_length"]}-{limits["max_length"]}',
+                'suggest':True
+            }))
+        
+        # Check for descriptive file names
+        if filename is not None:
+            findings.append(('recommendations', {
+                'type': 'RECOMMENDATION',
+                'element': 'Image Filename',
+                'issue': 'Non-descriptive image filename',
+                'description': f'Consider using descriptive filename instead of "{filename}"'
+            }))
+    
+    images_without_alt = outcomes.count('missing')
+    images_with_empty_alt = outcomes.count('empty')
+    images_with_long_alt = outcomes.count('long')
+    if images_without_alt > 0:
+        findings.append(('vulnerabilities', {
+            'type': 'WARNING',
+            'element': 'Image ALT',
+            'issue': 'Missing ALT attributes',
+            'description': f'{images_without_alt} images missing ALT attributes'
+        }))
+    
+    if images_with_empty_alt > 0:
+        findings.append(('warnings', {
+            'type': 'WARNING',
+            'element': 'Image ALT',
+            'issue': 'Empty ALT attributes',
+            'description': f'{images_with_empty_alt} images have empty ALT attributes'
+        }))
+    
+    if images_with_long_alt > 0:
+        findings.append(('warnings', {
+            'type': 'WARNING',
+            'element': 'Image ALT',
+            'issue': 'ALT text too long',
+            'description': f'{images_with_long_alt} images have ALT text longer than {limits["max_length"]} characters'
+        }))
+    return findings
+
+def url_findings(path, config):
+    """(list name, finding) pairs for a URL path"""
+    if not path or path == '/':
+        return []
+    findings = []
+    
+    # Check for underscores
+    if '_' in path:
+        findings.append(('warnings', {
+            'type': 'WARNING',
+            'element': 'URL Structure',
+            'issue': 'Underscores in URL',
+            'description': 'URL contains underscores, hyphens are preferred for SEO'
+        }))
+    
+    # Check URL length
+    if len(path) > config.url_max_path_length:
+        findings.append(('warnings', {
+            'type': 'WARNING',
+            'element': 'URL Structure',
+            'issue': 'URL too long',
+            'description': f'URL path is {len(path)} characters, consider shortening'
+        }))
+    
+    # Check for non-descriptive URLs
+    if config.url_pattern.search(path):
+        findings.append(('recommendations', {
+            'type': 'RECOMMENDATION',
+            'element': 'URL Structure',
+            'issue': 'Non-descriptive URL',
+            'description': 'URL appears to use IDs instead of descriptive keywords'
+        }))
+    return findings
+
+def findings_dict(findings):
+    """The findings dict of (list name, finding) pairs"""
+    results = {'vulnerabilities': [], 'warnings': [], 'recommendations': []}
+    for bucket, finding in findings:
+        results[bucket].append(finding)
+    return results
+
+class HTMLSEOScanner:
+    def __init__(self, parser='html.parser', rules=None, cache=None, incremental=False, config=None):
+        self.parser = parser
+        self.rules = list(rules) if rules is not None else list(SEO_RULES)
+        # Compiled ruleconfig.RuleConfig with the checks' thresholds and patterns
+        self.config = config or default_rule_config
+        # Optional cache.ResultCache for findings and extracted content
+        self.cache = cache
+        # With a cache, re-scans of a URL only re-run the rules whose part of the page changed
+        self.incremental = incremental
+        # Identifies everything besides the page that decides the findings
+        self.ruleset = f"{RULESET_VERSION}:{parser}:{','.join(rule.__name__ for rule in self.rules)}:{self.config.digest}"
         self.vulnerabilities = []
         self.warnings = []
         self.recommendations = []
     
+    def parse(self, html_content):
+        """Parse HTML content into a ParsedDocument, reusing one that is already parsed"""
+        if isinstance(html_content, ParsedDocument):
+            return html_content
+        return ParsedDocument(html_content, self.parser)
+    
     def scan_html(self, html_content, url=None):
         """
-        Main method to scan HTML content for SEO vulnerabilities
+        Main method to scan HTML content for SEO vulnerabilities.
+        Accepts raw HTML or a ParsedDocument from parse()
         """
-        self.vulnerabilities = []
-        self.warnings = []
-        self.recommendations = []
+        return self.evaluate([self.page_facts(html_content, url)], [url])[0]
+    
+    def scan_batch(self, html_docs, urls=None):
+        """
+        Scan many documents (raw HTML or ParsedDocuments) at once, returning
+        the findings of each in order. Each page is reduced to its
+        page_facts() right after its walk, so only one tree is held at a
+        time, and evaluate() then runs the threshold tables over all pages
+        """
+        html_docs = list(html_docs)
+        urls = list(urls) if urls is not None else [None] * len(html_docs)
+        pages = [self.page_facts(html_content, url) for html_content, url in zip(html_docs, urls)]
+        return self.evaluate(pages, urls)
+    
+    def page_facts(self, html_content, url=None):
+        """
+        Walk a page once and reduce it to plain, JSON-serializable values by
+        rule name: the facts of the rules with a threshold table and the
+        findings of the others. evaluate() turns them into the page's findings.
+        With a cache they are kept by page content, and incremental scans of
+        a URL only re-run the rules whose part of the page changed
+        """
+        document = self.parse(html_content)
+        
+        if self.cache is not None:
+            key = f'facts|{self.ruleset}|{document.content_hash}'
+            facts = self.cache.get(key)
+            if facts is not None:
+                return facts
+        
+        if self.incremental and self.cache is not None and url:
+            facts = self._incremental_facts(document, url)
+        else:
+            # Run all document checks in one walk over the tree
+            facts = self.rules_facts(self._run_rules(document))
         
-        soup = BeautifulSoup(html_content, 'html.parser')
+        if self.cache is not None:
+            self.cache.set(key, facts)
+        return facts
+    
+    def _incremental_facts(self, document, url):
+        """
+        page_facts() that re-runs only the rules whose region fingerprint
+        changed since the URL was last scanned, reusing the stored facts of
+        the others. With html.parser the fingerprints come from a tokenizer
+        pass, so a page where no region changed is not parsed at all. lxml
+        and selectolax build their trees with rules no tokenizer here
+        follows, so their fingerprints come from the walk and only the
+        report step is saved
+        """
+        key = f'regions|{self.ruleset}|{url}'
+        previous = self.cache.get(key) or {}
+        previous_fingerprints = previous.get('fingerprints', {})
+        previous_facts = previous.get('facts', {})
         
-        # Run all checks
-        self._check_title_tag(soup)
-        self._check_h1_tag(soup)
-        self._check_header_hierarchy(soup)
-        self._check_meta_description(soup)
-        self._check_image_optimization(soup)
-        self._check_canonical_tags(soup)
-        self._check_url_structure(url)
+        if self.parser == 'html.parser':
+            with timer('fingerprint'):
+                fingerprints = region_fingerprints(document.html_content, self.rules) or {}
+        else:
+            fingerprints = {}
+            rules = self._run_rules(document, fingerprints=fingerprints)
+        changed = [
+            rule for rule in self.rules
+            if not fingerprints or rule.__name__ not in previous_facts
+            or previous_fingerprints.get(rule.__name__) != fingerprints[rule.__name__]
+        ]
+        if self.parser == 'html.parser':
+            rules = self._run_rules(document, changed) if changed else []
+        else:
+            rules = [rule for rule in rules if type(rule) in changed]
+        incremental_rules.inc(len(changed), outcome='rerun')
+        incremental_rules.inc(len(self.rules) - len(changed), outcome='reused')
         
+        new_facts = self.rules_facts(rules)
+        facts = {rule.__name__: new_facts.get(rule.__name__, previous_facts.get(rule.__name__)) for rule in self.rules}
+        self.cache.set(key, {'fingerprints': fingerprints, 'facts': facts})
+        return facts
+    
+    def rules_facts(self, rules):
+        """The page_facts() of rules that have finished visiting a document"""
+        facts = {}
+        for rule in rules:
+            if rule.table is None:
+                facts[type(rule).__name__] = self.rule_findings(rule)
+            else:
+                facts[type(rule).__name__] = rule.facts()
+        return facts
+    
+    def evaluate(self, pages, urls=None):
+        """
+        The findings of pages reduced by page_facts(), in order. The rows of
+        each rule with a threshold table are classified across all the pages
+        with one classify_columns() call
+        """
+        urls = list(urls) if urls is not None else [None] * len(pages)
+        # Rule name -> its findings on each page (None where the page lacks it), for the rules with a table
+        table_findings = {}
+        with timer('check', rule='columns'):
+            for rule in self.rules:
+                if rule.table is None:
+                    continue
+                name = rule.__name__
+                page_rows = [rule.rows(page[name]) if name in page else [] for page in pages]
+                rows = [row for page_row in page_rows for row in page_row]
+                outcomes = self.config.classify_columns(rule.table, *zip(*rows)) if rows else []
+                findings = []
+                start = 0
+                for page, page_row in zip(pages, page_rows):
+                    page_outcomes = outcomes[start:start + len(page_row)]
+                    start += len(page_row)
+                    if name in page:
+                        findings.append(findings_dict(rule.table_findings(page[name], page_outcomes, self.config)))
+                    else:
+                        findings.append(None)
+                table_findings[name] = findings
+        
+        results = []
+        for index, (page, url) in enumerate(zip(pages, urls)):
+            page_findings = []
+            for rule in self.rules:
+                name = rule.__name__
+                if name not in page:
+                    continue
+                page_findings.append(page[name] if rule.table is None else table_findings[name][index])
+            results.append(self.merge_findings(page_findings, url))
+        return results
+    
+    def collect_findings(self, rules, url=None):
+        """Build the findings dict from rules that have finished visiting a document"""
+        return self.evaluate([self.rules_facts(rules)], [url])[0]
+    
+    def rule_findings(self, rule):
+        """Findings of one rule without a threshold table that has finished visiting a document"""
+        self.vulnerabilities = []
+        self.warnings = []
+        self.recommendations = []
+        with timer('check', rule=type(rule).__name__):
+            rule.report(self)
         return {
             'vulnerabilities': self.vulnerabilities,
             'warnings': self.warnings,
             'recommendations': self.recommendations
         }
     
-    def _check_title_tag(self, soup):
-        """Check title tag optimization"""
-        title_tags = soup.find_all('title')
+    def merge_findings(self, rule_findings, url=None):
+        """The findings dict of per-rule findings in rule order, followed by the URL check"""
+        self.vulnerabilities = []
+        self.warnings = []
+        self.recommendations = []
+        for findings in rule_findings:
+            self.vulnerabilities.extend(findings['vulnerabilities'])
+            self.warnings.extend(findings['warnings'])
+            self.recommendations.extend(findings['recommendations'])
+        with timer('check', rule='url_structure'):
+            self._check_url_structure(url)
         
-        if len(title_tags) == 0:
-            self.vulnerabilities.append({
-                'type': 'CRITICAL',
-                'element': 'Title Tag',
-                'issue': 'Missing title tag',
-                'description': 'No title tag found in the HTML',
-                'suggest':True
-            })
-        elif len(title_tags) > 1:
-            self.vulnerabilities.append({
-                'type': 'WARNING',
-                'element': 'Title Tag',
-                'issue': 'Multiple title tags',
-                'description': f'Found {len(title_tags)} title tags, should have only one'
-            })
-        else:
-            title_text = title_tags[0].get_text().strip()
-            title_length = len(title_text)
-            
-            if title_length == 0:
-                self.vulnerabilities.append({
-                    'type': 'CRITICAL',
-                    'element': 'Title Tag',
-                    'issue': 'Empty title tag',
-                    'description': 'Title tag is empty',
-                    'suggest':True
-                })
-            elif title_length < 30:
-                self.warnings.append({
-                    'type': 'WARNING',
-                    'element': 'Title Tag',
-                    'issue': 'Title too short',
-                    'actual_text': title_text,
-                    'description': f'Title is {title_length} characters, recommended minimum is 30',
-                    'suggest':True
-                })
-            elif title_length > 160:
-                self.vulnerabilities.append({
-                    'type': 'WARNING',
-                    'element': 'Title Tag',
-                    'issue': 'Title too long',
-                    'actual_text': title_text,
-                    'description': f'Title is {title_length} characters, recommended maximum is 160',
-                    'suggest':True
-                })
-            elif title_length < 150:
-                self.recommendations.append({
-                    'type': 'RECOMMENDATION',
-                    'element': 'Title Tag',
-                    'issue': 'Title could be optimized',
-                    'actual_text': title_text,
-                    'description': f'Title is {title_length} characters, ideal range is 150-160',
-                    'suggest':True
-                })
+        return {
+            'vulnerabilities': self.vulnerabilities,
+            'warnings': self.warnings,
+            'recommendations': self.recommendations
+        }
     
-    def _check_h1_tag(self, soup):
-        """Check H1 tag optimization"""
-        h1_tags = soup.find_all('h1')
+    def _run_rules(self, document, rule_classes=None, fingerprints=None):
+        """
+        Walk the tree once, dispatching each element to the rules registered
+        for its tag. Runs the scanner's rules unless rule_classes is given.
+        With a fingerprints dict, also fills it with a BLAKE2 digest, by rule
+        name, of every element each rule visited
+        """
+        rules = [rule() for rule in (rule_classes or self.rules)]
+        dispatch = rule_dispatch(rules)
+        digests = None
+        if fingerprints is not None:
+            digests = {type(rule).__name__: hashlib.blake2b(digest_size=16) for rule in rules}
         
-        if len(h1_tags) == 0:
-            self.vulnerabilities.append({
-                'type': 'CRITICAL',
-                'element': 'H1 Tag',
-                'issue': 'Missing H1 tag',
-                'description': 'No H1 tag found on the page',
-                'suggest':True
-            })
-        elif len(h1_tags) > 1:
-            self.vulnerabilities.append({
-                'type': 'WARNING',
-                'element': 'H1 Tag',
-                'issue': 'Multiple H1 tags',
-                'description': f'Found {len(h1_tags)} H1 tags, should have only one per page'
-            })
-        else:
-            h1_text = h1_tags[0].get_text().strip()
-            h1_length = len(h1_text)
-            
-            if h1_length == 0:
-                self.vulnerabilities.append({
-                    'type': 'CRITICAL',
-                    'element': 'H1 Tag',
-                    'issue': 'Empty H1 tag',
-                    'description': 'H1 tag is empty',
-                    'suggest':True
-                })
-            elif h1_length < 20:
-                self.warnings.append({
-                    'type': 'WARNING',
-                    'element': 'H1 Tag',
-                    'issue': 'H1 too short',
-                    'actual_text': h1_text,
-                    'description': f'H1 is {h1_length} characters, recommended minimum is 20',
-                    'suggest':True
-                })
-            elif h1_length > 70:
-                self.warnings.append({
-                    'type': 'WARNING',
-                    'element': 'H1 Tag',
-                    'issue': 'H1 too long',
-                    'actual_text': h1_text,
-                    'description': f'H1 is {h1_length} characters, recommended maximum is 70',
-                    'suggest':True
-                })
+        # Build the tree first, so the parse is timed as its own stage
+        document.tree
+        with timer('walk'):
+            for element in document.iter_elements():
+                tag_rules = dispatch.get(element.name)
+                if tag_rules:
+                    if digests is not None:
+                        data = element_fingerprint(element)
+                        for rule in tag_rules:
+                            digests[type(rule).__name__].update(data)
+                    for rule in tag_rules:
+                        rule.visit(element)
+        
+        if digests is not None:
+            fingerprints.update((name, digest.hexdigest()) for name, digest in digests.items())
+        return rules
+    
+    def _add_findings(self, findings):
+        """Append (list name, finding) pairs to the scanner's findings"""
+        for bucket, finding in findings:
+            getattr(self, bucket).append(finding)
     
-    def _check_header_hierarchy(self, soup):
+    def _check_header_hierarchy(self, headers):
         """Check header tag hierarchy (H2-H6)"""
-        headers = soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
-        
         if len(headers) <= 1:
             self.recommendations.append({
                 'type': 'RECOMMENDATION',
@@ -185,122 +1129,8 @@ class HTMLSEOScanner:
                 'description': issue
             })
     
-    def _check_meta_description(self, soup):
-        """Check meta description optimization"""
-        meta_desc = soup.find('meta', attrs={'name': 'description'})
-        
-        if not meta_desc:
-            self.vulnerabilities.append({
-                'type': 'CRITICAL',
-                'element': 'Meta Description',
-                'issue': 'Missing meta description',
-                'description': 'No meta description tag found',
-                'suggest':True
-            })
-        else:
-            content = meta_desc.get('content', '').strip()
-            desc_length = len(content)
-            
-            if desc_length == 0:
-                self.vulnerabilities.append({
-                    'type': 'CRITICAL',
-                    'element': 'Meta Description',
-                    'issue': 'Empty meta description',
-                    'description': 'Meta description is empty',
-                    'suggest':True
-                })
-            elif desc_length < 120:
-                self.warnings.append({
-                    'type': 'WARNING',
-                    'element': 'Meta Description',
-                    'issue': 'Meta description too short',
-                    'actual_text': content,
-                    'description': f'Meta description is {desc_length} characters, recommended minimum is 120',
-                    'suggest':True
-                })
-            elif desc_length > 160:
-                self.vulnerabilities.append({
-                    'type': 'WARNING',
-                    'element': 'Meta Description',
-                    'issue': 'Meta description too long',
-                    'actual_text': content,
-                    'description': f'Meta description is {desc_length} characters, recommended maximum is 160',
-                    'suggest':True
-                })
-    
-    def _check_image_optimization(self, soup):
-        """Check image optimization"""
-        images = soup.find_all('img')
-        
-        if not images:
-            return
-        
-        images_without_alt = 0
-        images_with_empty_alt = 0
-        images_with_long_alt = 0
-        
-        for img in images:
-            alt_text = img.get('alt')
-            src = img.get('src', '')
-            
-            if alt_text is None:
-                images_without_alt += 1
-            elif alt_text.strip() == '':
-                images_with_empty_alt += 1
-            else:
-                alt_length = len(alt_text)
-                if alt_length > 125:
-                    images_with_long_alt += 1
-                elif alt_length < 80:
-                    self.recommendations.append({
-                        'type': 'RECOMMENDATION',
-                        'element': 'Image ALT',
-                        'issue': 'ALT text could be longer',
-                        'actual_text': alt_text,
-                        'description': f'Image ALT text is {alt_length} characters, ideal range is 80-125',
-                        'suggest':True
-                    })
-            
-            # Check for descriptive file names
-            if src:
-                filename = os.path.basename(src).lower()
-                if re.match(r'^(img|image|photo|pic)\d*\.(jpg|jpeg|png|gif|webp)$', filename):
-                    self.recommendations.append({
-                        'type': 'RECOMMENDATION',
-                        'element': 'Image Filename',
-                        'issue': 'Non-descriptive image filename',
-                        'description': f'Consider using descriptive filename instead of "{filename}"'
-                    })
-        
-        if images_without_alt > 0:
-            self.vulnerabilities.append({
-                'type': 'WARNING',
-                'element': 'Image ALT',
-                'issue': 'Missing ALT attributes',
-                'description': f'{images_without_alt} images missing ALT attributes'
-            })
-        
-        if images_with_empty_alt > 0:
-            self.warnings.append({
-                'type': 'WARNING',
-                'element': 'Image ALT',
-                'issue': 'Empty ALT attributes',
-                'description': f'{images_with_empty_alt} images have empty ALT attributes'
-            })
-        
-        if images_with_long_alt > 0:
-            self.warnings.append({
-                'type': 'WARNING',
-                'element': 'Image ALT',
-                'issue': 'ALT text too long',
-                'description': f'{images_with_long_alt} images have ALT text longer than 125 characters'
-
-            })
-    
-    def _check_canonical_tags(self, soup):
+    def _check_canonical_tags(self, canonical_tags):
         """Check canonical tag implementation"""
-        canonical_tags = soup.find_all('link', rel='canonical')
-        
         if len(canonical_tags) == 0:
             self.vulnerabilities.append({
                 'type': 'WARNING',
@@ -329,39 +1159,7 @@ class HTMLSEOScanner:
         """Check URL structure optimization"""
         if not url:
             return
-        
-        parsed_url = urlparse(url)
-        path = parsed_url.path
-        
-        if not path or path == '/':
-            return
-        
-        # Check for underscores
-        if '_' in path:
-            self.warnings.append({
-                'type': 'WARNING',
-                'element': 'URL Structure',
-                'issue': 'Underscores in URL',
-                'description': 'URL contains underscores, hyphens are preferred for SEO'
-            })
-        
-        # Check URL length
-        if len(path) > 100:
-            self.warnings.append({
-                'type': 'WARNING',
-                'element': 'URL Structure',
-                'issue': 'URL too long',
-                'description': f'URL path is {len(path)} characters, consider shortening'
-            })
-        
-        # Check for non-descriptive URLs
-        if re.search(r'/(id|page|post|article)=?\d+', path):
-            self.recommendations.append({
-                'type': 'RECOMMENDATION',
-                'element': 'URL Structure',
-                'issue': 'Non-descriptive URL',
-                'description': 'URL appears to use IDs instead of descriptive keywords'
-            })
+        self._add_findings(url_findings(urlparse(url).path, self.config))
     
     def generate_report(self, results):
         """Generate a formatted report"""
@@ -393,62 +1191,95 @@ class HTMLSEOScanner:
         
         return "\n".join(report)
 
+    def extract_links(self, html_content, base_url):
+        """
+        Extract the absolute http(s) URLs of all <a href> links, in document order
+        and without duplicates or #fragments
+        """
+        document = self.parse(html_content)
+        links = []
+        seen = set()
+        for element in document.iter_elements():
+            if element.name != 'a':
+                continue
+            href = element.get('href', '').strip()
+            if not href:
+                continue
+            link = urldefrag(urljoin(base_url, href))[0]
+            if urlparse(link).scheme in ('http', 'https') and link not in seen:
+                seen.add(link)
+                links.append(link)
+        return links
+    
+    def extract_canonical(self, html_content, base_url):
+        """Absolute URL of the page's first canonical link, or None if it has none"""
+        document = self.parse(html_content)
+        for element in document.iter_elements(skip=STRIPPED_TAGS):
+            if element.name == 'link' and is_canonical_link(element):
+                href = element.get('href', '').strip()
+                return urldefrag(urljoin(base_url, href))[0] if href else None
+        return None
+    
     def extract_page_content(self, html_content):
         """
-        Extract clean text content from HTML by removing all tags, links, styles, and scripts
+        Extract clean text content from HTML, leaving out all tags, links, styles, and scripts.
+        Accepts raw HTML or a ParsedDocument from parse(); the parsed tree is left untouched
+        so the same document can still be scanned afterwards.
         Returns a dictionary with various content extractions
         """
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Remove script and style elements completely
-        for script in soup(["script", "style", "noscript"]):
-            script.decompose()
-        
-        # Remove comments
-        from bs4 import Comment
-        for comment in soup.find_all(string=lambda text: isinstance(text, Comment)):
-            comment.extract()
-        
-        # Extract different types of content
-        content_data = {
-            'title': self._extract_title(soup),
-            'meta_description': self._extract_meta_description(soup),
-            # 'headings': self._extract_headings(soup),
-            'body_text': self._extract_body_text(soup)
-        }
+        document = self.parse(html_content)
+        
+        if self.cache is not None:
+            key = f'content|{EXTRACTION_VERSION}|{self.parser}|{document.content_hash}'
+            content_data = self.cache.get(key)
+            if content_data is not None:
+                return content_data
+        
+        # Extract different types of content; the parse is timed as its own stage
+        document.tree
+        with timer('extract'):
+            content_data = {
+                'title': self._extract_title(document),
+                'meta_description': self._extract_meta_description(document),
+                # 'headings': self._extract_headings(document),
+                'body_text': self._extract_body_text(document)
+            }
+        
+        if self.cache is not None:
+            self.cache.set(key, content_data)
         return content_data
     
-    def _extract_title(self, soup):
+    def _find_title(self, document):
+        """The document's <title> element, or None"""
+        for element in document.iter_elements(skip=STRIPPED_TAGS + FOREIGN_TAGS):
+            if element.name == 'title':
+                return element
+        return None
+    
+    def _extract_title(self, document):
         """Extract page title"""
-        title_tag = soup.find('title')
-        return title_tag.get_text().strip() if title_tag else ''
+        title = self._find_title(document)
+        return title.get_text().strip() if title is not None else ''
     
-    def _extract_meta_description(self, soup):
+    def _extract_meta_description(self, document):
         """Extract meta description"""
-        meta_desc = soup.find('meta', attrs={'name': 'description'})
-        return meta_desc.get('content', '').strip() if meta_desc else ''
+        for element in document.iter_elements(skip=STRIPPED_TAGS):
+            if element.name == 'meta' and element.get('name') == 'description':
+                return element.get('content', '').strip()
+        return ''
     
-    def _extract_body_text(self, soup):
+    def _extract_body_text(self, document):
         """Extract clean body text without HTML tags"""
-        # Remove navigation, footer, sidebar, and other non-content elements
-        for element in soup.find_all(['nav', 'footer', 'aside', 'header']):
-            element.decompose()
-        
-        # Remove elements with common non-content class names
-        non_content_classes = [
-            'navigation', 'nav', 'menu', 'sidebar', 'footer', 'header',
-            'advertisement', 'ads', 'social', 'share', 'comments'
-        ]
+        title = self._find_title(document)
         
-        for class_name in non_content_classes:
-            for element in soup.find_all(class_=lambda x: x and any(nc in ' '.join(x).lower() for nc in non_content_classes)):
-                element.decompose()
+        def skip_element(element):
+            if title is not None and element.name == 'title' and document.same_element(element, title):
+                return True
+            return self._is_skipped_content(element)
         
-        # Get text from body or entire document if body not found
-        body = soup.find('body') or soup
-        
-        # Extract text and clean it up
-        text = body.get_text(separator=' ', strip=True)
+        # Get text from body or entire document if body not found,
+        # leaving out navigation, footer, sidebar, and other non-content elements
+        text = ' '.join(document.collect_text(skip_element))
         
         # Clean up whitespace
         text = re.sub(r'\s+', ' ', text)  # Replace multiple whitespace with single space
@@ -456,10 +1287,117 @@ class HTMLSEOScanner:
         
         return text
     
+    def _is_skipped_content(self, element):
+        """Check whether an element and its subtree are left out of the body text"""
+        return element.name in SKIPPED_CONTENT_TAGS or self._is_non_content(element)
+    
+    def _is_non_content(self, element):
+        """Check whether an element carries one of the common non-content class names"""
+        if element.name in CONTENT_ROOT_TAGS:
+            return False
+        classes = element.get('class')
+        if not classes:
+            return False
+        if isinstance(classes, str):
+            classes = classes.split()
+        for class_name in classes:
+            if class_name.lower() in NON_CONTENT_CLASSES:
+                return True
+        return False
+    
+# Elements that never have content or an end tag
+VOID_TAGS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr'
+])
+
+class StreamElement:
+    """Element built from parser events, with the interface the rules use"""
+    __slots__ = ('name', 'attrs', 'text_parts')
+    
+    def __init__(self, name, attrs):
+        self.name = name
+        # Valueless attributes read as '' and the last duplicate wins, as in bs4
+        self.attrs = {key: '' if value is None else value for key, value in attrs}
+        self.text_parts = []
+    
+    def get(self, key, default=None):
+        return self.attrs.get(key, default)
+    
+    def get_text(self):
+        return ''.join(self.text_parts)
+
+class StreamingHTMLSEOScanner(HTMLParser):
+    """
+    Incremental SEO scanner fed with chunks of HTML through feed().
+    Runs the same rules as HTMLSEOScanner but never builds a tree: only the
+    elements the rules look at are kept. head_results is filled in with the
+    head-level findings (title, meta description, canonical) as soon as </head>
+    or <body> is seen; close() returns the findings for the whole document.
+    """
+    def __init__(self, url=None, rules=None, config=None):
+        super().__init__(convert_charrefs=True)
+        self.url = url
+        self.config = config
+        self.rules = [rule() for rule in (rules if rules is not None else SEO_RULES)]
+        self.dispatch = rule_dispatch(self.rules)
+        # Elements the rules visited that are still open and collecting text
+        self.open_elements = []
+        self.raw_text_tag = None
+        self.head_results = None
+        self.results = None
+    
+    def handle_starttag(self, tag, attrs):
+        if tag == 'body':
+            self._finish_head()
+        if tag in ('script', 'style'):
+            self.raw_text_tag = tag
+        
+        tag_rules = self.dispatch.get(tag)
+        if tag_rules:
+            element = StreamElement(tag, attrs)
+            for rule in tag_rules:
+                rule.visit(element)
+            if tag not in VOID_TAGS:
+                self.open_elements.append(element)
+    
+    def handle_endtag(self, tag):
+        if tag == 'head':
+            self._finish_head()
+        if tag == self.raw_text_tag:
+            self.raw_text_tag = None
+        
+        # Close the most recent open element with this name and everything inside it
+        for index in range(len(self.open_elements) - 1, -1, -1):
+            if self.open_elements[index].name == tag:
+                del self.open_elements[index:]
+                break
+    
+    def handle_data(self, data):
+        # Script and style text is not part of get_text()
+        if self.raw_text_tag:
+            return
+        for element in self.open_elements:
+            element.text_parts.append(data)
+    
+    def _finish_head(self):
+        """Report the head-level rules once the head is complete"""
+        if self.head_results is None:
+            head_rules = [rule for rule in self.rules if rule.head]
+            self.head_results = HTMLSEOScanner(config=self.config).collect_findings(head_rules)
+    
+    def close(self):
+        """Flush the parser and return the findings for the whole document"""
+        super().close()
+        self._finish_head()
+        self.open_elements = []
+        self.results = HTMLSEOScanner(config=self.config).collect_findings(self.rules, self.url)
+        return self.results
+
 # Example usage
-def scan_html_file(file_path, url=None):
+def scan_html_file(file_path, url=None, parser='html.parser'):
     """Scan an HTML file for SEO vulnerabilities"""
-    scanner = HTMLSEOScanner()
+    scanner = HTMLSEOScanner(parser=parser)
     
     try:
         with open(file_path, 'r', encoding='utf-8') as file:
@@ -475,9 +1413,9 @@ def scan_html_file(file_path, url=None):
     except Exception as e:
         return None, f"Error: {str(e)}"
 
-def scan_html_string(html_string, url=None):
+def scan_html_string(html_string, url=None, parser='html.parser'):
     """Scan HTML string for SEO vulnerabilities"""
-    scanner = HTMLSEOScanner()
+    scanner = HTMLSEOScanner(parser=parser)
     results = scanner.scan_html(html_string, url)
     report = scanner.generate_report(results)
     